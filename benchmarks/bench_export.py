@@ -0,0 +1,63 @@
+# ==============================
+# Benchmark: full export, pandas frames vs streamed formats
+# ==============================
+#
+#   python benchmarks/bench_export.py [rows] [old|xlsx|parquet|arrow|csv ...]
+#                                     (default 100,000, old + every exports.formats())
+#
+# Builds a synthetic DB and times the "Download Full Database" export: the
+# old page (every table loaded into a DataFrame, then to_excel to a file)
+# against exports.full_report streaming cursor rows in each format. Each
+# variant runs in its own process so peak RSS is measured separately.
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from synthetic import build, db
+
+import exports  # noqa: E402  (path set up by synthetic)
+import frames  # noqa: E402
+
+
+def old_export(conn, out):
+    with pd.ExcelWriter(out, engine="xlsxwriter") as writer:
+        for sheet, table in exports.FULL_REPORT:
+            frames.load(conn, table).to_excel(writer, index=False, sheet_name=sheet)
+    return os.path.getsize(out)
+
+
+def new_export(conn, out, fmt):
+    with exports.full_report(conn, fmt=fmt) as f, open(out, "wb") as dst:
+        while chunk := f.read(2**20):
+            dst.write(chunk)
+    return os.path.getsize(out)
+
+
+def run(path, variant):
+    conn = db.ConnectionPool(path).connection()
+    extension, _ = exports.file_type("xlsx" if variant == "old" else variant)
+    out = os.path.join(os.path.dirname(path), variant + extension)
+    start = time.perf_counter()
+    size = old_export(conn, out) if variant == "old" else new_export(conn, out, variant)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{variant:<8} {elapsed:9.1f} s {peak:10.0f} MB RSS {size / 2**20:9.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--run":
+        run(sys.argv[2], sys.argv[3])
+        sys.exit()
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    variants = sys.argv[2:] or ["old", *exports.formats()]
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"Building {rows:,} PR lines in {path} ...")
+    build(path, rows).close()
+    for variant in variants:
+        subprocess.run([sys.executable, __file__, "--run", path, variant], check=True)
@@ -0,0 +1,49 @@
+# ==============================
+# Benchmark: DataFrame memory, plain read_sql vs typed loaders
+# ==============================
+#
+#   python benchmarks/bench_frames.py [rows]     (default 200,000)
+#
+# Builds a synthetic DB and reports bytes per row of every table as
+# pd.read_sql returns it (lookup ids shown as their names, as the pages
+# displayed them before the typed loaders) and as frames.load returns it.
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from synthetic import build
+
+import frames  # noqa: E402  (path set up by synthetic)
+import lookups  # noqa: E402
+import money  # noqa: E402
+
+
+def plain(conn, table):
+    # Names as plain strings: the object-dtype frame the pages used to hold
+    df = money.decode(lookups.decode(conn, pd.read_sql(f"SELECT * FROM {table}", conn)))
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"Building {rows:,} PR lines in {path} ...")
+    conn = build(path, rows)
+
+    print(f"\n{'table':<26} {'rows':>9} {'before B/row':>13} {'after B/row':>12} {'saved':>7} {'load s':>7}")
+    total_before = total_after = 0
+    for table in frames.SCHEMAS:
+        before = plain(conn, table)
+        start = time.perf_counter()
+        after = frames.load(conn, table)
+        elapsed = time.perf_counter() - start
+        b, a = frames.memory_usage(before), frames.memory_usage(after)
+        total_before, total_after = total_before + b, total_after + a
+        n = max(len(after), 1)
+        print(f"{table:<26} {len(after):>9,} {b / n:>13,.0f} {a / n:>12,.0f} {1 - a / max(b, 1):>7.0%} {elapsed:>7.2f}")
+    print(f"\ntotal {total_before / 2**20:,.1f} MB -> {total_after / 2**20:,.1f} MB "
+          f"({1 - total_after / total_before:.0%} less)")
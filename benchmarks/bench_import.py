@@ -0,0 +1,71 @@
+# ==============================
+# Benchmark: bulk PR import from CSV
+# ==============================
+#
+#   python benchmarks/bench_import.py [rows] [chunk_rows]     (default 100,000 / 5,000)
+#
+# Writes a synthetic CSV with two WBLs per line (1% of rows deliberately
+# invalid), imports it into a fresh database and reports throughput and
+# peak resident memory.
+
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from synthetic import CATEGORIES, PROGRAMME_UNITS, SERVICE_TYPES, STAFF, START, db
+
+import pr_import  # noqa: E402  (path set up by synthetic)
+
+
+def write_csv(path, rows, seed=1):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(pr_import.TEMPLATE_COLUMNS)
+        for i in range(rows):
+            d = START + timedelta(days=rng.randrange(2000))
+            category = rng.choice(CATEGORIES)
+            split = rng.choice([100, 50, 70])
+            line = {
+                "pr_number": f"PR{i // 4:07d}", "date_request": str(d), "staff_name": rng.choice(STAFF),
+                "programme_unit": rng.choice(PROGRAMME_UNITS), "type_services": rng.choice(SERVICE_TYPES),
+                "category": category, "type_vehicle": "HiAce" if category == "Rental Vehicle" else "",
+                "from_date": str(d), "to_date": str(d + timedelta(days=rng.randrange(10))),
+                "location": "Islamabad", "qty": rng.randint(1, 20),
+                "est_cost_pkr": round(rng.uniform(1e3, 1e6), 2), "est_cost_usd": "",
+                "reminder_expiry": rng.choice(["Yes", "No"]), "reminder_days": rng.randint(1, 30),
+                "assigned_to": rng.choice(STAFF),
+                "wbl1_project": "P1", "wbl1_task": "T1", "wbl1_percentage": split,
+                "wbl2_project": "P2" if split < 100 else "", "wbl2_task": "T2" if split < 100 else "",
+                "wbl2_percentage": 100 - split if split < 100 else "",
+            }
+            if i % 100 == 0:
+                line["wbl1_percentage"] = 10     # does not add up to 100
+            w.writerow([line.get(c, "") for c in pr_import.TEMPLATE_COLUMNS])
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    chunk_rows = int(sys.argv[2]) if len(sys.argv) > 2 else pr_import.CHUNK_ROWS
+    tmp = tempfile.mkdtemp()
+    csv_path, db_path = os.path.join(tmp, "import.csv"), os.path.join(tmp, "bench.db")
+    write_csv(csv_path, rows)
+    print(f"{rows:,} lines, {os.path.getsize(csv_path) / 2**20:.1f} MB CSV, chunks of {chunk_rows:,}")
+
+    pool = db.ConnectionPool(db_path)
+    db.transaction = pool.transaction
+    conn = pool.connection()
+    db.migrate(conn)
+
+    start = time.perf_counter()
+    imported, errors = pr_import.import_file(conn, csv_path, "bench", chunk_rows=chunk_rows)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB on Linux
+
+    print(f"imported {imported:,} lines, rejected {errors['row'].nunique():,} rows")
+    print(f"{elapsed:.1f} s   {imported / elapsed:,.0f} lines/s   peak RSS {peak:,.0f} MB")
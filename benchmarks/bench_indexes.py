@@ -0,0 +1,50 @@
+# ==============================
+# Benchmark: hot queries before/after the index migration
+# ==============================
+#
+#   python benchmarks/bench_indexes.py [rows]     (default 1,000,000)
+#
+# Builds a synthetic DB at schema version 1 (no secondary indexes), prints
+# EXPLAIN QUERY PLAN + timings for the hot queries, migrates to the latest
+# version and prints them again.
+
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import build, db
+
+QUERIES = {
+    "PR by number": ("SELECT * FROM pr_tracking WHERE pr_number=?", ["PR0012345"]),
+    "PRs by category + number": ("SELECT id FROM pr_tracking WHERE category=? AND pr_number=?", ["ICT", "PR0012345"]),
+    "My PRs": ("SELECT id FROM pr_tracking WHERE staff_name=? OR assigned_to=?", ["staff042", "staff042"]),
+    "Reminders": ("SELECT id, from_date, reminder_days FROM pr_tracking WHERE reminder_expiry='Yes' "
+                  "AND from_date BETWEEN ? AND ?", ["2023-01-01", "2023-01-31"]),
+    "Payments of PR": ("SELECT * FROM payment_tracking WHERE pr_id=?", [123456]),
+    "WBLs of PR": ("SELECT * FROM pr_wbls WHERE pr_id=?", [123456]),
+    "Liquidation of OA": ("SELECT * FROM operational_liquidations WHERE oa_id=?", [3000]),
+    "Status timeline": ("SELECT * FROM status_history WHERE record_id=? ORDER BY changed_at", ["123456"]),
+}
+
+
+def run(conn, label, repeat=5):
+    print(f"\n=== {label} (schema v{db.schema_version(conn)}) ===")
+    for name, (sql, params) in QUERIES.items():
+        plan = "; ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"{name:<26} {ms:9.2f} ms   {plan}")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"Building {rows:,} PR lines in {path} ...")
+    conn = build(path, rows, target=1)
+    run(conn, "Before")
+    db.migrate(conn, 2)
+    conn.execute("ANALYZE")
+    run(conn, "After")
@@ -0,0 +1,73 @@
+# ==============================
+# Benchmark: Operational Advance Liquidation picker
+# ==============================
+#
+#   python benchmarks/bench_oa_picker.py [counts...]     (default 10000 50000)
+#
+# For each count, fills a synthetic DB with that many operational advances
+# (a third of them liquidated) and times one render of the OA selector:
+# the old page (every OA, two boolean-mask lookups per option label)
+# against the cached id -> label dict of open advances plus a search.
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from synthetic import PAY_STATUSES, PROGRAMME_UNITS, STAFF, build, db
+
+import lookups  # noqa: E402  (path set up by synthetic)
+
+
+def fill(conn, count, seed=1):
+    rng = random.Random(seed)
+    conn.execute("DELETE FROM operational_advances")
+    conn.executemany("""INSERT INTO operational_advances (date_request, staff_name, programme_unit_id, supplier_name,
+                        description, invoice_type, invoice_no, total_amount_minor, payment_currency, status_id)
+                        VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                     (("2024-01-01", rng.choice(STAFF), lookups.code(conn, "programme_unit", rng.choice(PROGRAMME_UNITS)),
+                       f"Supplier {i % 500}", f"Advance {i}", "Final", f"INV{i}", rng.randrange(10**5, 10**8), "PKR",
+                       lookups.code(conn, "status", rng.choice(PAY_STATUSES))) for i in range(count)))
+    conn.execute("""INSERT INTO operational_liquidations (oa_id, date_request, staff_name, supplier_name)
+                    SELECT id, date_request, staff_name, supplier_name FROM operational_advances WHERE id % 3 = 0""")
+    conn.commit()
+
+
+def old_render(conn):
+    oas = pd.read_sql("SELECT * FROM operational_advances", conn)
+    format_func = (lambda x: f"ID {x} | {oas.loc[oas['id']==x, 'supplier_name'].values[0]}"
+                             f" | {oas.loc[oas['id']==x, 'description'].values[0]}")
+    return [format_func(x) for x in oas["id"]]      # st.selectbox formats every option
+
+
+def new_render(conn, search=""):
+    options = db.open_advance_options(conn)
+    matches = db.search_labels(options, search)
+    selected = matches[0]
+    db.read_cached(conn, "SELECT * FROM operational_advances WHERE id=?", ["operational_advances"], [selected])
+    return [options[m] for m in matches]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [10_000, 50_000]
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = build(path, 2_000)
+
+    print(f"{'OAs':>8} {'old ms':>10} {'new cold':>10} {'new warm':>10} {'search':>10}")
+    for count in counts:
+        fill(conn, count)
+        db.invalidate("operational_advances")
+        old = timed(old_render, conn)
+        cold = timed(new_render, conn)
+        warm = timed(new_render, conn)
+        search = timed(new_render, conn, "supplier 42")
+        print(f"{count:>8,} {old:>10.1f} {cold:>10.1f} {warm:>10.1f} {search:>10.1f}")
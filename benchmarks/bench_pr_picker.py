@@ -0,0 +1,75 @@
+# ==============================
+# Benchmark: Payment Tracking PR picker, full-category load vs two-level picker
+# ==============================
+#
+#   python benchmarks/bench_pr_picker.py [rows]     (default 200,000)
+#
+# Builds a synthetic DB, moves every PR into one category and times one
+# rerun of the picker: the old page (every line of the category, then
+# iterrows for the labels) against distinct PR numbers + type-ahead + the
+# chosen PR's lines only, cold and with the result cache warm.
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from synthetic import build, db
+
+import lookups  # noqa: E402  (path set up by synthetic)
+import rollups  # noqa: E402
+
+
+def old_picker(conn, category_id, pr_number):
+    prs = pd.read_sql("""
+        SELECT id, pr_number, date_request, staff_name, programme_unit_id, type_services_id, category_id,
+               description, location, qty, est_cost_pkr_minor, est_cost_usd_minor, status_id
+        FROM pr_tracking WHERE category_id=?
+    """, conn, params=[category_id])
+    prs["pr_number"].unique().tolist()
+    pr_subset = prs[prs["pr_number"] == pr_number]
+    return {
+        row["id"]: f"ID {row['id']} | {row['pr_number']} | {row['description']} | {row['staff_name']}"
+        for _, row in pr_subset.iterrows()
+    }
+
+
+def new_picker(conn, category_id, search):
+    numbers = db.distinct_values(conn, "pr_headers", "pr_number", "category_id=?", [category_id])
+    matches = db.search_values(numbers, search, 50)
+    return db.pr_line_options(conn, category_id, matches[0])
+
+
+def timed(fn, *args, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"Building {rows:,} PR lines in {path} ...")
+    conn = build(path, rows)
+    category_id = lookups.code(conn, "category", "ICT")
+    rollups.drop_triggers(conn)          # throw-away DB: skip the rollup moves
+    conn.execute("UPDATE pr_headers SET category_id=?", (category_id,))
+    conn.commit()
+    conn.execute("ANALYZE")
+    pr_number, = conn.execute("""SELECT pr_number FROM pr_headers ORDER BY id
+                                 LIMIT 1 OFFSET (SELECT count(*) / 2 FROM pr_headers)""").fetchone()
+
+    old_ms, old = timed(old_picker, conn, category_id, pr_number)
+    db.clear_cache()
+    cold_ms, new = timed(new_picker, conn, category_id, pr_number, repeat=1)
+    warm_ms, _ = timed(new_picker, conn, category_id, pr_number)
+    assert old == new, "pickers disagree"
+
+    lines = db.count_rows(conn, "pr_tracking", "category_id=?", [category_id])
+    print(f"{lines:,} lines in one category, PR {pr_number} has {len(new)} line(s)")
+    print(f"old  full category + iterrows   {old_ms:9.1f} ms")
+    print(f"new  two-level picker (cold)    {cold_ms:9.1f} ms")
+    print(f"new  two-level picker (warm)    {warm_ms:9.1f} ms")
@@ -0,0 +1,70 @@
+# ==============================
+# Benchmark: PR Reminders panel, row-wise pandas vs SQL window
+# ==============================
+#
+#   python benchmarks/bench_reminders.py [rows]     (default 1,000,000)
+#
+# About half of the synthetic lines have reminder_expiry='Yes', so the
+# default size gives ~500k reminder-enabled lines.
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+import pandas as pd
+
+from synthetic import build, db
+
+import reminders  # noqa: E402  (path set up by synthetic)
+
+
+def old_panel(conn, today):
+    # The pre-change Dashboard code: full read + two row-wise applies
+    df = pd.read_sql("""
+        SELECT id, pr_number, staff_name, category_id, from_date, reminder_days
+        FROM pr_tracking
+        WHERE reminder_expiry='Yes'
+    """, conn)
+    df["from_date"] = pd.to_datetime(df["from_date"], errors="coerce")
+    df["reminder_days"] = pd.to_numeric(df["reminder_days"], errors="coerce")
+    df["Reminder Date"] = df.apply(
+        lambda r: (r["from_date"] - pd.to_timedelta(int(r["reminder_days"]), unit="D")).date()
+        if pd.notnull(r["from_date"]) and pd.notnull(r["reminder_days"]) else pd.NaT,
+        axis=1
+    )
+
+    def status_label(d):
+        if pd.isna(d):
+            return "—"
+        if d < today:
+            return "⏰ Overdue"
+        if d == today:
+            return "⚠️ Due Today"
+        return "📌 Upcoming"
+
+    df["Status"] = df["Reminder Date"].apply(status_label)
+    return df
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<32} {(time.perf_counter() - start) * 1000:10.1f} ms   {len(result):,} rows")
+    return result
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"Building {rows:,} PR lines in {path} ...")
+    conn = build(path, rows)
+    enabled = conn.execute("SELECT COUNT(*) FROM pr_tracking WHERE reminder_expiry='Yes'").fetchone()[0]
+    print(f"{enabled:,} reminder-enabled lines\n")
+
+    today = date(2022, 6, 15)   # middle of the synthetic date range
+    timed("old: read all + apply()", lambda: old_panel(conn, today))
+    db.clear_cache()
+    timed("new: SQL window (cold)", lambda: reminders.due_reminders(conn, today))
+    timed("new: SQL window (cached)", lambda: reminders.due_reminders(conn, today))
@@ -0,0 +1,82 @@
+# ==============================
+# Load test: payment saves/sec with concurrent sessions
+# ==============================
+#
+#   python benchmarks/bench_save_load.py [sessions] [seconds]     (default 20 / 10)
+#
+# Each simulated session is a thread that runs the "💾 Save Payment"
+# handler in a loop against a synthetic DB: the upsert + status history
+# transaction, then either the old time.sleep(2) before st.rerun() or the
+# flash message that replaced it. Reports total saves/sec and latency.
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import build, db
+
+import lookups  # noqa: E402  (path set up by synthetic)
+import money  # noqa: E402
+
+
+def save_payment(pool, pr_id, user, status_id, session):
+    with pool.transaction("payment_tracking", "pr_lines", "status_history") as cur:
+        old_status_id, = cur.execute("""INSERT INTO payment_tracking (pr_id, pr_number, actual_pkr_minor,
+                                                                     payment_date, status_id)
+            VALUES (?,?,?,?,?)
+            ON CONFLICT (pr_id) DO UPDATE SET
+                actual_pkr_minor=excluded.actual_pkr_minor, payment_date=excluded.payment_date,
+                status_id=excluded.status_id, previous_status_id=payment_tracking.status_id
+            RETURNING previous_status_id""",
+            (pr_id, f"PR{pr_id}", money.to_minor(1234.5), "2024-01-01", status_id)).fetchone()
+        cur.execute("""INSERT INTO status_history (record_type, record_id, old_status, new_status, changed_by)
+                       VALUES (?,?,?,?,?)""",
+                    ("Payment", str(pr_id), lookups.name(cur.connection, "status", old_status_id), "Pending", user))
+    session.setdefault("flash", []).append(f"✅ Payment saved for PR {pr_id}")
+
+
+def run(pool, sessions, seconds, sleep, lines):
+    status_id = lookups.code(pool.connection(), "status", "Pending")
+    counts, latencies = [0] * sessions, []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def session(n):
+        state = {}
+        k = n
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            save_payment(pool, 1 + k % lines, f"user{n}", status_id, state)
+            if sleep:
+                time.sleep(2)
+            state.pop("flash", None)          # next run shows the toast
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            counts[n] += 1
+            k += sessions
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return sum(counts) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    lines = 50_000
+    build(path, lines).close()
+    pool = db.ConnectionPool(path)
+
+    print(f"{sessions} concurrent sessions, {seconds:.0f} s each run")
+    for label, sleep in (("before: time.sleep(2)", True), ("after: flash + rerun", False)):
+        rate, p50, p99 = run(pool, sessions, seconds, sleep, lines)
+        print(f"{label:<24} {rate:9.1f} saves/s   p50 {p50 * 1000:8.1f} ms   p99 {p99 * 1000:8.1f} ms")
@@ -0,0 +1,91 @@
+# ==============================
+# Synthetic pr_system.db for benchmarks
+# ==============================
+#
+# Builds a throw-away database with realistic value distributions so the
+# benchmarks in this folder can be run without touching pr_system.db.
+
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import db  # noqa: E402
+
+PROGRAMME_UNITS = ["CRLR", "HEALTH", "PROTECTION", "SNFI and WASH", "DTM",
+                   "FCDO- BRAVE", "MECC", "Core Staff_ HRRD"]
+SERVICE_TYPES = ["Goods", "Services", "Works"]
+CATEGORIES = ["Implementing Partners", "Professional Services", "Medical",
+              "Private Sector Partners", "Event management", "ICT", "WSNFI",
+              "Miscellaneous", "Rental Vehicle"]
+PR_STATUSES = ["Submitted", "In Process", "Completed"]
+PAY_STATUSES = ["Pending", "In Process", "Completed"]
+STAFF = [f"staff{i:03d}" for i in range(200)]
+START = date(2020, 1, 1)
+
+
+def _day(rng, span=2000):
+    return str(START + timedelta(days=rng.randrange(span)))
+
+
+def pr_rows(n, seed=1, lines_per_pr=4):
+    rng = random.Random(seed)
+    for i in range(n):
+        d = _day(rng)
+        yield (
+            f"PR{i // lines_per_pr:07d}", d, rng.choice(STAFF), rng.choice(PROGRAMME_UNITS),
+            rng.choice(SERVICE_TYPES), rng.choice(CATEGORIES), f"Line {i}", None, None, None,
+            d, d, 1, "Islamabad", rng.randint(1, 20), round(rng.uniform(1e3, 1e6), 2),
+            round(rng.uniform(5, 3500), 2), rng.choice(["Yes", "No"]), rng.randint(1, 14),
+            "", rng.choice(PR_STATUSES), d, rng.choice(STAFF),
+        )
+
+
+def build(path, rows=1_000_000, target=None, seed=1):
+    """Create `path` with `rows` PR lines plus one WBL, payment and history row
+    per line. Schema is migrated to `target` (default: latest)."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    db.migrate(conn, 1)
+
+    rng = random.Random(seed)
+    conn.executemany("""INSERT INTO pr_tracking (
+        pr_number, date_request, staff_name, programme_unit, type_services, category,
+        description, type_vehicle, traveller_name, traveller_phone,
+        from_date, to_date, days, location, qty,
+        est_cost_pkr, est_cost_usd, reminder_expiry, reminder_days,
+        comments, status, created_at, assigned_to
+    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", pr_rows(rows, seed))
+    conn.execute("""INSERT INTO pr_wbls (pr_id, project_name, task_name, percentage)
+                    SELECT id, 'PX' || (id % 50), 'T' || (id % 7), 100 FROM pr_tracking""")
+    conn.execute("""INSERT INTO payment_tracking (pr_id, pr_number, category, actual_pkr, status, payment_date)
+                    SELECT id, pr_number, category, est_cost_pkr, 'Pending', from_date
+                    FROM pr_tracking WHERE id % 2 = 0""")
+    conn.execute("""INSERT INTO status_history (record_type, record_id, old_status, new_status, changed_by, changed_at)
+                    SELECT 'PR', CAST(id AS TEXT), NULL, 'Submitted', staff_name, created_at FROM pr_tracking""")
+    conn.executemany("""INSERT INTO dsa_payments (date_request, staff_name, programme_unit, type_services, dsa_type,
+                        vendor_name, description, location, start_date, end_date, days, amount_pkr, status)
+                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                     ((_day(rng), rng.choice(STAFF), rng.choice(PROGRAMME_UNITS), "Services", "TPC Staff",
+                       f"Vendor {i % 300}", "DSA", "Lahore", _day(rng), _day(rng), 3.3,
+                       round(rng.uniform(1e3, 1e5), 2), rng.choice(PAY_STATUSES)) for i in range(rows // 10)))
+    conn.executemany("""INSERT INTO operational_advances (date_request, staff_name, programme_unit, supplier_name,
+                        description, invoice_type, invoice_no, total_amount, invoice_currency, payment_currency,
+                        location, status) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""",
+                     ((_day(rng), rng.choice(STAFF), rng.choice(PROGRAMME_UNITS), f"Supplier {i % 500}",
+                       f"Advance {i}", "Final", f"INV{i}", round(rng.uniform(1e3, 1e6), 2), "PKR", "PKR",
+                       "Karachi", rng.choice(PAY_STATUSES)) for i in range(rows // 20)))
+    conn.execute("""INSERT INTO operational_liquidations (oa_id, date_request, staff_name, supplier_name,
+                    liquidation_amount, status)
+                    SELECT id, date_request, staff_name, supplier_name, total_amount, 'Pending'
+                    FROM operational_advances WHERE id % 3 = 0""")
+    conn.commit()
+    db.migrate(conn, db.SCHEMA_VERSION if target is None else target)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
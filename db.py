@@ -0,0 +1,999 @@
+# ==============================
+# Data access layer for pr_system.db
+# ==============================
+#
+# Streamlit re-executes iom_tracker.py on every interaction, but imported
+# modules stay loaded for the life of the server process. State kept here
+# (cached result sets, table versions) is therefore shared by all sessions.
+
+import bisect
+import sqlite3
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+import rollups
+
+DB_PATH = "pr_system.db"
+
+# --- Pseudo-table bumped only when PR lines are inserted or deleted, so the
+# distinct-value lists survive status updates ---
+PR_KEYS = "pr_tracking:keys"
+
+# --- Tables written as a side effect (ON DELETE CASCADE, rollup triggers).
+# The pr_tracking view reads pr_headers + pr_lines, so it is keyed under both ---
+CASCADES = {
+    "pr_headers": ("pr_lines",),
+    "pr_lines": ("pr_tracking", "pr_wbls", "payment_tracking", "summary_rollup", "reminders"),
+    "payment_tracking": ("summary_rollup",),
+    "dsa_payments": ("summary_rollup",),
+    "operational_advances": ("operational_liquidations", "summary_rollup"),
+}
+
+
+# ==============================
+# Schema migrations (tracked in PRAGMA user_version)
+# ==============================
+#
+# Each entry upgrades the schema by one version and runs in its own
+# transaction. Items are SQL strings or callables taking the connection.
+# Never edit a released migration -- append a new one.
+
+# Lookup tables and their initial values (migration 7)
+LOOKUP_SEEDS = [
+    ("lookup_status", ["Submitted", "Pending", "In Process", "Completed", "Paid"]),
+    ("lookup_category", ["Implementing Partners", "Professional Services", "Medical",
+                         "Private Sector Partners", "Event management", "ICT", "WSNFI",
+                         "Miscellaneous", "Rental Vehicle"]),
+    ("lookup_programme_unit", ["CRLR", "HEALTH", "PROTECTION", "SNFI and WASH", "DTM",
+                               "FCDO- BRAVE", "MECC", "Core Staff_ HRRD"]),
+    ("lookup_service_type", ["Goods", "Services", "Works"]),
+    ("lookup_vehicle_type", ["Sedan Car", "Parado", "Double Cabin Vigo/Hilux", "Armoured Vehicle",
+                             "Equipped Ambulance", "HiAce", "Bus", "Coaster"]),
+    ("lookup_dsa_type", ["TPC Staff", "Gop Officials", "Other Participants"]),
+]
+# (table, TEXT column, lookup table) converted to <column>_id by migration 7
+LOOKUP_COLUMNS = [
+    ("pr_headers", "programme_unit", "lookup_programme_unit"),
+    ("pr_headers", "type_services", "lookup_service_type"),
+    ("pr_headers", "category", "lookup_category"),
+    ("pr_headers", "type_vehicle", "lookup_vehicle_type"),
+    ("pr_lines", "status", "lookup_status"),
+    ("payment_tracking", "category", "lookup_category"),
+    ("payment_tracking", "status", "lookup_status"),
+    ("dsa_payments", "programme_unit", "lookup_programme_unit"),
+    ("dsa_payments", "type_services", "lookup_service_type"),
+    ("dsa_payments", "dsa_type", "lookup_dsa_type"),
+    ("dsa_payments", "status", "lookup_status"),
+    ("operational_advances", "programme_unit", "lookup_programme_unit"),
+    ("operational_advances", "status", "lookup_status"),
+    ("operational_liquidations", "programme_unit", "lookup_programme_unit"),
+    ("operational_liquidations", "status", "lookup_status"),
+]
+
+# (table, REAL amount column, currency) converted to INTEGER minor units in
+# <column>_minor by migration 8 (see money.py). A currency of None means the
+# row's payment_currency.
+MONEY_COLUMNS = [
+    ("pr_lines", "est_cost_pkr", "PKR"),
+    ("pr_lines", "est_cost_usd", "USD"),
+    ("payment_tracking", "actual_pkr", "PKR"),
+    ("payment_tracking", "actual_usd", "USD"),
+    ("dsa_payments", "amount_pkr", "PKR"),
+    ("operational_advances", "total_amount", None),
+    ("operational_liquidations", "total_amount", None),
+    ("operational_liquidations", "liquidation_amount", None),
+    ("operational_liquidations", "unspent_amount", None),
+    ("operational_liquidations", "deposited_amount", None),
+]
+# Calendar-date columns normalised to YYYY-MM-DD by migration 8
+DATE_COLUMNS = [
+    ("pr_headers", "date_request"),
+    ("pr_lines", "from_date"),
+    ("pr_lines", "to_date"),
+    ("payment_tracking", "payment_date"),
+    ("dsa_payments", "date_request"),
+    ("dsa_payments", "start_date"),
+    ("dsa_payments", "end_date"),
+    ("operational_advances", "date_request"),
+    ("operational_liquidations", "date_request"),
+]
+
+# Tables stamped with updated_at by triggers (migration 11) -> the report
+# table their deleted ids are logged under in export_deletions (pr_headers
+# deletes reach the log through the cascade to pr_lines)
+CHANGE_TRACKED = {
+    "pr_headers": None,
+    "pr_lines": "pr_tracking",
+    "pr_wbls": "pr_wbls",
+    "payment_tracking": "payment_tracking",
+    "dsa_payments": "dsa_payments",
+    "operational_advances": "operational_advances",
+    "operational_liquidations": "operational_liquidations",
+}
+
+
+def _update_trigger(table):
+    """Trigger stamping updated_at on an UPDATE that did not set it itself."""
+    return f"""CREATE TRIGGER IF NOT EXISTS trg_updated_{table}_update AFTER UPDATE ON {table}
+    WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END"""
+
+
+# Payment rows beyond the first for their PR (archived by migration 9)
+DUPLICATE_PAYMENTS = "pr_id IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM payment_tracking GROUP BY pr_id)"
+
+REMINDER_DATE_SQL = "date(from_date, '-' || CAST(reminder_days AS INTEGER) || ' days')"
+
+MIGRATIONS = [
+    # 1: baseline schema (formerly the CREATE TABLE block in iom_tracker.py)
+    [
+        """CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'Admin'
+)""",
+        """CREATE TABLE IF NOT EXISTS pr_tracking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pr_number TEXT NOT NULL,   -- ✅ not unique anymore
+    date_request TEXT,
+    staff_name TEXT,
+    programme_unit TEXT,
+    type_services TEXT,
+    category TEXT,
+    description TEXT,
+    type_vehicle TEXT,
+    traveller_name TEXT,
+    traveller_phone TEXT,
+    from_date TEXT,
+    to_date TEXT,
+    days INTEGER,
+    location TEXT,
+    qty INTEGER,
+    est_cost_pkr REAL,
+    est_cost_usd REAL,
+    reminder_expiry TEXT,
+    reminder_days INTEGER,
+    comments TEXT,
+    status TEXT DEFAULT 'Submitted',
+    created_at TEXT,
+    assigned_to TEXT
+)""",
+        """CREATE TABLE IF NOT EXISTS pr_wbls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pr_id INTEGER NOT NULL,             -- ✅ foreign key to PR ID
+    project_name TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    percentage INTEGER NOT NULL,
+    FOREIGN KEY (pr_id) REFERENCES pr_tracking (id) ON DELETE CASCADE
+)""",
+        """CREATE TABLE IF NOT EXISTS payment_tracking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pr_id INTEGER,                      -- ✅ link to PR by ID
+    pr_number TEXT,                     -- keep original PR number for reference
+    category TEXT,
+    po_number TEXT,
+    invoice_number TEXT,
+    wave_receipt TEXT,
+    work_confirmation TEXT,             -- ✅ NEW field (Yes/No)
+    work_order_yesno TEXT,
+    work_order_number TEXT,
+    actual_usd REAL,
+    actual_pkr REAL,
+    payment_date TEXT,
+    remarks TEXT,
+    status TEXT DEFAULT 'Pending',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (pr_id) REFERENCES pr_tracking (id) ON DELETE CASCADE
+)""",
+        """CREATE TABLE IF NOT EXISTS dsa_payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_request TEXT,
+    staff_name TEXT,
+    programme_unit TEXT,
+    type_services TEXT,
+    dsa_type TEXT,
+    vendor_name TEXT,
+    description TEXT,
+    location TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    days REAL,
+    amount_pkr REAL,
+    ist_number TEXT,
+    comments TEXT,
+    status TEXT DEFAULT 'Pending',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+)""",
+        """CREATE TABLE IF NOT EXISTS status_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    record_type TEXT,
+    record_id TEXT,
+    old_status TEXT,
+    new_status TEXT,
+    changed_by TEXT,
+    changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+)""",
+        """CREATE TABLE IF NOT EXISTS operational_advances (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_request TEXT,
+    staff_name TEXT,
+    programme_unit TEXT,
+    supplier_name TEXT,
+    description TEXT,
+    invoice_type TEXT,
+    invoice_no TEXT,
+    total_amount REAL,
+    invoice_currency TEXT,
+    payment_currency TEXT,
+    location TEXT,
+    comments TEXT,
+    status TEXT DEFAULT 'Pending',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+)""",
+        """CREATE TABLE IF NOT EXISTS operational_liquidations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    oa_id INTEGER,  -- ✅ must reference a valid OA record
+    date_request TEXT,
+    staff_name TEXT,
+    programme_unit TEXT,
+    category TEXT,
+    supplier_name TEXT,
+    description TEXT,
+    invoice_type TEXT,
+    invoice_no TEXT,
+    total_amount REAL,
+    invoice_currency TEXT,
+    payment_currency TEXT,
+    liquidation_ist TEXT,
+    liquidation_amount REAL,
+    wbl_project_code TEXT,
+    wbl_task_number TEXT,
+    unspent_amount REAL,
+    unspent_deposit_yesno TEXT,
+    deposited_amount REAL,
+    unspent_ist1 TEXT,
+    unspent_ist2 TEXT,
+    unspent_wbl_project_code TEXT,
+    unspent_wbl_task_number TEXT,
+    documents_submitted TEXT,
+    location TEXT,
+    comments TEXT,
+    status TEXT DEFAULT 'Pending',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (oa_id) REFERENCES operational_advances (id) ON DELETE CASCADE
+)""",
+    ],
+    # 2: secondary indexes for the hot lookups and filters
+    [
+        "CREATE INDEX IF NOT EXISTS idx_pr_tracking_pr_number ON pr_tracking (pr_number)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_tracking_category_pr_number ON pr_tracking (category, pr_number)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_tracking_staff_name ON pr_tracking (staff_name)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_tracking_assigned_to ON pr_tracking (assigned_to)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_tracking_reminder ON pr_tracking (reminder_expiry, from_date)",
+        "CREATE INDEX IF NOT EXISTS idx_payment_tracking_pr_id ON payment_tracking (pr_id)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_wbls_pr_id ON pr_wbls (pr_id)",
+        "CREATE INDEX IF NOT EXISTS idx_operational_liquidations_oa_id ON operational_liquidations (oa_id)",
+        "CREATE INDEX IF NOT EXISTS idx_status_history_record ON status_history (record_id, changed_at)",
+    ],
+    # 3: trigger-maintained summary_rollup (see rollups.py; the triggers
+    # themselves are installed by migrate())
+    [
+        rollups.TABLE_DDL,
+    ],
+    # 4: partial expression index on the reminder date (queries must use
+    # REMINDER_DATE_SQL verbatim for SQLite to match it)
+    [
+        f"""CREATE INDEX IF NOT EXISTS idx_pr_tracking_reminder_date
+            ON pr_tracking ({REMINDER_DATE_SQL}) WHERE reminder_expiry = 'Yes'""",
+    ],
+    # 5: persisted reminder schedule + notification outbox (see reminders.py);
+    # supersedes the expression index from 4
+    [
+        """CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pr_id INTEGER NOT NULL UNIQUE,
+    reminder_date TEXT NOT NULL,
+    notified_at TEXT,
+    FOREIGN KEY (pr_id) REFERENCES pr_tracking (id) ON DELETE CASCADE
+)""",
+        "CREATE INDEX IF NOT EXISTS idx_reminders_date ON reminders (reminder_date)",
+        """CREATE TABLE IF NOT EXISTS reminder_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reminder_id INTEGER,
+    pr_id INTEGER,
+    pr_number TEXT,
+    staff_name TEXT,
+    assigned_to TEXT,
+    from_date TEXT,
+    reminder_date TEXT,
+    message TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+)""",
+        f"""INSERT OR IGNORE INTO reminders (pr_id, reminder_date)
+            SELECT id, {REMINDER_DATE_SQL} FROM pr_tracking
+            WHERE reminder_expiry = 'Yes' AND {REMINDER_DATE_SQL} IS NOT NULL""",
+        "DROP INDEX IF EXISTS idx_pr_tracking_reminder_date",
+    ],
+    # 6: split pr_tracking into pr_headers (one row per distinct header) and
+    # pr_lines. The old table is renamed rather than copied, so line ids and
+    # the foreign keys of pr_wbls / payment_tracking / reminders carry over;
+    # pr_tracking lives on as a view with the old columns.
+    [
+        "DROP INDEX IF EXISTS idx_pr_tracking_pr_number",
+        "DROP INDEX IF EXISTS idx_pr_tracking_category_pr_number",
+        "DROP INDEX IF EXISTS idx_pr_tracking_staff_name",
+        "DROP INDEX IF EXISTS idx_pr_tracking_assigned_to",
+        "DROP INDEX IF EXISTS idx_pr_tracking_reminder",     # unused since 5
+        """CREATE TABLE IF NOT EXISTS pr_headers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pr_number TEXT NOT NULL,
+    date_request TEXT,
+    staff_name TEXT,
+    programme_unit TEXT,
+    type_services TEXT,
+    category TEXT,
+    description TEXT,
+    type_vehicle TEXT,
+    traveller_name TEXT,
+    traveller_phone TEXT,
+    assigned_to TEXT,
+    created_at TEXT
+)""",
+        """INSERT INTO pr_headers (pr_number, date_request, staff_name, programme_unit, type_services,
+                                   category, description, type_vehicle, traveller_name, traveller_phone,
+                                   assigned_to, created_at)
+            SELECT pr_number, date_request, staff_name, programme_unit, type_services,
+                   category, description, type_vehicle, traveller_name, traveller_phone,
+                   assigned_to, MIN(created_at)
+            FROM pr_tracking
+            GROUP BY pr_number, date_request, staff_name, programme_unit, type_services,
+                     category, description, type_vehicle, traveller_name, traveller_phone, assigned_to
+            ORDER BY MIN(id)""",
+        "CREATE INDEX IF NOT EXISTS idx_pr_headers_pr_number ON pr_headers (pr_number)",
+        "ALTER TABLE pr_tracking RENAME TO pr_lines",
+        "ALTER TABLE pr_lines ADD COLUMN header_id INTEGER REFERENCES pr_headers (id) ON DELETE CASCADE",
+        """UPDATE pr_lines SET header_id = (
+            SELECT h.id FROM pr_headers h
+            WHERE h.pr_number = pr_lines.pr_number AND h.date_request IS pr_lines.date_request
+              AND h.staff_name IS pr_lines.staff_name AND h.programme_unit IS pr_lines.programme_unit
+              AND h.type_services IS pr_lines.type_services AND h.category IS pr_lines.category
+              AND h.description IS pr_lines.description AND h.type_vehicle IS pr_lines.type_vehicle
+              AND h.traveller_name IS pr_lines.traveller_name AND h.traveller_phone IS pr_lines.traveller_phone
+              AND h.assigned_to IS pr_lines.assigned_to
+        )""",
+        "ALTER TABLE pr_lines DROP COLUMN pr_number",
+        "ALTER TABLE pr_lines DROP COLUMN date_request",
+        "ALTER TABLE pr_lines DROP COLUMN staff_name",
+        "ALTER TABLE pr_lines DROP COLUMN programme_unit",
+        "ALTER TABLE pr_lines DROP COLUMN type_services",
+        "ALTER TABLE pr_lines DROP COLUMN category",
+        "ALTER TABLE pr_lines DROP COLUMN description",
+        "ALTER TABLE pr_lines DROP COLUMN type_vehicle",
+        "ALTER TABLE pr_lines DROP COLUMN traveller_name",
+        "ALTER TABLE pr_lines DROP COLUMN traveller_phone",
+        "ALTER TABLE pr_lines DROP COLUMN assigned_to",
+        "CREATE INDEX IF NOT EXISTS idx_pr_lines_header_id ON pr_lines (header_id)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_headers_category_pr_number ON pr_headers (category, pr_number)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_headers_staff_name ON pr_headers (staff_name)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_headers_assigned_to ON pr_headers (assigned_to)",
+        """CREATE VIEW IF NOT EXISTS pr_tracking AS
+    SELECT l.id, h.pr_number, h.date_request, h.staff_name, h.programme_unit, h.type_services,
+           h.category, h.description, h.type_vehicle, h.traveller_name, h.traveller_phone,
+           l.from_date, l.to_date, l.days, l.location, l.qty, l.est_cost_pkr, l.est_cost_usd,
+           l.reminder_expiry, l.reminder_days, l.comments, l.status, l.created_at, h.assigned_to,
+           l.header_id
+    FROM pr_lines l JOIN pr_headers h ON h.id = l.header_id""",
+    ],
+    # 7: integer-coded lookup tables (see lookups.py). Each coded TEXT column
+    # becomes <column>_id; values not in the seed lists are added first.
+    [
+        *(f"""CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+)""" for table, _ in LOOKUP_SEEDS),
+        *(f"INSERT OR IGNORE INTO {table} (name) VALUES ('{value}')"
+          for table, values in LOOKUP_SEEDS for value in values),
+        *(f"""INSERT OR IGNORE INTO {lookup} (name)
+            SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} != ''"""
+          for table, column, lookup in LOOKUP_COLUMNS),
+        "DROP VIEW IF EXISTS pr_tracking",
+        "DROP INDEX IF EXISTS idx_pr_headers_category_pr_number",
+        *(step for table, column, lookup in LOOKUP_COLUMNS for step in (
+            f"ALTER TABLE {table} ADD COLUMN {column}_id INTEGER REFERENCES {lookup} (id)",
+            f"UPDATE {table} SET {column}_id = (SELECT id FROM {lookup} WHERE name = {table}.{column})",
+            f"ALTER TABLE {table} DROP COLUMN {column}",
+        )),
+        "CREATE INDEX IF NOT EXISTS idx_pr_headers_category_pr_number ON pr_headers (category_id, pr_number)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_lines_status ON pr_lines (status_id)",
+        """CREATE VIEW IF NOT EXISTS pr_tracking AS
+    SELECT l.id, h.pr_number, h.date_request, h.staff_name, h.programme_unit_id, h.type_services_id,
+           h.category_id, h.description, h.type_vehicle_id, h.traveller_name, h.traveller_phone,
+           l.from_date, l.to_date, l.days, l.location, l.qty, l.est_cost_pkr, l.est_cost_usd,
+           l.reminder_expiry, l.reminder_days, l.comments, l.status_id, l.created_at, h.assigned_to,
+           l.header_id
+    FROM pr_lines l JOIN pr_headers h ON h.id = l.header_id""",
+    ],
+    # 8: amounts as INTEGER minor units (paisa / cents) with upper-case
+    # currency codes, dates as canonical ISO text, indexes for date ranges
+    [
+        "DROP VIEW IF EXISTS pr_tracking",
+        *(step for table, column, _ in MONEY_COLUMNS for step in (
+            f"ALTER TABLE {table} ADD COLUMN {column}_minor INTEGER",
+            # round to cents first, as money.to_minor does: 0.285 * 100 is 28.4999...
+            f"""UPDATE {table} SET {column}_minor = CAST(round(round({column}, 2) * 100) AS INTEGER)
+            WHERE {column} IS NOT NULL AND {column} != ''""",
+            f"ALTER TABLE {table} DROP COLUMN {column}",
+        )),
+        *(f"""UPDATE {table} SET invoice_currency = NULLIF(upper(trim(invoice_currency)), ''),
+                                 payment_currency = NULLIF(upper(trim(payment_currency)), '')"""
+          for table in ("operational_advances", "operational_liquidations")),
+        *(f"""UPDATE {table} SET {column} = date({column})
+            WHERE date({column}) IS NOT NULL AND {column} != date({column})"""
+          for table, column in DATE_COLUMNS),
+        "CREATE INDEX IF NOT EXISTS idx_pr_headers_date_request ON pr_headers (date_request)",
+        "CREATE INDEX IF NOT EXISTS idx_payment_tracking_payment_date ON payment_tracking (payment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_dsa_payments_date_request ON dsa_payments (date_request)",
+        "CREATE INDEX IF NOT EXISTS idx_operational_advances_date_request ON operational_advances (date_request)",
+        "CREATE INDEX IF NOT EXISTS idx_operational_liquidations_date_request"
+        " ON operational_liquidations (date_request)",
+        "CREATE INDEX IF NOT EXISTS idx_status_history_changed_at ON status_history (changed_at)",
+        """CREATE VIEW IF NOT EXISTS pr_tracking AS
+    SELECT l.id, h.pr_number, h.date_request, h.staff_name, h.programme_unit_id, h.type_services_id,
+           h.category_id, h.description, h.type_vehicle_id, h.traveller_name, h.traveller_phone,
+           l.from_date, l.to_date, l.days, l.location, l.qty, l.est_cost_pkr_minor, l.est_cost_usd_minor,
+           l.reminder_expiry, l.reminder_days, l.comments, l.status_id, l.created_at, h.assigned_to,
+           l.header_id
+    FROM pr_lines l JOIN pr_headers h ON h.id = l.header_id""",
+    ],
+    # 9: one payment per PR. Duplicates left by the old read-then-write save
+    # are moved to payment_tracking_duplicates for review; the lowest id (the
+    # one later saves updated) stays. Saving can then be a single INSERT ...
+    # ON CONFLICT (pr_id) DO UPDATE that records the status it replaced in
+    # previous_status_id.
+    [
+        f"""CREATE TABLE IF NOT EXISTS payment_tracking_duplicates AS
+            SELECT *, CURRENT_TIMESTAMP AS archived_at FROM payment_tracking WHERE {DUPLICATE_PAYMENTS}""",
+        f"DELETE FROM payment_tracking WHERE {DUPLICATE_PAYMENTS}",
+        "DROP INDEX IF EXISTS idx_payment_tracking_pr_id",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_tracking_pr_id ON payment_tracking (pr_id)",
+        "ALTER TABLE payment_tracking ADD COLUMN previous_status_id INTEGER REFERENCES lookup_status (id)",
+    ],
+    # 10: background export jobs (jobs.py). `fingerprint` identifies the
+    # report and the table versions it was built from, so a finished
+    # artifact can be handed out again until one of those tables changes.
+    [
+        """CREATE TABLE IF NOT EXISTS export_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued' CHECK (state IN ('queued', 'running', 'done', 'failed')),
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    rows_total INTEGER,
+    artifact TEXT,
+    error TEXT,
+    requested_by TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    finished_at TEXT
+)""",
+        "CREATE INDEX IF NOT EXISTS idx_export_jobs_fingerprint ON export_jobs (fingerprint)",
+        "CREATE INDEX IF NOT EXISTS idx_export_jobs_requested_by ON export_jobs (requested_by, id)",
+    ],
+    # 11: change tracking for delta exports. Every insert or update stamps
+    # updated_at (CURRENT_TIMESTAMP, like created_at) unless the statement
+    # set it itself; deletes are logged to export_deletions. export_jobs
+    # records the watermark a finished delta export reached.
+    [
+        *(step for table in CHANGE_TRACKED for step in (
+            f"ALTER TABLE {table} ADD COLUMN updated_at TEXT",
+            f"""UPDATE {table} SET updated_at = {"COALESCE(created_at, CURRENT_TIMESTAMP)"
+                                                 if table != "pr_wbls" else "CURRENT_TIMESTAMP"}""",
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (updated_at)",
+            f"""CREATE TRIGGER IF NOT EXISTS trg_updated_{table}_insert AFTER INSERT ON {table}
+    WHEN NEW.updated_at IS NULL
+BEGIN
+    UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END""",
+            _update_trigger(table),
+        )),
+        """CREATE TABLE IF NOT EXISTS export_deletions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TEXT DEFAULT CURRENT_TIMESTAMP
+)""",
+        "CREATE INDEX IF NOT EXISTS idx_export_deletions_deleted_at ON export_deletions (deleted_at)",
+        *(f"""CREATE TRIGGER IF NOT EXISTS trg_deleted_{table} AFTER DELETE ON {table}
+BEGIN
+    INSERT INTO export_deletions (table_name, row_id) VALUES ('{logged}', OLD.id);
+END""" for table, logged in CHANGE_TRACKED.items() if logged),
+        "ALTER TABLE export_jobs ADD COLUMN watermark TEXT",
+        "DROP VIEW IF EXISTS pr_tracking",
+        """CREATE VIEW IF NOT EXISTS pr_tracking AS
+    SELECT l.id, h.pr_number, h.date_request, h.staff_name, h.programme_unit_id, h.type_services_id,
+           h.category_id, h.description, h.type_vehicle_id, h.traveller_name, h.traveller_phone,
+           l.from_date, l.to_date, l.days, l.location, l.qty, l.est_cost_pkr_minor, l.est_cost_usd_minor,
+           l.reminder_expiry, l.reminder_days, l.comments, l.status_id, l.created_at, h.assigned_to,
+           l.header_id, max(l.updated_at, h.updated_at) AS updated_at
+    FROM pr_lines l JOIN pr_headers h ON h.id = l.header_id""",
+    ],
+    # 12: per-table write counters, bumped by every db.transaction, so the
+    # result cache sees writes made by other processes
+    [
+        """CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+)""",
+    ],
+    # 13: PR headers and lines were stamped with local time, everything else
+    # (and the delta watermark) with UTC CURRENT_TIMESTAMP. Move their
+    # created_at to UTC, and updated_at where 11 backfilled it from
+    # created_at; the update triggers are lifted meanwhile so the move does
+    # not count as a change.
+    [
+        *(step for table in ("pr_headers", "pr_lines") for step in (
+            f"DROP TRIGGER IF EXISTS trg_updated_{table}_update",
+            f"""UPDATE {table} SET updated_at = CASE WHEN updated_at IS created_at
+                                                     THEN datetime(created_at, 'utc') ELSE updated_at END,
+                                   created_at = datetime(created_at, 'utc')
+                WHERE datetime(created_at) IS NOT NULL""",
+            _update_trigger(table),
+        )),
+    ],
+    # 14: migration 5 backfilled a reminder for every historical PR line,
+    # none of them notified, so the scheduler's first run queued years of
+    # past reminders at once. Reminders dated before today are marked as already sent;
+    # today's and later ones are still delivered.
+    [
+        """UPDATE reminders SET notified_at = CURRENT_TIMESTAMP
+            WHERE notified_at IS NULL AND reminder_date < date('now', 'localtime')""",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply every migration between the database's user_version and `target`.
+
+    The rollup triggers are derived from the current code (rollups.SOURCES),
+    so they are dropped before the first step and reinstalled, with a
+    rebuild, in the same transaction as the upgrade to the latest version.
+    """
+    current = schema_version(conn)
+    for version in range(current + 1, target + 1):
+        conn.execute("BEGIN")
+        try:
+            if version == current + 1:
+                rollups.drop_triggers(conn)
+            for step in MIGRATIONS[version - 1]:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            if version == SCHEMA_VERSION:
+                rollups.install(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return schema_version(conn)
+
+
+# --- Per-table version counters + process-wide result cache ---
+#
+# Every db.transaction also bumps its tables' rows in table_versions, in the
+# same transaction, so writes made by other processes (pr_import.py,
+# rollups.py rebuild, the reminders scheduler) reach this cache too.
+# memoize() asks its connection for PRAGMA data_version, which only changes
+# after another connection has committed, and reads table_versions then. It
+# does so at most every SYNC_SECONDS per connection, so a rerun served from
+# the cache runs no SQL; this process's own writes invalidate at once.
+_lock = threading.Lock()
+_versions = defaultdict(int)
+_stored = {}            # table -> version last read from / written to table_versions
+_cache = {}
+_stats = {"hits": 0, "misses": 0}
+MAX_CACHE_ENTRIES = 256
+SYNC_SECONDS = 1.0      # how long other processes' writes may go unnoticed
+
+
+def _cascade(tables):
+    """`tables` and everything written with them (CASCADES), once each."""
+    seen, pending = {}, list(tables)
+    while pending:
+        table = pending.pop()
+        if table not in seen:
+            seen[table] = None
+            pending.extend(CASCADES.get(table, ()))
+    return list(seen)
+
+
+def invalidate(*tables):
+    """Bump the version of each table (and its cascade children) after a write."""
+    with _lock:
+        for table in _cascade(tables):
+            _versions[table] += 1
+
+
+def store_versions(cur, tables):
+    """Bump the table_versions rows of `tables` (and their cascade children)
+    inside the writing transaction. Returns {table: new version}."""
+    return {table: cur.execute("""INSERT INTO table_versions (name, version) VALUES (?, 1)
+                                  ON CONFLICT (name) DO UPDATE SET version = version + 1
+                                  RETURNING version""", (table,)).fetchone()[0]
+            for table in _cascade(tables)}
+
+
+def stored_versions(conn, tables):
+    """[version in table_versions] for each of `tables` (0 if never written)."""
+    stored = dict(conn.execute("SELECT name, version FROM table_versions"))
+    return [stored.get(t, 0) for t in tables]
+
+
+def sync(conn):
+    """Invalidate the tables other connections (threads or processes) have
+    written since `conn` last looked. One PRAGMA when nothing changed, and
+    nothing at all within SYNC_SECONDS of the last look."""
+    if isinstance(conn, Connection):
+        now = time.monotonic()
+        if conn.synced_at is not None and now - conn.synced_at < SYNC_SECONDS:
+            return
+        conn.synced_at = now
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if getattr(conn, "data_version", None) == data_version:
+        return
+    try:
+        rows = conn.execute("SELECT name, version FROM table_versions").fetchall()
+    except sqlite3.OperationalError:        # not migrated yet
+        return
+    if isinstance(conn, Connection):
+        conn.data_version = data_version
+    with _lock:
+        for table, version in rows:
+            if version > _stored.get(table, 0):
+                _stored[table] = version
+                _versions[table] += 1
+
+
+def memoize(conn, key, tables, compute):
+    """Return compute()'s result, reusing it while none of `tables` has been
+    written (by any process) since it was computed. The value is shared:
+    don't mutate it."""
+    sync(conn)
+    with _lock:
+        stamp = tuple(_versions[t] for t in tables)
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            _stats["hits"] += 1
+            return entry[1]
+        _stats["misses"] += 1
+
+    value = compute()
+
+    with _lock:
+        # Only store if nothing was written while we were computing
+        if stamp == tuple(_versions[t] for t in tables):
+            _cache.pop(key, None)
+            if len(_cache) >= MAX_CACHE_ENTRIES:
+                _cache.pop(next(iter(_cache)))
+            _cache[key] = (stamp, value)
+    return value
+
+
+def read_cached(conn, sql, tables, params=()):
+    """Run `sql` through pandas, reusing the last result while none of
+    `tables` has been written since. Callers get their own copy.
+    `params` may be a sequence (? placeholders) or a dict (:name)."""
+    if isinstance(params, dict):
+        key, args = tuple(sorted(params.items())), params
+    else:
+        key, args = tuple(params), list(params)
+    df = memoize(conn, (sql, key), tables, lambda: pd.read_sql(sql, conn, params=args))
+    return df.copy()
+
+
+def cache_stats():
+    with _lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _stats["hits"] = _stats["misses"] = 0
+
+
+# ==============================
+# Connection pool
+# ==============================
+#
+# One connection per worker thread, so concurrent sessions never share
+# cursor state. When a thread finishes (Streamlit uses a fresh thread per
+# script run) its connection goes back to the idle list for reuse.
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",        # readers never block the writer
+    "PRAGMA synchronous = NORMAL",      # safe with WAL, far fewer fsyncs
+    "PRAGMA foreign_keys = ON",         # ✅ enforce FKs
+    "PRAGMA busy_timeout = 5000",       # wait for the write lock instead of failing
+    "PRAGMA mmap_size = 268435456",     # 256 MB of the file read via mmap
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class Connection(sqlite3.Connection):
+    """Pool connection; remembers the PRAGMA data_version sync() last saw,
+    and when."""
+    data_version = None
+    synced_at = None
+
+
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, max_idle=16):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=Connection)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def connection(self):
+        """The calling thread's connection (opened or taken from the idle list)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._open()
+            self._local.conn = conn
+            weakref.finalize(threading.current_thread(), self._release, conn)
+        return conn
+
+    @contextmanager
+    def transaction(self, *tables):
+        """BEGIN IMMEDIATE ... COMMIT on this thread's connection; rolls back on
+        error and invalidates cached reads of `tables`, in every process,
+        once committed."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.cursor()
+            yield cur
+            stored = store_versions(cur, tables)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        invalidate(*tables)
+        with _lock:
+            for table, version in stored.items():
+                _stored[table] = max(_stored.get(table, 0), version)
+
+
+pool = ConnectionPool()
+connection = pool.connection
+transaction = pool.transaction
+
+
+# --- Keyset pagination ---
+_columns = {}
+
+
+def table_columns(conn, table):
+    """Column names of `table`, looked up once per process."""
+    if table not in _columns:
+        _columns[table] = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+    return _columns[table]
+
+
+def read_page(conn, table, where="1=1", params=(), sort="id", descending=False,
+              after=None, page_size=50, columns=None):
+    """Return one page of `table` ordered by (sort, id).
+
+    `after` is the (sort value, id) pair of the last row of the previous page,
+    so each page is an index seek instead of an OFFSET scan. Returns the
+    frame and the cursor for the next page (None on the last page).
+    `columns` limits the SELECT to what is displayed (id is always included).
+    """
+    cols = columns or table_columns(conn, table)
+    if sort not in cols:
+        raise ValueError(f"Unknown sort column {sort!r} for {table}")
+
+    op, direction = ("<", "DESC") if descending else (">", "ASC")
+    select = ", ".join(["id"] + [c for c in columns if c != "id"]) if columns else "*"
+
+    def rows(condition, args, limit):
+        sql = f"""SELECT {select} FROM {table} WHERE ({where}) AND {condition}
+                  ORDER BY {sort} {direction}{"" if sort == "id" else f", id {direction}"} LIMIT ?"""
+        return read_cached(conn, sql, [table], [*params, *args, limit])
+
+    limit = int(page_size) + 1        # one extra row tells us if there is a next page
+    if sort == "id":
+        df = rows(f"id {op} ?", [after[1]], limit) if after is not None else rows("1=1", [], limit)
+    else:
+        # The seek and ORDER BY use the raw column so an index on it serves
+        # both. NULLs never compare, so they are read as a run of their own:
+        # first when ascending, last when descending (SQLite's NULL order).
+        nulls, values = f"{sort} IS NULL", f"{sort} IS NOT NULL"
+        runs = [[values, []], [nulls, []]] if descending else [[nulls, []], [values, []]]
+        if after is not None:            # resume inside the run the cursor is in
+            value, last_id = after
+            runs = runs[[run[0] for run in runs].index(nulls if value is None else values):]
+            runs[0] = ([f"{nulls} AND id {op} ?", [last_id]] if value is None
+                       else [f"({sort}, id) {op} (?, ?)", [value, last_id]])
+        parts = []
+        for condition, args in runs:
+            part = rows(condition, args, limit - sum(map(len, parts)))
+            if len(part) or not parts:
+                parts.append(part)
+            if sum(map(len, parts)) >= limit:
+                break
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        sort_value = last[sort]
+        next_cursor = (None if pd.isna(sort_value) else _plain(sort_value), int(last["id"]))
+    return df, next_cursor
+
+
+def count_rows(conn, table, where="1=1", params=()):
+    df = read_cached(conn, f"SELECT COUNT(*) AS n FROM {table} WHERE ({where})", [table], params)
+    return int(df["n"].iloc[0])
+
+
+def date_range(column, start=None, end=None):
+    """WHERE clause and params for `start <= column <= end` (either bound may
+    be None). Dates and timestamps are ISO text, so the whole of `end`'s day
+    is included and an index on `column` serves the range."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(str(start)[:10])
+    if end is not None:
+        clauses.append(f"{column} < ?")
+        params.append(str(date.fromisoformat(str(end)[:10]) + timedelta(days=1)))
+    return " AND ".join(clauses) or "1=1", params
+
+
+def watermark(conn):
+    """CURRENT_TIMESTAMP read while holding the write lock. Every row stamped
+    (updated_at, changed_at, ...) before it has committed, so reading rows
+    stamped < watermark now and >= watermark next time misses none."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        return conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+    finally:
+        conn.rollback()
+
+
+def _plain(value):
+    # numpy scalars -> Python scalars so sqlite3 can bind them
+    return value.item() if hasattr(value, "item") else value
+
+
+# --- Dashboard metrics ---
+def rollup_status_metrics(conn, source, category=None):
+    """Same shape as pr_status_metrics(), read from summary_rollup (O(groups))."""
+    sql = f"""SELECT status, SUM(n) AS n, SUM(pkr) / 100.0 AS pkr, SUM(usd) / 100.0 AS usd
+              FROM summary_rollup WHERE source=?{" AND category=?" if category else ""}
+              GROUP BY status"""
+    df = read_cached(conn, sql, ["summary_rollup"], [source] + ([category] if category else []))
+    return {row.status: {"n": int(row.n), "pkr": float(row.pkr), "usd": float(row.usd)}
+            for row in df.itertuples(index=False)}
+
+
+def pr_status_metrics(conn, where="1=1", params=()):
+    """Line count and estimated PKR/USD totals per PR status, in one GROUP BY."""
+    df = read_cached(conn, f"""
+        SELECT (SELECT name FROM lookup_status WHERE id = g.status_id) AS status, n, pkr, usd
+        FROM (SELECT status_id, COUNT(*) AS n,
+                     COALESCE(SUM(est_cost_pkr_minor), 0) / 100.0 AS pkr,
+                     COALESCE(SUM(est_cost_usd_minor), 0) / 100.0 AS usd
+              FROM pr_tracking WHERE ({where})
+              GROUP BY status_id) AS g
+    """, ["pr_tracking", "lookup_status"], params)
+    return {row.status: {"n": int(row.n), "pkr": float(row.pkr), "usd": float(row.usd)}
+            for row in df.itertuples(index=False)}
+
+
+# --- Distinct-value index for filter pickers ---
+def distinct_values(conn, table, column, where="1=1", params=()):
+    """Sorted distinct non-null values of table.column (optionally for rows
+    matching `where`), cached until PR lines are inserted or deleted."""
+    def compute():
+        rows = conn.execute(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND ({where})",
+                            list(params))
+        return sorted(str(r[0]) for r in rows)
+    return memoize(conn, ("distinct", table, column, where, tuple(params)), [PR_KEYS], compute)
+
+
+def pr_line_options(conn, category_id, pr_number):
+    """{line id: picker label} for the lines of one PR in a category, reading
+    only the label columns."""
+    df = read_cached(conn, """SELECT id, pr_number, description, staff_name FROM pr_tracking
+                              WHERE category_id=? AND pr_number=? ORDER BY id""",
+                     ["pr_tracking"], [category_id, pr_number])
+    labels = ("ID " + df["id"].astype(str) + " | " + df["pr_number"].astype(str)
+              + " | " + df["description"].fillna("").astype(str) + " | " + df["staff_name"].fillna("").astype(str))
+    return dict(zip(df["id"].tolist(), labels.tolist()))
+
+
+def open_advance_options(conn):
+    """{OA id: picker label} for operational advances without a liquidation
+    record, cached until either table is written."""
+    def compute():
+        df = pd.read_sql("""SELECT id, supplier_name, description FROM operational_advances oa
+                            WHERE NOT EXISTS (SELECT 1 FROM operational_liquidations li WHERE li.oa_id = oa.id)
+                            ORDER BY id""", conn)
+        labels = ("ID " + df["id"].astype(str) + " | " + df["supplier_name"].fillna("").astype(str)
+                  + " | " + df["description"].fillna("").astype(str))
+        return dict(zip(df["id"].tolist(), labels.tolist()))
+    return memoize(conn, "open_advances", ["operational_advances", "operational_liquidations"], compute)
+
+
+def search_labels(options, query, limit=50):
+    """Up to `limit` keys of the {key: label} dict `options` whose label
+    contains `query` (case-insensitive), in dict order."""
+    needle = query.strip().lower()
+    matches = []
+    for key, label in options.items():
+        if needle in label.lower():
+            matches.append(key)
+            if len(matches) == limit:
+                break
+    return matches
+
+
+def search_values(values, query, limit=50):
+    """Up to `limit` entries of the sorted list `values` matching `query`:
+    prefix matches first (binary search), then substring matches."""
+    query = query.strip()
+    if not query:
+        return values[:limit]
+    start = bisect.bisect_left(values, query)
+    matches = []
+    for value in values[start:]:
+        if not value.startswith(query) or len(matches) == limit:
+            break
+        matches.append(value)
+    if len(matches) < limit:
+        needle = query.lower()
+        seen = set(matches)
+        for value in values:
+            if needle in value.lower() and value not in seen:
+                matches.append(value)
+                if len(matches) == limit:
+                    break
+    return matches
@@ -0,0 +1,430 @@
+# ==============================
+# Report exports streamed from SQLite
+# ==============================
+#
+# Rows go straight from a cursor into xlsxwriter in constant_memory mode,
+# one row at a time, so memory stays flat however large the export. Lookup
+# ids are written as their names, *_minor amounts as rupees / dollars and
+# calendar dates as Excel dates. Each export goes to its own spooled
+# temporary file (in memory while small, on disk beyond SPOOL_BYTES and
+# deleted when closed), so concurrent users never share a file.
+#
+# The same reports can be bundled as a zip of one Parquet, Arrow IPC or
+# gzip CSV file per table instead (see FORMATS), which are much quicker to
+# write and for other tools to read back.
+
+import gzip
+import importlib.util
+import io
+import queue
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+import xlsxwriter
+
+import db
+import frames
+import lookups
+import money
+
+SPOOL_BYTES = 32 * 2**20
+MAX_SHEET_ROWS = 1_048_576          # Excel's limit, header included
+FETCH_ROWS = 5000
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+
+QUEUE_BATCHES = 4                   # fetched batches buffered per writer thread
+
+# Sheets of the full export: (sheet, table), filtered on frames.RANGE_COLUMNS
+# (WBL allocations on their PR line's request date)
+FULL_REPORT = (
+    ("PRs", "pr_tracking"),
+    ("PR_WBLs", "pr_wbls"),
+    ("Payments", "payment_tracking"),
+    ("DSA_Payments", "dsa_payments"),
+    ("Operational_Advances", "operational_advances"),
+    ("Operational_Liquidations", "operational_liquidations"),
+    ("Timeline", "status_history"),
+)
+DATE_COLUMNS = {col for schema in frames.SCHEMAS.values() for col in schema.get("date", ())}
+
+
+def _converter(conn, column):
+    """Per-cell conversion for a result column, or None to write it as is."""
+    domain = lookups.domain_of(column)
+    if domain is not None:
+        names, _, positions = lookups.load(conn)[domain]
+        return {i: names[pos] for i, pos in enumerate(positions) if pos >= 0}.get
+    if column.endswith("_minor"):
+        return money.to_major
+    if column in DATE_COLUMNS:
+        return _parse_date
+    return None
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return (date.fromisoformat(value) if len(value) == 10
+                else datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        return value                 # leave unparseable text as it was typed
+
+
+def write_query(workbook, sheet, conn, sql, params=(), progress=None):
+    """Stream the rows of `sql` into new worksheet(s) named `sheet` (continued
+    on "sheet (2)", ... past Excel's row limit). `progress(rows)` is called
+    after each batch written. Returns the row count."""
+    cur = conn.execute(sql, list(params))
+    columns = [d[0] for d in cur.description]
+    headers = [frames.label(c) for c in columns]
+    converters = [(i, fn) for i, c in enumerate(columns) if (fn := _converter(conn, c)) is not None]
+    bold = workbook.add_format({"bold": True})
+
+    part, ws, row, total = 0, None, MAX_SHEET_ROWS, 0
+    while batch := cur.fetchmany(FETCH_ROWS):
+        for values in batch:
+            if row == MAX_SHEET_ROWS:
+                part += 1
+                ws = workbook.add_worksheet(sheet if part == 1 else f"{sheet} ({part})"[:31])
+                ws.write_row(0, 0, headers, bold)
+                row = 1
+            if converters:
+                values = list(values)
+                for i, fn in converters:
+                    values[i] = fn(values[i])
+            ws.write_row(row, 0, values)
+            row += 1
+        total += len(batch)
+        if progress:
+            progress(len(batch))
+    if ws is None:
+        workbook.add_worksheet(sheet).write_row(0, 0, headers, bold)
+    return total
+
+
+def _workbook_file(sheets, out=None):
+    """Run `sheets(workbook)` on a constant-memory workbook writing to `out`
+    (a path or file object; a new spooled temporary file by default) and
+    return `out`, positioned at the start if it is a file."""
+    if out is None:
+        out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    workbook = xlsxwriter.Workbook(out, {"constant_memory": True,
+                                         "default_date_format": "yyyy-mm-dd",
+                                         "strings_to_numbers": False,
+                                         "strings_to_formulas": False,
+                                         "strings_to_urls": False})
+    try:
+        sheets(workbook)
+    finally:
+        workbook.close()
+    if hasattr(out, "seek"):
+        out.seek(0)
+    return out
+
+
+# --- Columnar formats ---
+#
+# Each column gets one type for the whole table, from its declared SQLite
+# type, so every chunk of a table has the same schema. As in frames.typed,
+# values that do not parse become nulls. pyarrow is imported only when a
+# Parquet or Arrow file is written.
+
+def _kind(column, declared):
+    if lookups.domain_of(column) is not None:
+        return "lookup"
+    if column.endswith("_minor"):
+        return "money"
+    if column in DATE_COLUMNS:
+        return "date"
+    if "INT" in declared:
+        return "int"
+    if declared in ("REAL", "FLOAT", "DOUBLE", "NUMERIC"):
+        return "float"
+    return "text"
+
+
+def _decoder(conn, column, kind, dates):
+    if kind == "lookup":
+        names = _converter(conn, column)
+        return lambda s: s.map(names, na_action="ignore").astype("string")
+    if kind == "money":
+        return lambda s: pd.to_numeric(s, errors="coerce").astype("float64") / money.MINOR_UNITS
+    if kind == "date" and dates:
+        return lambda s: pd.to_datetime(s, errors="coerce", format="ISO8601")
+    if kind == "int":
+        return lambda s: pd.to_numeric(s, errors="coerce").astype("Int64")
+    if kind == "float":
+        return lambda s: pd.to_numeric(s, errors="coerce").astype("float64")
+    return lambda s: s.astype("string")            # keeps NULLs (astype(str) writes "None" on pandas 2)
+
+
+def _reader(conn, table, sql, params=(), dates=True):
+    """Run `sql` (a SELECT on `table`) and return (cursor, columns, decode):
+    the (label, kind) of each result column and a function turning a batch
+    of fetched rows into a typed frame. decode only uses values looked up
+    here, so it can run on another thread. Dates stay ISO text unless
+    `dates`."""
+    declared = {name: (decl or "").upper() for _, name, decl, *_ in conn.execute(f"PRAGMA table_info({table})")}
+    cur = conn.execute(sql, list(params))
+    names = [d[0] for d in cur.description]
+    kinds = [_kind(c, declared.get(c, "")) for c in names]
+    decoders = [_decoder(conn, c, k, dates) for c, k in zip(names, kinds)]
+    labels = [frames.label(c) for c in names]
+
+    def decode(batch):
+        df = pd.DataFrame(batch, columns=names, dtype=object)
+        return pd.DataFrame({label: fn(df[c]) for label, c, fn in zip(labels, names, decoders)})
+
+    return cur, list(zip(labels, kinds)), decode
+
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+
+    types = {"lookup": pa.string(), "money": pa.float64(), "date": pa.timestamp("ms"),
+             "int": pa.int64(), "float": pa.float64(), "text": pa.string()}
+    return pa.schema([(label, types[kind]) for label, kind in columns])
+
+
+def _write_parquet(out, columns, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(columns)
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for df in chunks:
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+
+
+def _write_arrow(out, columns, chunks):
+    import pyarrow as pa
+
+    schema = _arrow_schema(columns)
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_file(out, schema, options=options) as writer:
+        for df in chunks:
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+
+
+def _write_csv(out, columns, chunks):
+    with gzip.GzipFile(fileobj=out, mode="wb") as gz, \
+            io.TextIOWrapper(gz, encoding="utf-8", newline="") as text:
+        for i, df in enumerate(chunks):
+            df.to_csv(text, index=False, header=i == 0)
+
+
+# format -> (label, file extension, writer); "xlsx" writes every table to
+# one workbook, the others zip one file per table
+FORMATS = {
+    "xlsx": ("Excel", ".xlsx", None),
+    "parquet": ("Parquet", ".parquet", _write_parquet),
+    "arrow": ("Arrow IPC", ".arrow", _write_arrow),
+    "csv": ("CSV (gzip)", ".csv.gz", _write_csv),
+}
+
+
+def formats():
+    """FORMATS usable in this install: Parquet and Arrow need pyarrow."""
+    arrow = importlib.util.find_spec("pyarrow") is not None
+    return [fmt for fmt in FORMATS if arrow or fmt not in ("parquet", "arrow")]
+
+
+def file_type(fmt):
+    """(extension, MIME type) of a report downloaded in `fmt`."""
+    return (".xlsx", XLSX_MIME) if fmt == "xlsx" else (".zip", ZIP_MIME)
+
+
+@contextmanager
+def snapshot(conn):
+    """Run the block in one read transaction: in WAL mode every query in it
+    sees the database as of the first read, whatever commits meanwhile.
+    Nested uses share the outer transaction."""
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()     # take the snapshot now
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def _select(table, where, order):
+    return f"SELECT * FROM {table} WHERE {where} ORDER BY {order}"
+
+
+def _put(q, item, writer):
+    """Queue `item` for a writer thread, re-raising its error if it died."""
+    while True:
+        try:
+            return q.put(item, timeout=1)
+        except queue.Full:
+            if writer.done():
+                writer.result()
+
+
+def _stop(q):
+    """Replace whatever is queued with the end marker."""
+    while True:
+        try:
+            return q.put_nowait(None)
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def _write_parallel(conn, parts, fmt, bundle, progress=None):
+    """Stream every part into the zip `bundle`. This thread reads the
+    parts' cursors in turn, all inside the caller's snapshot; one writer
+    thread per part decodes and compresses its batches into a spooled file
+    (pyarrow, zlib and zstd release the GIL), then the files are stored in
+    the zip in part order."""
+    _, extension, write = FORMATS[fmt]
+    readers = [(name, *_reader(conn, table, _select(table, where, order), params, dates=fmt != "csv"))
+               for name, table, where, params, order in parts]
+    queues = [queue.Queue(QUEUE_BATCHES) for _ in readers]
+    files = [tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) for _ in readers]
+
+    def frames_from(q, decode):
+        empty = True
+        while (batch := q.get()) is not None:
+            empty = False
+            yield decode(batch)
+        if empty:
+            yield decode([])
+
+    try:
+        with ThreadPoolExecutor(len(readers), thread_name_prefix="export") as pool:
+            writers = [pool.submit(write, f, columns, frames_from(q, decode))
+                       for f, q, (_, _, columns, decode) in zip(files, queues, readers)]
+            try:
+                pending = list(range(len(readers)))
+                while pending:
+                    for i in list(pending):
+                        batch = readers[i][1].fetchmany(FETCH_ROWS)
+                        _put(queues[i], batch or None, writers[i])
+                        if not batch:
+                            pending.remove(i)
+                        elif progress:
+                            progress(len(batch))
+            except BaseException:
+                for q in queues:                    # let the writers stop so the pool can shut down
+                    _stop(q)
+                raise
+            for writer in writers:
+                writer.result()
+        for (name, *_), f in zip(readers, files):
+            f.seek(0)
+            with bundle.open(name + extension, "w", force_zip64=True) as member:
+                shutil.copyfileobj(f, member, 2**20)
+    finally:
+        for f in files:
+            f.close()
+
+
+def write_report(conn, parts, fmt="xlsx", out=None, progress=None):
+    """Write `parts`, (name, table, where, params, order) tuples, from one
+    read snapshot as one workbook or a zip bundle of one `fmt` file per
+    part. `out` is a path or file object, a new spooled temporary file by
+    default; returns `out`, positioned at the start if it is a file.
+
+    xlsxwriter builds a workbook on one thread, so Excel sheets are written
+    one after another; the other formats get a writer thread per part."""
+    with snapshot(conn):
+        if fmt == "xlsx":
+            def sheets(workbook):
+                for name, table, where, params, order in parts:
+                    write_query(workbook, name, conn, _select(table, where, order), params, progress)
+            return _workbook_file(sheets, out)
+
+        if out is None:
+            out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        # members are compressed already, so the zip only stores them
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as bundle:
+            _write_parallel(conn, parts, fmt, bundle, progress)
+    if hasattr(out, "seek"):
+        out.seek(0)
+    return out
+
+
+def pr_parts(pr_id):
+    """The PR line, its payment and its status timeline."""
+    return [
+        ("PR", "pr_tracking", "id=?", [pr_id], "id"),
+        ("Payments", "payment_tracking", "pr_id=?", [pr_id], "id"),
+        ("Timeline", "status_history", "record_id=?", [str(pr_id)], "changed_at"),
+    ]
+
+
+def _full_range(table, start, end):
+    if table != "pr_wbls":
+        return db.date_range(frames.RANGE_COLUMNS[table], start, end)
+    if start is None and end is None:
+        return "1=1", []
+    where, params = db.date_range("date_request", start, end)
+    return f"pr_id IN (SELECT id FROM pr_tracking WHERE {where})", params
+
+
+def full_parts(start=None, end=None):
+    """Every table of FULL_REPORT, optionally limited to [start, end] on
+    each table's report date."""
+    return [(sheet, table, *_full_range(table, start, end), "id") for sheet, table in FULL_REPORT]
+
+
+# Column each FULL_REPORT table's new and changed rows are found by
+DELTA_COLUMNS = {table: "updated_at" for _, table in FULL_REPORT}
+DELTA_COLUMNS["status_history"] = "changed_at"      # append-only
+
+
+def _window(column, since, until):
+    if since is None:
+        return f"{column} < ?", [until]
+    return f"{column} >= ? AND {column} < ?", [since, until]
+
+
+def delta_parts(since, until):
+    """Rows of every FULL_REPORT table inserted or changed in [since, until)
+    (everything before `until` if `since` is None) and, after a previous
+    delta, the ids deleted in that window."""
+    parts = []
+    for sheet, table in FULL_REPORT:
+        where, params = _window(DELTA_COLUMNS[table], since, until)
+        if table == "pr_tracking" and since is not None:
+            # the view's updated_at is max(line, header): find candidates
+            # through the two indexed columns
+            where += """ AND id IN (SELECT id FROM pr_lines WHERE updated_at >= ?
+                                    UNION ALL
+                                    SELECT l.id FROM pr_headers h JOIN pr_lines l ON l.header_id = h.id
+                                    WHERE h.updated_at >= ?)"""
+            params += [since, since]
+        parts.append((sheet, table, where, params, "id"))
+    if since is not None:
+        parts.append(("Deleted", "export_deletions", *_window("deleted_at", since, until), "id"))
+    return parts
+
+
+def pr_report(conn, pr_id, fmt="xlsx"):
+    """The PR's report as bytes (a few rows), ready for st.download_button,
+    which does not take temporary file objects."""
+    with write_report(conn, pr_parts(pr_id), fmt) as f:
+        return f.read()
+
+
+def full_report(conn, start=None, end=None, fmt="xlsx", out=None, progress=None):
+    return write_report(conn, full_parts(start, end), fmt, out, progress)
+
+
+def count_rows(conn, parts):
+    """Number of rows write_report() will write for `parts`."""
+    return sum(db.count_rows(conn, table, where, params) for _, table, where, params, _ in parts)
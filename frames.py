@@ -0,0 +1,134 @@
+# ==============================
+# Typed DataFrame loaders
+# ==============================
+#
+# pd.read_sql hands back every TEXT column as Python strings, so dates,
+# names and yes/no flags all land in object columns. SCHEMAS lists the
+# column kinds of each table and typed() applies them to a frame read from
+# that table: lookup ids become categoricals (lookups.decode), amounts in
+# minor units become float64 rupees / dollars (money.decode), repetitive
+# text becomes categorical, dates become datetime64, counts are downcast and
+# integer columns holding NULLs become nullable ints. Keys (id, pr_id, ...)
+# keep int64 since they are bound back into queries.
+
+import numpy as np
+import pandas as pd
+
+import db
+import lookups
+import money
+
+# table -> {kind: columns}; columns not listed are left as read
+SCHEMAS = {
+    "pr_tracking": {
+        "date": ("date_request", "from_date", "to_date", "created_at", "updated_at"),
+        "category": ("staff_name", "assigned_to", "location", "reminder_expiry"),
+        "int": ("days", "qty", "reminder_days"),
+    },
+    "pr_wbls": {
+        "date": ("updated_at",),
+        "category": ("project_name", "task_name"),
+        "int": ("percentage",),
+    },
+    "payment_tracking": {
+        "date": ("payment_date", "created_at", "updated_at"),
+        "category": ("work_confirmation", "work_order_yesno"),
+    },
+    "dsa_payments": {
+        "date": ("date_request", "start_date", "end_date", "created_at", "updated_at"),
+        "category": ("staff_name", "vendor_name", "location"),
+        "float": ("days",),
+    },
+    "operational_advances": {
+        "date": ("date_request", "created_at", "updated_at"),
+        "category": ("staff_name", "supplier_name", "invoice_type", "invoice_currency",
+                     "payment_currency", "location"),
+    },
+    "operational_liquidations": {
+        "date": ("date_request", "created_at", "updated_at"),
+        "category": ("staff_name", "category", "supplier_name", "invoice_type", "invoice_currency",
+                     "payment_currency", "unspent_deposit_yesno", "documents_submitted", "location"),
+    },
+    "status_history": {
+        "date": ("changed_at",),
+        "category": ("record_type", "old_status", "new_status", "changed_by"),
+    },
+}
+
+
+def _date(s):
+    return pd.to_datetime(s, errors="coerce", format="ISO8601")
+
+
+def _category(s):
+    return s.astype("category")
+
+
+def _int(s):
+    """Smallest integer dtype holding the column; nullable (Int8...) if it has NULLs."""
+    s = pd.to_numeric(s, errors="coerce")
+    if s.isna().all():
+        return s.astype("Int8")
+    lo, hi = s.min(), s.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.iinfo(dtype).min <= lo and hi <= np.iinfo(dtype).max:
+            break
+    return s.astype(dtype.__name__.capitalize() if s.hasnans else dtype)
+
+
+def _float(s):
+    return pd.to_numeric(s, errors="coerce", downcast="float")
+
+
+CONVERTERS = {"date": _date, "category": _category, "int": _int, "float": _float}
+
+
+def typed(conn, table, df):
+    """Apply SCHEMAS[table] to `df` (any subset of the table's columns) and
+    decode its lookup ids and amounts. Returns a new frame."""
+    converted = {
+        col: CONVERTERS[kind](df[col])
+        for kind, columns in SCHEMAS[table].items()
+        for col in columns if col in df
+    }
+    return money.decode(lookups.decode(conn, df.assign(**converted) if converted else df.copy()))
+
+
+# Date column date-bounded reports filter each table on
+RANGE_COLUMNS = {
+    "pr_tracking": "date_request",
+    "payment_tracking": "payment_date",
+    "dsa_payments": "date_request",
+    "operational_advances": "date_request",
+    "operational_liquidations": "date_request",
+    "status_history": "changed_at",
+}
+
+
+def label(column):
+    """Display name of a stored column ("category_id" -> "category",
+    "est_cost_pkr_minor" -> "est_cost_pkr")."""
+    return lookups.label(money.label(column))
+
+
+def load(conn, table, where="1=1", params=(), order="id"):
+    """Typed rows of `table` matching `where`, cached until the table is written.
+    Callers get their own copy."""
+    sql = f"SELECT * FROM {table} WHERE ({where}) ORDER BY {order}"
+    key = ("frames", sql, tuple(params))
+    df = db.memoize(conn, key, [table, *lookups.TABLES.values()],
+                    lambda: typed(conn, table, pd.read_sql(sql, conn, params=list(params))))
+    return df.copy()
+
+
+def load_range(conn, table, start=None, end=None, where="1=1", params=()):
+    """Typed rows of `table` whose RANGE_COLUMNS date lies in [start, end]
+    (inclusive dates, either may be None), read through its date index."""
+    column = RANGE_COLUMNS[table]
+    in_range, range_params = db.date_range(column, start, end)
+    return load(conn, table, f"({where}) AND {in_range}", [*params, *range_params], order=f"{column}, id")
+
+
+def memory_usage(df):
+    """Bytes held by `df`, including the Python strings of object columns."""
+    return int(df.memory_usage(index=False, deep=True).sum())
@@ -3,11 +3,20 @@
 # ==============================
 
 import streamlit as st
-import sqlite3
 import pandas as pd
 import hashlib
+import os
 import time
-from datetime import datetime
+
+import db
+import exports
+import frames
+import jobs
+import lookups
+import money
+import pr_import
+import pr_submit
+import reminders as reminders_service
 
 # --- PAGE CONFIG (must be first Streamlit command) ---
 st.set_page_config(
@@ -18,166 +27,6 @@ st.set_page_config(
 
 from streamlit_cookies_manager import EncryptedCookieManager
 
-# --- DB connection ---
-conn = sqlite3.connect("pr_system.db", check_same_thread=False)
-c = conn.cursor()
-c.execute("PRAGMA foreign_keys = ON")   # ✅ enforce FKs
-
-# --- Create tables ---
-c.execute("""CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL,
-    role TEXT NOT NULL DEFAULT 'Admin'
-)""")
-
-c.execute("""CREATE TABLE IF NOT EXISTS pr_tracking (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    pr_number TEXT NOT NULL,   -- ✅ not unique anymore
-    date_request TEXT,
-    staff_name TEXT,
-    programme_unit TEXT,
-    type_services TEXT,
-    category TEXT,
-    description TEXT,
-    type_vehicle TEXT,
-    traveller_name TEXT,
-    traveller_phone TEXT,
-    from_date TEXT,
-    to_date TEXT,
-    days INTEGER,
-    location TEXT,
-    qty INTEGER,
-    est_cost_pkr REAL,
-    est_cost_usd REAL,
-    reminder_expiry TEXT,
-    reminder_days INTEGER,
-    comments TEXT,
-    status TEXT DEFAULT 'Submitted',
-    created_at TEXT,
-    assigned_to TEXT
-)""")
-
-# --- WBL allocations now store free-text project/task names ---
-c.execute("""CREATE TABLE IF NOT EXISTS pr_wbls (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    pr_id INTEGER NOT NULL,             -- ✅ foreign key to PR ID
-    project_name TEXT NOT NULL,
-    task_name TEXT NOT NULL,
-    percentage INTEGER NOT NULL,
-    FOREIGN KEY (pr_id) REFERENCES pr_tracking (id) ON DELETE CASCADE
-)""")
-
-c.execute("""CREATE TABLE IF NOT EXISTS payment_tracking (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    pr_id INTEGER,                      -- ✅ link to PR by ID
-    pr_number TEXT,                     -- keep original PR number for reference
-    category TEXT,
-    po_number TEXT,
-    invoice_number TEXT,
-    wave_receipt TEXT,
-    work_confirmation TEXT,             -- ✅ NEW field (Yes/No)
-    work_order_yesno TEXT,
-    work_order_number TEXT,
-    actual_usd REAL,
-    actual_pkr REAL,
-    payment_date TEXT,
-    remarks TEXT,
-    status TEXT DEFAULT 'Pending',
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (pr_id) REFERENCES pr_tracking (id) ON DELETE CASCADE
-)""")
-
-
-c.execute("""CREATE TABLE IF NOT EXISTS dsa_payments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date_request TEXT,
-    staff_name TEXT,
-    programme_unit TEXT,
-    type_services TEXT,
-    dsa_type TEXT,
-    vendor_name TEXT,
-    description TEXT,
-    location TEXT,
-    start_date TEXT,
-    end_date TEXT,
-    days REAL,
-    amount_pkr REAL,
-    ist_number TEXT,
-    comments TEXT,
-    status TEXT DEFAULT 'Pending',
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-)""")
-
-
-
-c.execute("""CREATE TABLE IF NOT EXISTS status_history (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    record_type TEXT,
-    record_id TEXT,
-    old_status TEXT,
-    new_status TEXT,
-    changed_by TEXT,
-    changed_at TEXT DEFAULT CURRENT_TIMESTAMP
-)""")
-
-# --- Operational Advances Table ---
-c.execute("""CREATE TABLE IF NOT EXISTS operational_advances (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    date_request TEXT,
-    staff_name TEXT,
-    programme_unit TEXT,
-    supplier_name TEXT,
-    description TEXT,
-    invoice_type TEXT,
-    invoice_no TEXT,
-    total_amount REAL,
-    invoice_currency TEXT,
-    payment_currency TEXT,
-    location TEXT,
-    comments TEXT,
-    status TEXT DEFAULT 'Pending',
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-)""")
-
-# --- Operational Advance Liquidations Table ---
-c.execute("""CREATE TABLE IF NOT EXISTS operational_liquidations (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    oa_id INTEGER,  -- ✅ must reference a valid OA record
-    date_request TEXT,
-    staff_name TEXT,
-    programme_unit TEXT,
-    category TEXT,
-    supplier_name TEXT,
-    description TEXT,
-    invoice_type TEXT,
-    invoice_no TEXT,
-    total_amount REAL,
-    invoice_currency TEXT,
-    payment_currency TEXT,
-    liquidation_ist TEXT,
-    liquidation_amount REAL,
-    wbl_project_code TEXT,
-    wbl_task_number TEXT,
-    unspent_amount REAL,
-    unspent_deposit_yesno TEXT,
-    deposited_amount REAL,
-    unspent_ist1 TEXT,
-    unspent_ist2 TEXT,
-    unspent_wbl_project_code TEXT,
-    unspent_wbl_task_number TEXT,
-    documents_submitted TEXT,
-    location TEXT,
-    comments TEXT,
-    status TEXT DEFAULT 'Pending',
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (oa_id) REFERENCES operational_advances (id) ON DELETE CASCADE
-)""")
-conn.commit()
-
-
-conn.commit()
-
 # --- Helper: Password Hashing ---
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
@@ -185,12 +34,98 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return hash_password(password) == hashed
 
-# --- Create default admin if none exists ---
-if c.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
-    default_pwd = hash_password("admin")
-    c.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)", 
-              ("admin", default_pwd, "Admin"))
-    conn.commit()
+# --- One-time DB bootstrap ---
+# Runs once per server process, not on every rerun: the schema check is a
+# single PRAGMA read and no DDL/commit happens once the DB is up to date.
+@st.cache_resource
+def init_db():
+    db.migrate(db.connection())
+
+    # --- Create default admin if none exists ---
+    with db.transaction("users") as cur:
+        if cur.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            default_pwd = hash_password("admin")
+            cur.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)",
+                        ("admin", default_pwd, "Admin"))
+    return True
+
+init_db()
+
+# --- DB connection (pooled, one per worker thread; WAL mode) ---
+conn = db.connection()
+c = conn.cursor()
+
+# --- Helper: Paged table (keyset pagination, only one page is loaded/sent) ---
+def paged_dataframe(key, table, where="1=1", params=(), height=400, columns=None):
+    cols = columns or db.table_columns(conn, table)
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort = st.selectbox("Sort by", cols, index=cols.index("id"), key=f"{key}_sort", format_func=frames.label)
+    with col2:
+        descending = st.selectbox("Order", ["Descending", "Ascending"], key=f"{key}_dir") == "Descending"
+    with col3:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key=f"{key}_size")
+
+    # Back to page 1 whenever the filters or the ordering change
+    signature = (where, tuple(params), sort, descending, page_size)
+    if st.session_state.get(f"{key}_sig") != signature:
+        st.session_state[f"{key}_sig"] = signature
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+
+    page_df, next_cursor = db.read_page(conn, table, where, params, sort, descending,
+                                        after=cursors[-1], page_size=page_size, columns=columns)
+    total = db.count_rows(conn, table, where, params)
+    page_df = frames.typed(conn, table, page_df)
+    st.dataframe(page_df, use_container_width=True, height=height)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("⬅️ Previous", key=f"{key}_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col2.caption(f"Page {len(cursors)} of {max(1, -(-total // page_size))} · {total} rows")
+    if col3.button("Next ➡️", key=f"{key}_next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+    return page_df
+
+# --- Columns shown in the PR lists (read from the pr_tracking view) ---
+PR_LIST_COLUMNS = ["id", "pr_number", "date_request", "staff_name", "programme_unit_id", "category_id",
+                   "location", "from_date", "to_date", "qty", "est_cost_pkr_minor", "est_cost_usd_minor",
+                   "status_id", "assigned_to"]
+
+# --- Helper: Type-ahead PR number filter (only the top matches go to the browser) ---
+def pr_number_filter(key, limit=50):
+    all_numbers = db.distinct_values(conn, "pr_headers", "pr_number")
+    search = st.text_input("Search PR Number", key=f"{key}_search",
+                           placeholder=f"Type to search {len(all_numbers)} PR numbers")
+    matches = db.search_values(all_numbers, search, limit)
+    return st.selectbox("Filter by PR Number", ["All"] + matches, key=f"{key}_pr")
+
+# --- Helper: Two-level PR line picker (PR number by type-ahead, then only that PR's lines) ---
+def pr_line_picker(key, category_id, limit=50):
+    numbers = db.distinct_values(conn, "pr_headers", "pr_number", "category_id=?", [category_id])
+    if not numbers:
+        st.warning("⚠️ No PRs available for this category.")
+        return None
+    search = st.text_input("Search PR Number", key=f"{key}_search",
+                           placeholder=f"Type to search {len(numbers)} PR numbers")
+    matches = db.search_values(numbers, search, limit)
+    if not matches:
+        st.info("No PR number matches the search.")
+        return None
+    pr_number = st.selectbox("Select PR Number", matches, key=f"{key}_pr")
+    options = db.pr_line_options(conn, category_id, pr_number)
+    return st.selectbox("Select PR Line", list(options), format_func=options.get, key=f"{key}_line")
+
+# --- Helper: Flash messages, queued before st.rerun() and shown as toasts on
+# the next run (anything rendered right before a rerun is never seen) ---
+def flash(message):
+    st.session_state.setdefault("flash", []).append(message)
+
+def show_flashes():
+    for message in st.session_state.pop("flash", []):
+        st.toast(message)
 
 # --- Cookie Manager ---
 cookies = EncryptedCookieManager(prefix="pr_app", password="super-secret-key")
@@ -238,7 +173,7 @@ if st.session_state["user"] is None:
             cookies["role"] = user[3]
             cookies.save()
 
-            st.success(f"Welcome {user[1]}! Role: {user[3]}")
+            flash(f"Welcome {user[1]}! Role: {user[3]}")
             st.rerun()
         else:
             st.error("Invalid username or password")
@@ -258,6 +193,13 @@ if st.sidebar.button("🚪 Logout"):
     cookies.save()
     st.rerun()
 
+show_flashes()
+
+# --- Cache counters (admins only) ---
+if st.session_state["role"] == "Admin":
+    stats = db.cache_stats()
+    st.sidebar.caption(f"🗄️ Query cache: {stats['hits']} hits / {stats['misses']} misses ({stats['entries']} entries)")
+
 page = st.sidebar.radio("📂 Navigation", [
     "Dashboard",
     "PR Tracking",
@@ -280,156 +222,165 @@ if page == "Dashboard":
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        all_prs = pd.read_sql("SELECT DISTINCT pr_number FROM pr_tracking", conn)
-        pr_filter = st.selectbox(
-            "Filter by PR Number",
-            ["All"] + all_prs["pr_number"].dropna().tolist() if not all_prs.empty else ["All"]
-        )
+        pr_filter = pr_number_filter("dash")
     with col2:
-        all_categories = pd.read_sql("SELECT DISTINCT category FROM pr_tracking", conn)
         cat_filter = st.selectbox(
             "Filter by Category",
-            ["All"] + all_categories["category"].dropna().tolist() if not all_categories.empty else ["All"]
+            ["All"] + lookups.options(conn, "category")
         )
     with col3:
-        all_staff = pd.read_sql("SELECT DISTINCT staff_name FROM pr_tracking", conn)
         staff_filter = st.selectbox(
             "Filter by Staff/User",
-            ["All"] + all_staff["staff_name"].dropna().tolist() if not all_staff.empty else ["All"]
+            ["All"] + db.distinct_values(conn, "pr_headers", "staff_name")
         )
 
     # --- Apply filters ---
-    query = "SELECT * FROM pr_tracking WHERE 1=1"
+    where = "1=1"
     params = []
     if pr_filter != "All":
-        query += " AND pr_number=?"
+        where += " AND pr_number=?"
         params.append(pr_filter)
     if cat_filter != "All":
-        query += " AND category=?"
-        params.append(cat_filter)
+        where += " AND category_id=?"
+        params.append(lookups.code(conn, "category", cat_filter))
     if staff_filter != "All":
-        query += " AND staff_name=?"
+        where += " AND staff_name=?"
         params.append(staff_filter)
 
-    prs = pd.read_sql(query, conn, params=params)
-
     # --- Metrics ---
     st.markdown("### 📈 Key Metrics")
-    total = prs.shape[0]
-    submitted = prs[prs["status"] == "Submitted"].shape[0]
-    in_process = prs[prs["status"] == "In Process"].shape[0]
-    completed = prs[prs["status"] == "Completed"].shape[0]
+    if pr_filter == "All" and staff_filter == "All":
+        # Trigger-maintained rollup: O(groups) regardless of table size
+        metrics = db.rollup_status_metrics(conn, "pr_lines", None if cat_filter == "All" else cat_filter)
+    else:
+        metrics = db.pr_status_metrics(conn, where, params)
+    empty = {"n": 0, "pkr": 0.0, "usd": 0.0}
+    total = sum(m["n"] for m in metrics.values())
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("📋 Total PRs", total)
-    col2.metric("🕒 Submitted", submitted)
-    col3.metric("⚙️ In Process", in_process)
-    col4.metric("✅ Completed", completed)
+    col2.metric("🕒 Submitted", metrics.get("Submitted", empty)["n"])
+    col3.metric("⚙️ In Process", metrics.get("In Process", empty)["n"])
+    col4.metric("✅ Completed", metrics.get("Completed", empty)["n"])
+
+    col1, col2 = st.columns(2)
+    col1.metric("💵 Estimated Total (PKR)", f"{sum(m['pkr'] for m in metrics.values()):,.0f}")
+    col2.metric("💲 Estimated Total (USD)", f"{sum(m['usd'] for m in metrics.values()):,.2f}")
 
     # --- PR Table ---
     st.subheader("📑 Purchase Requests")
-    if prs.empty:
+    if total == 0:
         st.info("No PRs available.")
     else:
-        st.dataframe(prs, use_container_width=True, height=400)
+        prs = paged_dataframe("dash_prs", "pr_tracking", where, params, columns=PR_LIST_COLUMNS)
 
         col1, col2 = st.columns(2)
         with col1:
             update_pr = st.selectbox("Select PR (by ID) to update status", prs["id"])
-            new_status = st.selectbox("New Status", ["Submitted", "In Process", "Completed"])
+            new_status = st.selectbox("New Status", lookups.PR_STATUSES)
             if st.button("🔄 Update PR Status"):
-                old_status = c.execute("SELECT status FROM pr_tracking WHERE id=?", (update_pr,)).fetchone()[0]
-                c.execute("UPDATE pr_tracking SET status=? WHERE id=?", (new_status, update_pr))
-                c.execute("""INSERT INTO status_history 
-                             (record_type, record_id, old_status, new_status, changed_by) 
-                             VALUES (?,?,?,?,?)""",
-                          ("PR", str(update_pr), old_status, new_status, st.session_state["user"]))
-                conn.commit()
-                st.success(f"PR ID {update_pr} updated to {new_status}")
+                with db.transaction("pr_lines", "status_history") as cur:
+                    old_status = lookups.name(conn, "status", cur.execute(
+                        "SELECT status_id FROM pr_lines WHERE id=?", (update_pr,)).fetchone()[0])
+                    cur.execute("UPDATE pr_lines SET status_id=? WHERE id=?",
+                                (lookups.code(conn, "status", new_status), update_pr))
+                    cur.execute("""INSERT INTO status_history 
+                                   (record_type, record_id, old_status, new_status, changed_by) 
+                                   VALUES (?,?,?,?,?)""",
+                                ("PR", str(update_pr), old_status, new_status, st.session_state["user"]))
+                flash(f"PR ID {update_pr} updated to {new_status}")
                 st.rerun()
 
         with col2:
             delete_pr = st.selectbox("Select PR (by ID) to delete", prs["id"])
             if st.button("🗑️ Delete PR"):
-                c.execute("DELETE FROM pr_tracking WHERE id=?", (delete_pr,))
-                conn.commit()
-                st.success(f"PR ID {delete_pr} deleted")
+                with db.transaction("pr_headers", "pr_lines", db.PR_KEYS) as cur:
+                    header_id = cur.execute("DELETE FROM pr_lines WHERE id=? RETURNING header_id",
+                                            (delete_pr,)).fetchone()[0]
+                    # Drop the header with its last line
+                    cur.execute("""DELETE FROM pr_headers WHERE id=?
+                                   AND NOT EXISTS (SELECT 1 FROM pr_lines WHERE header_id=?)""",
+                                (header_id, header_id))
+                flash(f"PR ID {delete_pr} deleted")
                 st.rerun()
 
     # --- Payment Records ---
     st.subheader("💰 Payment Records")
-    payments = pd.read_sql("SELECT * FROM payment_tracking", conn)
-    if payments.empty:
+    if db.count_rows(conn, "payment_tracking") == 0:
         st.info("No payments yet.")
     else:
-        st.dataframe(payments, use_container_width=True, height=400)
+        payments = paged_dataframe("dash_payments", "payment_tracking")
 
         col1, col2 = st.columns(2)
         with col1:
             update_pay = st.selectbox("Select Payment ID to update status", payments["id"])
-            new_status = st.selectbox("New Status (Payment)", ["Pending", "In Process", "Completed"])
+            new_status = st.selectbox("New Status (Payment)", lookups.PAYMENT_STATUSES)
             if st.button("🔄 Update Payment Status"):
-                old_status = c.execute("SELECT status FROM payment_tracking WHERE id=?", (update_pay,)).fetchone()[0]
-                c.execute("UPDATE payment_tracking SET status=? WHERE id=?", (new_status, update_pay))
-                c.execute("""INSERT INTO status_history 
-                             (record_type, record_id, old_status, new_status, changed_by) 
-                             VALUES (?,?,?,?,?)""",
-                          ("Payment", str(update_pay), old_status, new_status, st.session_state["user"]))
-                conn.commit()
-
-                # --- Cascade update: if payment completed, mark PR completed too
-                if new_status == "Completed":
-                    pr_id = c.execute("SELECT pr_id FROM payment_tracking WHERE id=?", (update_pay,)).fetchone()[0]
-                    if pr_id:
-                        old_pr_status = c.execute("SELECT status FROM pr_tracking WHERE id=?", (pr_id,)).fetchone()[0]
-                        c.execute("UPDATE pr_tracking SET status='Completed' WHERE id=?", (pr_id,))
-                        c.execute("""INSERT INTO status_history 
-                                     (record_type, record_id, old_status, new_status, changed_by) 
-                                     VALUES (?,?,?,?,?)""",
-                                  ("PR", str(pr_id), old_pr_status, "Completed", st.session_state["user"]))
-                        conn.commit()
-                        st.info(f"Linked PR ID {pr_id} also marked Completed ✅")
-
-                st.success(f"Payment {update_pay} updated to {new_status}")
+                with db.transaction("payment_tracking", "pr_lines", "status_history") as cur:
+                    old_status_id, pr_id = cur.execute("""UPDATE payment_tracking
+                        SET status_id=?, previous_status_id=status_id WHERE id=?
+                        RETURNING previous_status_id, pr_id""",
+                        (lookups.code(conn, "status", new_status), update_pay)).fetchone()
+                    old_status = lookups.name(conn, "status", old_status_id)
+                    cur.execute("""INSERT INTO status_history 
+                                   (record_type, record_id, old_status, new_status, changed_by) 
+                                   VALUES (?,?,?,?,?)""",
+                                ("Payment", str(update_pay), old_status, new_status, st.session_state["user"]))
+
+                    # --- Cascade update: if payment completed, mark PR completed too
+                    if new_status == "Completed" and pr_id:
+                        old_pr_status = lookups.name(conn, "status", cur.execute(
+                            "SELECT status_id FROM pr_lines WHERE id=?", (pr_id,)).fetchone()[0])
+                        cur.execute("UPDATE pr_lines SET status_id=? WHERE id=?",
+                                    (lookups.code(conn, "status", "Completed"), pr_id))
+                        cur.execute("""INSERT INTO status_history 
+                                       (record_type, record_id, old_status, new_status, changed_by) 
+                                       VALUES (?,?,?,?,?)""",
+                                    ("PR", str(pr_id), old_pr_status, "Completed", st.session_state["user"]))
+                if new_status == "Completed" and pr_id:
+                    flash(f"Linked PR ID {pr_id} also marked Completed ✅")
+
+                flash(f"Payment {update_pay} updated to {new_status}")
                 st.rerun()
 
         with col2:
             delpay = st.selectbox("Select Payment ID to delete", payments["id"])
             if st.button("🗑️ Delete Payment"):
-                c.execute("DELETE FROM payment_tracking WHERE id=?", (delpay,))
-                conn.commit()
-                st.success(f"Payment {delpay} deleted ✅")
+                with db.transaction("payment_tracking") as cur:
+                    cur.execute("DELETE FROM payment_tracking WHERE id=?", (delpay,))
+                flash(f"Payment {delpay} deleted ✅")
                 st.rerun()
 
     # --- DSA Payments ---
     st.subheader("✈️ DSA Payments")
-    dsas = pd.read_sql("SELECT * FROM dsa_payments", conn)
-    if dsas.empty:
+    if db.count_rows(conn, "dsa_payments") == 0:
         st.info("No DSA payments yet.")
     else:
-        st.dataframe(dsas, use_container_width=True, height=400)
+        dsas = paged_dataframe("dash_dsas", "dsa_payments")
 
         col1, col2 = st.columns(2)
         with col1:
             update_dsa = st.selectbox("Select DSA ID to update status", dsas["id"])
-            new_status = st.selectbox("New Status (DSA)", ["Pending", "In Process", "Completed", "Paid"])
+            new_status = st.selectbox("New Status (DSA)", lookups.ADVANCE_STATUSES)
             if st.button("🔄 Update DSA Status"):
-                old_status = c.execute("SELECT status FROM dsa_payments WHERE id=?", (update_dsa,)).fetchone()[0]
-                c.execute("UPDATE dsa_payments SET status=? WHERE id=?", (new_status, update_dsa))
-                c.execute("""INSERT INTO status_history 
-                             (record_type, record_id, old_status, new_status, changed_by) 
-                             VALUES (?,?,?,?,?)""",
-                          ("DSA", str(update_dsa), old_status, new_status, st.session_state["user"]))
-                conn.commit()
-                st.success(f"DSA Payment {update_dsa} updated to {new_status}")
+                with db.transaction("dsa_payments", "status_history") as cur:
+                    old_status = lookups.name(conn, "status", cur.execute(
+                        "SELECT status_id FROM dsa_payments WHERE id=?", (update_dsa,)).fetchone()[0])
+                    cur.execute("UPDATE dsa_payments SET status_id=? WHERE id=?",
+                                (lookups.code(conn, "status", new_status), update_dsa))
+                    cur.execute("""INSERT INTO status_history 
+                                   (record_type, record_id, old_status, new_status, changed_by) 
+                                   VALUES (?,?,?,?,?)""",
+                                ("DSA", str(update_dsa), old_status, new_status, st.session_state["user"]))
+                flash(f"DSA Payment {update_dsa} updated to {new_status}")
                 st.rerun()
 
         with col2:
             deldsa = st.selectbox("Select DSA ID to delete", dsas["id"])
             if st.button("🗑️ Delete DSA Payment"):
-                c.execute("DELETE FROM dsa_payments WHERE id=?", (deldsa,))
-                conn.commit()
-                st.success(f"DSA Payment {deldsa} deleted ✅")
+                with db.transaction("dsa_payments") as cur:
+                    cur.execute("DELETE FROM dsa_payments WHERE id=?", (deldsa,))
+                flash(f"DSA Payment {deldsa} deleted ✅")
                 st.rerun()
 
         # --- Operational Advances + Liquidations ---
@@ -441,19 +392,20 @@ if page == "Dashboard":
         oa.id AS id,
         oa.date_request AS date_request,
         oa.staff_name AS staff_name,
-        oa.programme_unit AS programme_unit,
+        oa.programme_unit_id AS programme_unit_id,
         oa.supplier_name AS supplier_name,
-        oa.total_amount AS total_amount,
-        oa.status AS oa_status,
+        oa.total_amount_minor AS total_amount_minor,
+        oa.status_id AS oa_status_id,
         li.id AS liquidation_id,
-        li.status AS liquidation_status,
-        li.liquidation_amount AS liquidation_amount,
+        li.status_id AS liquidation_status_id,
+        li.liquidation_amount_minor AS liquidation_amount_minor,
         li.date_request AS liquidation_date
     FROM operational_advances oa
     LEFT JOIN operational_liquidations li ON oa.id = li.oa_id
     ORDER BY oa.id DESC
     """
-    oas = pd.read_sql(oa_query, conn)
+    oas = money.decode(lookups.decode(conn, db.read_cached(conn, oa_query,
+                                                           ["operational_advances", "operational_liquidations"])))
 
     if oas.empty:
         st.info("No operational advances or liquidations yet.")
@@ -482,16 +434,18 @@ if page == "Dashboard":
         with col1:
             st.markdown("### 🔄 Update OA Status")
             update_oa = st.selectbox("Select OA ID to update status", oas["id"])
-            new_status = st.selectbox("New OA Status", ["Pending", "In Process", "Completed", "Paid"])
+            new_status = st.selectbox("New OA Status", lookups.ADVANCE_STATUSES)
             if st.button("💾 Update OA Status"):
-                old_status = c.execute("SELECT status FROM operational_advances WHERE id=?", (update_oa,)).fetchone()[0]
-                c.execute("UPDATE operational_advances SET status=? WHERE id=?", (new_status, update_oa))
-                c.execute("""INSERT INTO status_history 
-                            (record_type, record_id, old_status, new_status, changed_by)
-                            VALUES (?,?,?,?,?)""",
-                        ("OA", str(update_oa), old_status, new_status, st.session_state["user"]))
-                conn.commit()
-                st.success(f"✅ Operational Advance {update_oa} updated to {new_status}")
+                with db.transaction("operational_advances", "status_history") as cur:
+                    old_status = lookups.name(conn, "status", cur.execute(
+                        "SELECT status_id FROM operational_advances WHERE id=?", (update_oa,)).fetchone()[0])
+                    cur.execute("UPDATE operational_advances SET status_id=? WHERE id=?",
+                                (lookups.code(conn, "status", new_status), update_oa))
+                    cur.execute("""INSERT INTO status_history 
+                                   (record_type, record_id, old_status, new_status, changed_by)
+                                   VALUES (?,?,?,?,?)""",
+                                ("OA", str(update_oa), old_status, new_status, st.session_state["user"]))
+                flash(f"✅ Operational Advance {update_oa} updated to {new_status}")
                 st.rerun()
 
         # --- Update Liquidation Status ---
@@ -509,29 +463,30 @@ if page == "Dashboard":
 
                 selected_oa_id = int(selected_liq.split(" | ")[0])
                 old_liq_status = c.execute(
-                    "SELECT status FROM operational_liquidations WHERE oa_id=?",
+                    "SELECT s.name FROM operational_liquidations li JOIN lookup_status s ON s.id = li.status_id WHERE li.oa_id=?",
                     (selected_oa_id,)
                 ).fetchone()
 
-                new_liq_status = st.selectbox("New Liquidation Status", ["Pending", "In Process", "Completed", "Paid"])
+                new_liq_status = st.selectbox("New Liquidation Status", lookups.ADVANCE_STATUSES)
 
                 if st.button("💾 Update Liquidation Status"):
                     try:
-                        # Update liquidation record
-                        c.execute("UPDATE operational_liquidations SET status=? WHERE oa_id=?", (new_liq_status, selected_oa_id))
-                        # Cascade update OA
-                        c.execute("UPDATE operational_advances SET status=? WHERE id=?", (new_liq_status, selected_oa_id))
-                        # Log both changes
-                        c.execute("""INSERT INTO status_history
-                                    (record_type, record_id, old_status, new_status, changed_by)
-                                    VALUES (?,?,?,?,?)""",
-                                ("Liquidation", str(selected_oa_id), old_liq_status[0] if old_liq_status else None, new_liq_status, st.session_state["user"]))
-                        c.execute("""INSERT INTO status_history
-                                    (record_type, record_id, old_status, new_status, changed_by)
-                                    VALUES (?,?,?,?,?)""",
-                                ("OA", str(selected_oa_id), old_liq_status[0] if old_liq_status else None, new_liq_status, st.session_state["user"]))
-                        conn.commit()
-                        st.success(f"✅ Liquidation status updated to {new_liq_status} for OA ID {selected_oa_id}")
+                        with db.transaction("operational_liquidations", "operational_advances", "status_history") as cur:
+                            # Update liquidation record
+                            new_status_id = lookups.code(conn, "status", new_liq_status)
+                            cur.execute("UPDATE operational_liquidations SET status_id=? WHERE oa_id=?", (new_status_id, selected_oa_id))
+                            # Cascade update OA
+                            cur.execute("UPDATE operational_advances SET status_id=? WHERE id=?", (new_status_id, selected_oa_id))
+                            # Log both changes
+                            cur.execute("""INSERT INTO status_history
+                                           (record_type, record_id, old_status, new_status, changed_by)
+                                           VALUES (?,?,?,?,?)""",
+                                        ("Liquidation", str(selected_oa_id), old_liq_status[0] if old_liq_status else None, new_liq_status, st.session_state["user"]))
+                            cur.execute("""INSERT INTO status_history
+                                           (record_type, record_id, old_status, new_status, changed_by)
+                                           VALUES (?,?,?,?,?)""",
+                                        ("OA", str(selected_oa_id), old_liq_status[0] if old_liq_status else None, new_liq_status, st.session_state["user"]))
+                        flash(f"✅ Liquidation status updated to {new_liq_status} for OA ID {selected_oa_id}")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Error updating liquidation: {e}")
@@ -540,36 +495,18 @@ if page == "Dashboard":
     # --- Reminders ---
 
     st.subheader("⏰ PR Reminders")
-    reminders = pd.read_sql("""
-        SELECT id, pr_number, staff_name, category, from_date, reminder_days
-        FROM pr_tracking
-        WHERE reminder_expiry='Yes'
-    """, conn)
+    col1, col2 = st.columns(2)
+    with col1:
+        overdue_days = st.number_input("Show overdue reminders from the last (days)", min_value=0, value=30)
+    with col2:
+        lookahead_days = st.number_input("Show upcoming reminders for the next (days)", min_value=0, value=30)
+    reminders = reminders_service.due_reminders(conn, lookahead_days=int(lookahead_days),
+                                                overdue_days=int(overdue_days))
 
     if reminders.empty:
         st.success("✅ No reminders due.")
     else:
-        reminders["from_date"] = pd.to_datetime(reminders["from_date"], errors="coerce")
-        reminders["reminder_days"] = pd.to_numeric(reminders["reminder_days"], errors="coerce")
-
-        reminders["Reminder Date"] = reminders.apply(
-            lambda r: (r["from_date"] - pd.to_timedelta(int(r["reminder_days"]), unit="D")).date()
-            if pd.notnull(r["from_date"]) and pd.notnull(r["reminder_days"]) else pd.NaT,
-            axis=1
-        )
-
-        today = datetime.today().date()
-        def status_label(d):
-            if pd.isna(d):
-                return "—"
-            if d < today:
-                return "⏰ Overdue"
-            if d == today:
-                return "⚠️ Due Today"
-            return "📌 Upcoming"
-
-        reminders["Status"] = reminders["Reminder Date"].apply(status_label)
-
+        reminders = reminders.rename(columns={"reminder_date": "Reminder Date", "status": "Status"})
         view_cols = ["id","pr_number","staff_name","category","from_date","reminder_days","Reminder Date","Status"]
         st.dataframe(reminders[view_cols].rename(columns={
             "id": "PR ID",
@@ -587,6 +524,32 @@ if page == "Dashboard":
 elif page == "PR Tracking":
     st.title("📝 New Purchase Request")
 
+    # --- Bulk Import ---
+    with st.expander("📥 Bulk Import from CSV / Excel"):
+        st.caption("One row per PR line; rows with the same PR Number form one PR. "
+                   "WBLs go in wbl1_project / wbl1_task / wbl1_percentage … up to wbl5_*.")
+        st.download_button("⬇️ Download Template", pr_import.template_csv(),
+                           file_name="pr_import_template.csv", mime="text/csv")
+        upload = st.file_uploader("PR lines file", type=["csv", "xlsx"], key="pr_import_file")
+        if upload is not None and st.button("📥 Import PR Lines"):
+            bar = st.progress(0.0, text="Importing...")
+            try:
+                imported, import_errors = pr_import.import_file(
+                    conn, upload, st.session_state["user"],
+                    progress=lambda read, done: bar.progress(
+                        min(upload.tell() / max(upload.size, 1), 1.0),
+                        text=f"{read:,} rows read, {done:,} imported"))
+                bar.progress(1.0, text="Done")
+                st.success(f"✅ Imported {imported:,} PR line(s).")
+                if not import_errors.empty:
+                    st.warning(f"⚠️ {import_errors['row'].nunique():,} row(s) were rejected.")
+                    st.dataframe(import_errors.head(1000), use_container_width=True)
+                    st.download_button("⬇️ Download Error Report",
+                                       import_errors.to_csv(index=False).encode("utf-8"),
+                                       file_name="pr_import_errors.csv", mime="text/csv")
+            except Exception as e:
+                st.error(f"Error: {e}")
+
     # --- PR Header ---
     st.subheader("➕ Create PR Header")
 
@@ -595,17 +558,9 @@ elif page == "PR Tracking":
         pr_number = st.text_input("PR Number *")
         date_request = st.date_input("Date of Request *")
         staff_name = st.text_input("Created By *", value=st.session_state["user"])
-        programme_unit = st.selectbox(
-            "Programme Unit *",
-            ["", "CRLR", "HEALTH", "PROTECTION", "SNFI and WASH", "DTM", "FCDO- BRAVE", "MECC", "Core Staff_ HRRD"],
-            index=0
-        )
-        type_services = st.selectbox("Type of Services *", ["", "Goods", "Services", "Works"], index=0)
-        category = st.selectbox("Category *", [
-            "", "Implementing Partners", "Professional Services", "Medical",
-            "Private Sector Partners", "Event management", "ICT", "WSNFI",
-            "Miscellaneous", "Rental Vehicle"
-        ], index=0)
+        programme_unit = st.selectbox("Programme Unit *", [""] + lookups.options(conn, "programme_unit"), index=0)
+        type_services = st.selectbox("Type of Services *", [""] + lookups.options(conn, "type_services"), index=0)
+        category = st.selectbox("Category *", [""] + lookups.options(conn, "category"), index=0)
     with col2:
         description = st.text_area("Description (Optional)")
         assigned_users = pd.read_sql("SELECT username FROM users", conn)
@@ -621,17 +576,14 @@ elif page == "PR Tracking":
         st.markdown("### 🚗 Rental Vehicle Details")
         col1, col2 = st.columns(2)
         with col1:
-            type_vehicle = st.selectbox("Type of Vehicle *", [
-                "", "Sedan Car", "Parado", "Double Cabin Vigo/Hilux",
-                "Armoured Vehicle", "Equipped Ambulance", "HiAce", "Bus", "Coaster"
-            ], index=0)
+            type_vehicle = st.selectbox("Type of Vehicle *", [""] + lookups.options(conn, "type_vehicle"), index=0)
             traveller_name = st.text_input("Traveller Name (Optional)")
         with col2:
             traveller_phone = st.text_input("Traveller Phone # (Optional)")
 
     # --- Multi-Line Support ---
     st.markdown("### 🧾 Multi-Line Entry")
-    num_lines = st.number_input("Number of PR Lines", min_value=1, max_value=10, value=1)
+    num_lines = st.number_input("Number of PR Lines", min_value=1, value=1)
 
     # --- Shared WBL Option ---
     st.markdown("### 📂 WBL Allocation Options")
@@ -730,61 +682,21 @@ elif page == "PR Tracking":
 
     # --- Submit PR ---
     if st.button("✅ Submit PR"):
-        missing_fields = []
-        if not pr_number.strip():
-            missing_fields.append("PR Number")
-        if programme_unit == "":
-            missing_fields.append("Programme Unit")
-        if type_services == "":
-            missing_fields.append("Type of Services")
-        if category == "":
-            missing_fields.append("Category")
-        if category == "Rental Vehicle" and type_vehicle == "":
-            missing_fields.append("Type of Vehicle")
-        if not assigned_to.strip():
-            missing_fields.append("Assigned To")
-
-        if missing_fields:
-            st.error("⚠️ Missing required fields: " + ", ".join(missing_fields))
-        elif same_wbl_for_all and sum([p for _, _, p in shared_wbls if p]) != 100:
-            st.error("⚠️ Shared WBL percentages must add up to 100!")
+        header = {
+            "pr_number": pr_number, "date_request": date_request, "staff_name": staff_name,
+            "programme_unit": programme_unit, "type_services": type_services, "category": category,
+            "description": description, "type_vehicle": type_vehicle,
+            "traveller_name": traveller_name, "traveller_phone": traveller_phone,
+            "assigned_to": assigned_to,
+        }
+        errors = pr_submit.validate(header, pr_lines, shared_wbls if same_wbl_for_all else None)
+        if errors:
+            for error in errors:
+                st.error(error)
         else:
             try:
-                for idx, line in enumerate(pr_lines, start=1):
-                    # Validate per-line required fields
-                    if not line["location"].strip() or not line["from_date"] or not line["to_date"]:
-                        st.error(f"⚠️ Missing required fields in PR Line #{idx}")
-                        st.stop()
-
-                    c.execute("""INSERT INTO pr_tracking (
-                        pr_number, date_request, staff_name, programme_unit, type_services, category,
-                        description, type_vehicle, traveller_name, traveller_phone,
-                        from_date, to_date, days, location, qty,
-                        est_cost_pkr, est_cost_usd, reminder_expiry, reminder_days,
-                        comments, status, created_at, assigned_to
-                    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-                    (
-                        pr_number, str(date_request), staff_name, programme_unit, type_services, category,
-                        description, type_vehicle, traveller_name, traveller_phone,
-                        str(line["from_date"]), str(line["to_date"]), line["days"], line["location"], line["qty"],
-                        line["est_pkr"], line["est_usd"], line["reminder_expiry"], line["reminder_days"],
-                        line["comments"], "Submitted", datetime.now(), assigned_to
-                    ))
-                    pr_id = c.lastrowid
-
-                    # --- Insert WBLs ---
-                    for proj_name, task_name, perc in line["wbls"]:
-                        c.execute("INSERT INTO pr_wbls (pr_id, project_name, task_name, percentage) VALUES (?,?,?,?)",
-                                  (pr_id, proj_name, task_name, perc))
-
-                    # --- Log creation ---
-                    c.execute("""INSERT INTO status_history 
-                                 (record_type, record_id, old_status, new_status, changed_by) 
-                                 VALUES (?,?,?,?,?)""",
-                              ("PR", pr_id, None, "Submitted", st.session_state["user"]))
-
-                conn.commit()
-                st.success(f"✅ {num_lines} PR line(s) saved under PR {pr_number}!")
+                pr_ids = pr_submit.submit(header, pr_lines, st.session_state["user"])
+                flash(f"✅ {len(pr_ids)} PR line(s) saved under PR {pr_number}!")
                 st.rerun()
             except Exception as e:
                 st.error(f"Error: {e}")
@@ -792,15 +704,13 @@ elif page == "PR Tracking":
     # --- View PRs with WBL Preview ---
     st.subheader("📋 My PRs")
     if st.session_state["role"] == "Admin":
-        prs = pd.read_sql("SELECT * FROM pr_tracking", conn)
+        my_where, my_params = "1=1", []
     else:
-        prs = pd.read_sql(
-            "SELECT * FROM pr_tracking WHERE staff_name=? OR assigned_to=?",
-            conn, params=[st.session_state["user"], st.session_state["user"]]
-        )
+        my_where = "staff_name=? OR assigned_to=?"
+        my_params = [st.session_state["user"], st.session_state["user"]]
 
-    if not prs.empty:
-        st.dataframe(prs, use_container_width=True, height=400)
+    if db.count_rows(conn, "pr_tracking", my_where, my_params) > 0:
+        prs = paged_dataframe("my_prs", "pr_tracking", my_where, my_params, columns=PR_LIST_COLUMNS)
 
         st.markdown("### 📂 WBL Preview")
         selected_pr = st.selectbox("Select a PR to view WBLs", prs["id"])
@@ -828,36 +738,19 @@ elif page == "PR Tracking":
 elif page == "Payment Tracking":
     st.title("💰 Payment Tracking")
 
-    category_choice = st.selectbox("Select Payment Category", [
-        "Rental Vehicle","Implementing Partners","Professional Services","Medical",
-        "Private Sector Partners","Event management","ICT","WSNFI","Miscellaneous",
-        "DSA Payment","Operational Advance"
-    ])
+    pr_categories = lookups.options(conn, "category")
+    category_choice = st.selectbox("Select Payment Category", pr_categories + ["DSA Payment", "Operational Advance"])
 
     # --- Case 1: Categories linked to PRs ---
-    if category_choice in [
-        "Rental Vehicle","Implementing Partners","Professional Services","Medical",
-        "Private Sector Partners","Event management","ICT","WSNFI","Miscellaneous"
-    ]:
-        prs = pd.read_sql("SELECT * FROM pr_tracking WHERE category=?", conn, params=[category_choice])
-        if prs.empty:
-            st.warning("⚠️ No PRs available for this category.")
-        else:
-            pr_number_choice = st.selectbox("Select PR Number", prs["pr_number"].unique().tolist())
-            pr_subset = prs[prs["pr_number"] == pr_number_choice]
-
-            pr_options = {
-                row["id"]: f"ID {row['id']} | {row['pr_number']} | {row['description']} | {row['staff_name']}"
-                for _, row in pr_subset.iterrows()
-            }
-
-            pr_id_choice = st.selectbox(
-                "Select PR Line",
-                options=list(pr_options.keys()),
-                format_func=lambda x: pr_options[x]
-            )
-
-            pr_data = pr_subset[pr_subset["id"] == pr_id_choice].iloc[0]
+    if category_choice in pr_categories:
+        pr_id_choice = pr_line_picker("pay_pr", lookups.code(conn, "category", category_choice))
+        if pr_id_choice is not None:
+            pr_data = money.decode(lookups.decode(conn, db.read_cached(conn, """
+                SELECT id, pr_number, date_request, staff_name, programme_unit_id, type_services_id, category_id,
+                       description, location, qty, est_cost_pkr_minor, est_cost_usd_minor, status_id
+                FROM pr_tracking WHERE id=?
+            """, ["pr_tracking"], [pr_id_choice]))).iloc[0]
+            pr_number_choice = pr_data["pr_number"]
 
             st.markdown("### 📝 Purchase Request Details")
             st.markdown(f"""
@@ -898,51 +791,48 @@ elif page == "Payment Tracking":
                 actual_pkr = st.number_input("Actual Amount (PKR)", min_value=0.0)
                 remarks = st.text_area("Remarks")
 
-            status = st.selectbox("Payment Status", ["Pending","In Process","Completed"])
+            status = st.selectbox("Payment Status", lookups.PAYMENT_STATUSES)
 
             if st.button("💾 Save Payment"):
-                existing_payment = c.execute(
-                    "SELECT id FROM payment_tracking WHERE pr_id=?", (pr_id_choice,)
-                ).fetchone()
-
-                if existing_payment:
-                    c.execute("""UPDATE payment_tracking
-                                SET pr_number=?, category=?, po_number=?, invoice_number=?, wave_receipt=?, 
-                                    work_confirmation=?, work_order_yesno=?, work_order_number=?, actual_usd=?, actual_pkr=?,
-                                    payment_date=?, remarks=?, status=?
-                                WHERE pr_id=?""",
-                            (pr_number_choice, category_choice, po_number, invoice_number, wave_receipt,
-                            work_confirmation, work_order_yesno, work_order_number, actual_usd, actual_pkr,
-                            str(payment_date), remarks, status, pr_id_choice))
-                    st.success(f"✅ Updated payment for PR {pr_number_choice} (ID {pr_id_choice}). Status: {status}")
-
-                else:
-                    c.execute("""INSERT INTO payment_tracking (
-                        pr_id, pr_number, category, po_number, invoice_number, wave_receipt,
-                        work_confirmation, work_order_yesno, work_order_number, actual_usd, actual_pkr,
-                        payment_date, remarks, status
-                    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", (
-                        pr_id_choice, pr_number_choice, category_choice, po_number, invoice_number, wave_receipt,
-                        work_confirmation, work_order_yesno, work_order_number, actual_usd, actual_pkr,
-                        str(payment_date), remarks, status
-                    ))
-                    st.success(f"✅ New payment saved for PR {pr_number_choice} (ID {pr_id_choice}). Status: {status}")
-
-                c.execute("""INSERT INTO status_history 
-                            (record_type, record_id, old_status, new_status, changed_by) 
-                            VALUES (?,?,?,?,?)""",
-                        ("Payment", str(pr_id_choice), None, status, st.session_state["user"]))
-
-                if status == "Completed":
-                    old_pr_status = pr_data["status"]
-                    c.execute("UPDATE pr_tracking SET status='Completed' WHERE id=?", (pr_id_choice,))
-                    c.execute("""INSERT INTO status_history 
-                                (record_type, record_id, old_status, new_status, changed_by) 
-                                VALUES (?,?,?,?,?)""",
-                            ("PR", str(pr_id_choice), old_pr_status, "Completed", st.session_state["user"]))
-
-                conn.commit()
-                time.sleep(2)
+                category_id = lookups.code(conn, "category", category_choice)
+                status_id = lookups.code(conn, "status", status)
+                actual_usd_minor, actual_pkr_minor = money.to_minor(actual_usd), money.to_minor(actual_pkr)
+                with db.transaction("payment_tracking", "pr_lines", "status_history") as cur:
+                    # One payment per PR (unique pr_id): insert, or overwrite the existing one
+                    # and get its previous status back from the same statement
+                    old_status_id, = cur.execute("""INSERT INTO payment_tracking (
+                            pr_id, pr_number, category_id, po_number, invoice_number, wave_receipt,
+                            work_confirmation, work_order_yesno, work_order_number, actual_usd_minor, actual_pkr_minor,
+                            payment_date, remarks, status_id
+                        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                        ON CONFLICT (pr_id) DO UPDATE SET
+                            pr_number=excluded.pr_number, category_id=excluded.category_id,
+                            po_number=excluded.po_number, invoice_number=excluded.invoice_number,
+                            wave_receipt=excluded.wave_receipt, work_confirmation=excluded.work_confirmation,
+                            work_order_yesno=excluded.work_order_yesno, work_order_number=excluded.work_order_number,
+                            actual_usd_minor=excluded.actual_usd_minor, actual_pkr_minor=excluded.actual_pkr_minor,
+                            payment_date=excluded.payment_date, remarks=excluded.remarks,
+                            status_id=excluded.status_id, previous_status_id=payment_tracking.status_id
+                        RETURNING previous_status_id""", (
+                            pr_id_choice, pr_number_choice, category_id, po_number, invoice_number, wave_receipt,
+                            work_confirmation, work_order_yesno, work_order_number, actual_usd_minor, actual_pkr_minor,
+                            str(payment_date), remarks, status_id
+                        )).fetchone()
+                    old_status = lookups.name(conn, "status", old_status_id)
+
+                    cur.execute("""INSERT INTO status_history 
+                                   (record_type, record_id, old_status, new_status, changed_by) 
+                                   VALUES (?,?,?,?,?)""",
+                                ("Payment", str(pr_id_choice), old_status, status, st.session_state["user"]))
+                    if status == "Completed":
+                        old_pr_status = pr_data["status"]
+                        cur.execute("UPDATE pr_lines SET status_id=? WHERE id=?", (status_id, pr_id_choice))
+                        cur.execute("""INSERT INTO status_history 
+                                       (record_type, record_id, old_status, new_status, changed_by) 
+                                       VALUES (?,?,?,?,?)""",
+                                    ("PR", str(pr_id_choice), old_pr_status, "Completed", st.session_state["user"]))
+                flash(f"✅ Payment saved for PR {pr_number_choice} (ID {pr_id_choice}). Status: {status}"
+                      + (f" (was {old_status})" if old_status else ""))
                 st.rerun()
 
     # --- Case 2: DSA Payment ---
@@ -950,12 +840,11 @@ elif page == "Payment Tracking":
         st.subheader("✈️ DSA Payment Form")
         col1, col2 = st.columns(2)
         with col1:
-            dsa_type = st.selectbox("DSA Type", ["TPC Staff","Gop Officials","Other Participants"])
+            dsa_type = st.selectbox("DSA Type", lookups.options(conn, "dsa_type"))
             date_request = st.date_input("Date of Request")
             staff_name = st.text_input("Created By", value=st.session_state["user"])
-            programme_unit = st.selectbox("Programme Unit", 
-                ["CRLR","HEALTH","PROTECTION","SNFI and WASH","DTM","FCDO- BRAVE","MECC","Core Staff_ HRRD"])
-            type_services = st.selectbox("Type of Services", ["Goods","Services","Works"])
+            programme_unit = st.selectbox("Programme Unit", lookups.options(conn, "programme_unit"))
+            type_services = st.selectbox("Type of Services", lookups.options(conn, "type_services"))
         with col2:
             vendor_name = st.text_input("Vendor Name")
             description = st.text_area("Description")
@@ -977,24 +866,25 @@ elif page == "Payment Tracking":
             ist_number = st.text_input("IST Number")
         with col2:
             comments = st.text_area("Comments")
-            status = st.selectbox("Status", ["Pending","In Process","Completed","Paid"])
+            status = st.selectbox("Status", lookups.ADVANCE_STATUSES)
 
         if st.button("💾 Save DSA Payment"):
-            c.execute("""INSERT INTO dsa_payments (
-                date_request, staff_name, programme_unit, type_services, dsa_type,
-                vendor_name, description, location, start_date, end_date,
-                days, amount_pkr, ist_number, comments, status
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", (
-                str(date_request), staff_name, programme_unit, type_services, dsa_type,
-                vendor_name, description, location, str(start_date), str(end_date),
-                days, amount_pkr, ist_number, comments, status
-            ))
-            c.execute("""INSERT INTO status_history 
-                         (record_type, record_id, old_status, new_status, changed_by) 
-                         VALUES (?,?,?,?,?)""",
-                      ("DSA", vendor_name, None, status, st.session_state["user"]))
-            conn.commit()
-            st.success("✅ DSA Payment saved.")
+            with db.transaction("dsa_payments", "status_history") as cur:
+                cur.execute("""INSERT INTO dsa_payments (
+                    date_request, staff_name, programme_unit_id, type_services_id, dsa_type_id,
+                    vendor_name, description, location, start_date, end_date,
+                    days, amount_pkr_minor, ist_number, comments, status_id
+                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", (
+                    str(date_request), staff_name, lookups.code(conn, "programme_unit", programme_unit),
+                    lookups.code(conn, "type_services", type_services), lookups.code(conn, "dsa_type", dsa_type),
+                    vendor_name, description, location, str(start_date), str(end_date),
+                    days, money.to_minor(amount_pkr), ist_number, comments, lookups.code(conn, "status", status)
+                ))
+                cur.execute("""INSERT INTO status_history 
+                               (record_type, record_id, old_status, new_status, changed_by) 
+                               VALUES (?,?,?,?,?)""",
+                            ("DSA", vendor_name, None, status, st.session_state["user"]))
+            flash("✅ DSA Payment saved.")
             st.rerun()
 
     # --- Case 3: Operational Advance ---
@@ -1005,38 +895,37 @@ elif page == "Payment Tracking":
         with col1:
             date_request = st.date_input("Date of Request")
             staff_name = st.text_input("Created By", value=st.session_state["user"])
-            programme_unit = st.selectbox("Programme Unit", 
-                ["CRLR","HEALTH","PROTECTION","SNFI and WASH","DTM","FCDO- BRAVE","MECC","Core Staff_ HRRD"])
+            programme_unit = st.selectbox("Programme Unit", lookups.options(conn, "programme_unit"))
             supplier_name = st.text_input("Supplier Name")
             description = st.text_area("Description")
         with col2:
             invoice_type = st.selectbox("Invoice Type", ["Proforma","Final","Other"])
             invoice_no = st.text_input("Invoice Number")
             total_amount = st.number_input("Total Amount", min_value=0.0)
-            invoice_currency = st.text_input("Invoice Currency")
-            payment_currency = st.text_input("Payment Currency")
+            invoice_currency = st.selectbox("Invoice Currency", money.CURRENCIES)
+            payment_currency = st.selectbox("Payment Currency", money.CURRENCIES)
             location = st.text_input("Location")
             comments = st.text_area("Comments")
-            status = st.selectbox("Status", ["Pending","In Process","Completed","Paid"])
+            status = st.selectbox("Status", lookups.ADVANCE_STATUSES)
 
         if st.button("💾 Save Operational Advance"):
             try:
-                c.execute("""INSERT INTO operational_advances (
-                    date_request, staff_name, programme_unit, supplier_name, description,
-                    invoice_type, invoice_no, total_amount, invoice_currency, payment_currency,
-                    location, comments, status
-                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""", (
-                    str(date_request), staff_name, programme_unit, supplier_name, description,
-                    invoice_type, invoice_no, total_amount, invoice_currency, payment_currency,
-                    location, comments, status
-                ))
-                conn.commit()
-                c.execute("""INSERT INTO status_history 
-                             (record_type, record_id, old_status, new_status, changed_by) 
-                             VALUES (?,?,?,?,?)""",
-                          ("OA", str(c.lastrowid), None, status, st.session_state["user"]))
-                conn.commit()
-                st.success("✅ Operational Advance saved successfully!")
+                with db.transaction("operational_advances", "status_history") as cur:
+                    cur.execute("""INSERT INTO operational_advances (
+                        date_request, staff_name, programme_unit_id, supplier_name, description,
+                        invoice_type, invoice_no, total_amount_minor, invoice_currency, payment_currency,
+                        location, comments, status_id
+                    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""", (
+                        str(date_request), staff_name, lookups.code(conn, "programme_unit", programme_unit),
+                        supplier_name, description,
+                        invoice_type, invoice_no, money.to_minor(total_amount), invoice_currency, payment_currency,
+                        location, comments, lookups.code(conn, "status", status)
+                    ))
+                    cur.execute("""INSERT INTO status_history 
+                                   (record_type, record_id, old_status, new_status, changed_by) 
+                                   VALUES (?,?,?,?,?)""",
+                                ("OA", str(cur.lastrowid), None, status, st.session_state["user"]))
+                flash("✅ Operational Advance saved successfully!")
                 st.rerun()
             except Exception as e:
                 st.error(f"Error saving OA: {e}")
@@ -1048,18 +937,27 @@ elif page == "Payment Tracking":
 elif page == "Operational Advance Liquidation":
     st.title("💼 Operational Advance Liquidation")
 
-    oas = pd.read_sql("SELECT * FROM operational_advances", conn)
-    if oas.empty:
-        st.warning("⚠️ No operational advances found.")
+    # Only advances without a liquidation yet; labels are precomputed once per write
+    oa_options = db.open_advance_options(conn)
+    if not oa_options:
+        st.warning("⚠️ No operational advances awaiting liquidation.")
+        st.stop()
+
+    oa_search = st.text_input("Search Operational Advance", key="liq_search",
+                              placeholder=f"Type to search {len(oa_options)} open advances (ID, supplier, description)")
+    oa_matches = db.search_labels(oa_options, oa_search)
+    if not oa_matches:
+        st.info("No operational advance matches the search.")
         st.stop()
 
     selected_oa_id = st.selectbox(
         "Select Operational Advance to Liquidate",
-        oas["id"],
-        format_func=lambda x: f"ID {x} | {oas.loc[oas['id']==x, 'supplier_name'].values[0]} | {oas.loc[oas['id']==x, 'description'].values[0]}"
+        oa_matches,
+        format_func=oa_options.get
     )
 
-    oa_data = oas[oas["id"] == selected_oa_id].iloc[0]
+    oa_data = money.decode(lookups.decode(conn, db.read_cached(
+        conn, "SELECT * FROM operational_advances WHERE id=?", ["operational_advances"], [selected_oa_id]))).iloc[0]
 
     st.markdown("### 🔹 Operational Advance Details")
     st.write(f"""
@@ -1101,38 +999,42 @@ elif page == "Operational Advance Liquidation":
         unspent_wbl_task_number = st.text_input("Task Number (Unspent)")
 
     documents_submitted = st.selectbox("Documents/Reports Submitted?", ["No", "Yes"])
-    status = st.selectbox("Liquidation Status", ["Pending", "In Process", "Completed", "Paid"])
+    status = st.selectbox("Liquidation Status", lookups.ADVANCE_STATUSES)
     comments = st.text_area("Comments", value=oa_data["comments"] or "")
 
     if st.button("💾 Save Liquidation Record"):
+        programme_unit = oa_data["programme_unit"] if pd.notna(oa_data["programme_unit"]) else None
         try:
-            c.execute("""INSERT INTO operational_liquidations (
-                oa_id, date_request, staff_name, programme_unit, category, supplier_name, description,
-                invoice_type, invoice_no, total_amount, invoice_currency, payment_currency,
-                liquidation_ist, liquidation_amount, wbl_project_code, wbl_task_number,
-                unspent_amount, unspent_deposit_yesno, deposited_amount,
-                unspent_ist1, unspent_ist2, unspent_wbl_project_code, unspent_wbl_task_number,
-                documents_submitted, location, comments, status
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", (
-                int(oa_data["id"]), str(date_request), staff_name, oa_data["programme_unit"], oa_data["invoice_type"],
-                oa_data["supplier_name"], oa_data["description"], oa_data["invoice_type"], oa_data["invoice_no"],
-                oa_data["total_amount"], oa_data["invoice_currency"], oa_data["payment_currency"],
-                liquidation_ist, liquidation_amount, wbl_project_code, wbl_task_number,
-                unspent_amount, unspent_deposit_yesno, deposited_amount,
-                unspent_ist1, unspent_ist2, unspent_wbl_project_code, unspent_wbl_task_number,
-                documents_submitted, oa_data["location"], comments, status
-            ))
+            with db.transaction("operational_liquidations", "operational_advances", "status_history") as cur:
+                cur.execute("""INSERT INTO operational_liquidations (
+                    oa_id, date_request, staff_name, programme_unit_id, category, supplier_name, description,
+                    invoice_type, invoice_no, total_amount_minor, invoice_currency, payment_currency,
+                    liquidation_ist, liquidation_amount_minor, wbl_project_code, wbl_task_number,
+                    unspent_amount_minor, unspent_deposit_yesno, deposited_amount_minor,
+                    unspent_ist1, unspent_ist2, unspent_wbl_project_code, unspent_wbl_task_number,
+                    documents_submitted, location, comments, status_id
+                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", (
+                    int(oa_data["id"]), str(date_request), staff_name,
+                    lookups.code(conn, "programme_unit", programme_unit), oa_data["invoice_type"],
+                    oa_data["supplier_name"], oa_data["description"], oa_data["invoice_type"], oa_data["invoice_no"],
+                    money.to_minor(oa_data["total_amount"]), oa_data["invoice_currency"], oa_data["payment_currency"],
+                    liquidation_ist, money.to_minor(liquidation_amount), wbl_project_code, wbl_task_number,
+                    money.to_minor(unspent_amount), unspent_deposit_yesno, money.to_minor(deposited_amount),
+                    unspent_ist1, unspent_ist2, unspent_wbl_project_code, unspent_wbl_task_number,
+                    documents_submitted, oa_data["location"], comments, lookups.code(conn, "status", status)
+                ))
+
+                if status in ["Completed", "Paid"]:
+                    cur.execute("UPDATE operational_advances SET status_id=? WHERE id=?",
+                                (lookups.code(conn, "status", status), int(oa_data["id"])))
+                    cur.execute("""INSERT INTO status_history
+                                   (record_type, record_id, old_status, new_status, changed_by)
+                                   VALUES (?,?,?,?,?)""",
+                                ("OA", str(oa_data["id"]), oa_data["status"], status, st.session_state["user"]))
 
+            flash(f"✅ Liquidation record saved for OA ID {oa_data['id']}")
             if status in ["Completed", "Paid"]:
-                c.execute("UPDATE operational_advances SET status=? WHERE id=?", (status, int(oa_data["id"])))
-                c.execute("""INSERT INTO status_history
-                             (record_type, record_id, old_status, new_status, changed_by)
-                             VALUES (?,?,?,?,?)""",
-                          ("OA", str(oa_data["id"]), oa_data["status"], status, st.session_state["user"]))
-                st.info("Operational Advance marked as closed ✅")
-
-            conn.commit()
-            st.success(f"✅ Liquidation record saved for OA ID {oa_data['id']}")
+                flash("Operational Advance marked as closed ✅")
             st.rerun()
 
         except Exception as e:
@@ -1163,10 +1065,10 @@ elif page == "User Management":
             else:
                 try:
                     hashed_pwd = hash_password(pwd.strip())
-                    c.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)", 
-                              (uname.strip(), hashed_pwd, role))
-                    conn.commit()
-                    st.success(f"✅ User {uname} added!")
+                    with db.transaction("users") as cur:
+                        cur.execute("INSERT INTO users (username, password, role) VALUES (?,?,?)", 
+                                    (uname.strip(), hashed_pwd, role))
+                    flash(f"✅ User {uname} added!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error: {e}")
@@ -1181,9 +1083,9 @@ elif page == "User Management":
         with col1:
             del_user = st.selectbox("Select User ID to delete", users["id"])
             if st.button("🗑️ Delete User"):
-                c.execute("DELETE FROM users WHERE id=?", (del_user,))
-                conn.commit()
-                st.success(f"✅ User {del_user} deleted.")
+                with db.transaction("users") as cur:
+                    cur.execute("DELETE FROM users WHERE id=?", (del_user,))
+                flash(f"✅ User {del_user} deleted.")
                 st.rerun()
 
         with col2:
@@ -1194,8 +1096,8 @@ elif page == "User Management":
                     st.error("⚠️ Enter a new password.")
                 else:
                     hashed_pwd = hash_password(new_pwd.strip())
-                    c.execute("UPDATE users SET password=? WHERE username=?", (hashed_pwd, reset_user))
-                    conn.commit()
+                    with db.transaction("users") as cur:
+                        cur.execute("UPDATE users SET password=? WHERE username=?", (hashed_pwd, reset_user))
                     st.success(f"✅ Password reset for {reset_user}")
 
 # --- Reports ---
@@ -1206,19 +1108,19 @@ elif page == "Reports":
     st.subheader("🔍 Filters")
     col1, col2, col3 = st.columns(3)
     with col1:
-        all_prs = pd.read_sql("SELECT DISTINCT pr_number FROM pr_tracking", conn)
-        pr_filter = st.selectbox("Filter by PR Number", ["All"] + all_prs["pr_number"].tolist() if not all_prs.empty else ["All"])
+        pr_filter = pr_number_filter("reports")
     with col2:
-        all_categories = pd.read_sql("SELECT DISTINCT category FROM pr_tracking", conn)
-        cat_filter = st.selectbox("Filter by Category", ["All"] + all_categories["category"].dropna().tolist() if not all_categories.empty else ["All"])
+        cat_filter = st.selectbox("Filter by Category", ["All"] + lookups.options(conn, "category"))
     with col3:
-        all_staff = pd.read_sql("SELECT DISTINCT staff_name FROM pr_tracking", conn)
-        staff_filter = st.selectbox("Filter by Staff/User", ["All"] + all_staff["staff_name"].dropna().tolist() if not all_staff.empty else ["All"])
+        staff_filter = st.selectbox("Filter by Staff/User", ["All"] + db.distinct_values(conn, "pr_headers", "staff_name"))
 
     # Single PR Report
     st.subheader("📄 Single PR Report")
     if pr_filter != "All":
-        prs = pd.read_sql("SELECT * FROM pr_tracking WHERE pr_number=?", conn, params=[pr_filter])
+        prs = lookups.decode(conn, pd.read_sql("""
+            SELECT id, pr_number, date_request, staff_name, programme_unit_id, category_id, status_id
+            FROM pr_tracking WHERE pr_number=?
+        """, conn, params=[pr_filter]))
         if prs.empty:
             st.warning("⚠️ No PRs found with that number.")
         else:
@@ -1241,38 +1143,86 @@ elif page == "Reports":
 
             # Payments linked to PR
             st.subheader("💰 Payments")
-            payments = pd.read_sql("SELECT * FROM payment_tracking WHERE pr_id=?", conn, params=[pr_id_choice])
+            payments = frames.load(conn, "payment_tracking", "pr_id=?", [pr_id_choice])
             st.dataframe(payments if not payments.empty else pd.DataFrame(columns=["No payments found"]), use_container_width=True)
 
             # Status Timeline
             st.subheader("📜 Status Timeline")
-            timeline = pd.read_sql("SELECT * FROM status_history WHERE record_id=? ORDER BY changed_at", conn, params=[pr_id_choice])
+            timeline = frames.load(conn, "status_history", "record_id=?", [str(pr_id_choice)], order="changed_at")
             st.dataframe(timeline if not timeline.empty else pd.DataFrame(columns=["No status history"]), use_container_width=True)
 
             # Export PR-specific report
-            file_name = f"PR_Report_{pr_row['pr_number']}_ID{pr_id_choice}.xlsx"
-            with pd.ExcelWriter(file_name, engine="xlsxwriter") as writer:
-                pr_data.to_excel(writer, index=False, sheet_name="PR")
-                payments.to_excel(writer, index=False, sheet_name="Payments")
-                timeline.to_excel(writer, index=False, sheet_name="Timeline")
-            with open(file_name, "rb") as f:
-                st.download_button("⬇️ Download PR Report", f, file_name=file_name)
+            pr_format = st.selectbox("Format", exports.formats(), format_func=lambda f: exports.FORMATS[f][0],
+                                     key="pr_report_format")
+            extension, mime = exports.file_type(pr_format)
+            st.download_button("⬇️ Download PR Report", exports.pr_report(conn, pr_id_choice, pr_format),
+                               file_name=f"PR_Report_{pr_row['pr_number']}_ID{pr_id_choice}{extension}",
+                               mime=mime)
 
     # Export Full Database
     st.subheader("📊 Export All Data")
+    col1, col2, col3 = st.columns(3)
+    export_from = col1.date_input("From date (optional)", value=None)
+    export_to = col2.date_input("To date (optional)", value=None)
+    export_format = col3.selectbox("Format", exports.formats(), format_func=lambda f: exports.FORMATS[f][0],
+                                   help="Parquet, Arrow and CSV download as a zip with one file per table")
     if st.button("⬇️ Download Full Database"):
-        pr_all = pd.read_sql("SELECT * FROM pr_tracking", conn)
-        pay_all = pd.read_sql("SELECT * FROM payment_tracking", conn)
-        dsa_all = pd.read_sql("SELECT * FROM dsa_payments", conn)
-        oa_all = pd.read_sql("SELECT * FROM operational_advances", conn)
-        timeline_all = pd.read_sql("SELECT * FROM status_history", conn)
-
-        file_name = "Full_Report.xlsx"
-        with pd.ExcelWriter(file_name, engine="xlsxwriter") as writer:
-            pr_all.to_excel(writer, index=False, sheet_name="PRs")
-            pay_all.to_excel(writer, index=False, sheet_name="Payments")
-            dsa_all.to_excel(writer, index=False, sheet_name="DSA_Payments")
-            oa_all.to_excel(writer, index=False, sheet_name="Operational_Advances")
-            timeline_all.to_excel(writer, index=False, sheet_name="Timeline")
-        with open(file_name, "rb") as f:
-            st.download_button("⬇️ Download Full Report", f, file_name=file_name)
+        jobs.submit(conn, "full", st.session_state["user"], start=export_from, end=export_to, fmt=export_format)
+
+    # Delta export: only rows inserted, changed or deleted since the last pull
+    st.subheader("🔁 Export Changes")
+    since = jobs.last_watermark(conn, st.session_state["user"])
+    st.caption(f"Rows written since your last change export ({since} UTC)." if since
+               else "No change export yet: the first one contains every row.")
+    col1, col2 = st.columns(2)
+    delta_format = col1.selectbox("Format", exports.formats(), format_func=lambda f: exports.FORMATS[f][0],
+                                  key="delta_format")
+    resync = col2.checkbox("Full resync (every row)")
+    if st.button("⬇️ Download Changes"):
+        jobs.submit(conn, "delta", st.session_state["user"], since=None if resync else since, fmt=delta_format)
+
+    # Export jobs run in a worker process; only their progress is polled
+    def export_caption(job):
+        """(download file name without extension, caption) of a job."""
+        params = job["params"]
+        fmt = exports.FORMATS[params.get("fmt", "xlsx")][0]
+        if job["kind"] == "delta":
+            stamp = (job["watermark"] or "").replace(" ", "_").replace(":", "")
+            scope = f"changes since {params['since']}" if params.get("since") else "full resync"
+            return f"Delta_Report_{stamp}", f"Changes ({scope}, {fmt}) · requested {job['created_at']}"
+        period = "_".join(d for d in (params.get("start"), params.get("end")) if d) or "all"
+        return f"Full_Report_{period}", f"Full report ({period}, {fmt}) · requested {job['created_at']}"
+
+    export_jobs = jobs.recent(conn, st.session_state["user"])
+    finished = {}
+    for job in export_jobs:
+        if job["state"] == "failed":
+            st.error(f"❌ {export_caption(job)[1]} · {job['error']}")
+        elif job["state"] == "done" and job["artifact"] and os.path.exists(job["artifact"]):
+            finished[job["id"]] = job
+    if finished:
+        # download_button loads its file on every rerun, so only the chosen
+        # export (the newest by default) is read; the rest stay on disk
+        job = finished[st.selectbox("Finished exports", list(finished),
+                                    format_func=lambda job_id: f"{export_caption(finished[job_id])[1]}"
+                                                               f" · {finished[job_id]['rows_done']:,} rows")]
+        file_stem, _ = export_caption(job)
+        extension, mime = exports.file_type(job["params"].get("fmt", "xlsx"))
+        with open(job["artifact"], "rb") as f:
+            st.download_button("⬇️ Download export", f, file_name=file_stem + extension, mime=mime,
+                               key=f"export_job_{job['id']}")
+
+    if any(job["state"] in jobs.ACTIVE for job in export_jobs):
+        @st.fragment(run_every=2)
+        def export_progress():
+            # run_every reruns happen on other threads: use this thread's connection
+            running = [job for job in jobs.recent(db.connection(), st.session_state["user"])
+                       if job["state"] in jobs.ACTIVE]
+            if not running:
+                st.rerun()              # show the finished jobs' download buttons
+            for job in running:
+                total = job["rows_total"] or 0
+                st.progress(min(job["rows_done"] / total, 1.0) if total else 0.0,
+                            text=f"⏳ {export_caption(job)[1]} · {job['rows_done']:,} / {total:,} rows")
+
+        export_progress()
@@ -0,0 +1,201 @@
+# ==============================
+# Background export jobs
+# ==============================
+#
+# Building a large workbook is CPU-bound, so instead of running it inside a
+# Streamlit click handler (blocking that session and a server thread) the
+# Reports page queues a row in export_jobs and a process pool builds the
+# file into ARTIFACT_DIR. The worker writes its progress to the job row,
+# which the page polls; the server marks the job done or failed when the
+# worker returns.
+#
+# A job's fingerprint covers the report, its parameters and the stored
+# write counters (db.stored_versions) of the tables it reads. While none of
+# them has been written, by this or any other process, a new request for
+# the same report gets the queued, running or finished job back instead of
+# a second build.
+#
+# A "delta" job exports only the rows written since the user's previous
+# delta (`since`, None for a full resync). The worker takes the new
+# watermark (db.watermark) before reading and the finished job records
+# it, which is where the user's next delta starts.
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import db
+import exports
+import lookups
+
+ARTIFACT_DIR = "export_artifacts"
+WORKERS = 2
+KEEP_ARTIFACTS = 20          # finished files kept on disk, newest first
+PROGRESS_SECONDS = 0.5       # how often a worker writes rows_done
+
+ACTIVE = ("queued", "running")
+
+# kind -> (tables read, file name prefix, per user)
+REPORTS = {
+    "full": ([table for _, table in exports.FULL_REPORT], "Full_Report", False),
+    "delta": ([table for _, table in exports.FULL_REPORT] + ["export_deletions"], "Delta_Report", True),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor(broken=None):
+    """The process pool, started on first use. Jobs left queued or running
+    by a previous server process can never finish and are marked failed.
+    Pass the pool a submit failed on with BrokenProcessPool (a worker died)
+    to get a new one; the jobs it was running already failed."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            with db.transaction("export_jobs") as cur:
+                cur.execute("""UPDATE export_jobs SET state='failed', error='Interrupted by a server restart',
+                               finished_at=CURRENT_TIMESTAMP WHERE state IN ('queued', 'running')""")
+            _executor = _new_pool()
+        elif broken is not None and _executor is broken:
+            broken.shutdown(wait=False)
+            _executor = _new_pool()
+        return _executor
+
+
+def _new_pool():
+    return ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def fingerprint(conn, kind, params, user=None):
+    tables, _, per_user = REPORTS[kind]
+    versions = db.stored_versions(conn, [*tables, *lookups.TABLES.values()])
+    key = json.dumps([kind, params, versions, user if per_user else None], sort_keys=True, default=str)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def submit(conn, kind, user=None, **params):
+    """Queue a `kind` report (start/end dates for "full", since for "delta",
+    and fmt, an exports.FORMATS key) and return its job id, or the id of an
+    identical job that is active or whose file is still on disk."""
+    pool = executor()
+    params = {k: str(v) if v is not None else None for k, v in params.items()}
+    key = fingerprint(conn, kind, params, user)
+    for job_id, state, artifact in conn.execute("""SELECT id, state, artifact FROM export_jobs
+                                                   WHERE fingerprint=? AND state != 'failed'
+                                                   ORDER BY id DESC""", (key,)).fetchall():
+        if state in ACTIVE or (artifact and os.path.exists(artifact)):
+            return job_id
+
+    with db.transaction("export_jobs") as cur:
+        job_id, = cur.execute("""INSERT INTO export_jobs (kind, params, fingerprint, requested_by)
+                                 VALUES (?,?,?,?) RETURNING id""",
+                              (kind, json.dumps(params), key, user)).fetchone()
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    extension, _ = exports.file_type(params["fmt"])
+    artifact = os.path.abspath(os.path.join(ARTIFACT_DIR, f"{REPORTS[kind][1]}_job{job_id}{extension}"))
+    args = (_build, os.path.abspath(db.pool.path), job_id, kind, params, artifact)
+    try:
+        future = pool.submit(*args)
+    except BrokenProcessPool:
+        future = executor(broken=pool).submit(*args)
+    future.add_done_callback(lambda f: _finished(job_id, f))
+    return job_id
+
+
+def _build(db_path, job_id, kind, params, artifact):
+    """Worker process: write the report to a temporary name and move it into
+    place, so a half-written file is never handed out. Returns the rows
+    written, the file and, for a delta, its watermark."""
+    data = db.ConnectionPool(db_path).connection()
+    status = db.ConnectionPool(db_path).connection()     # progress commits stay out of the read
+    if kind == "delta":
+        until = db.watermark(status)
+        parts = exports.delta_parts(params["since"], until)
+    else:
+        until = None
+        parts = exports.full_parts(params["start"], params["end"])
+    with exports.snapshot(data):             # the count and the export see the same rows
+        status.execute("UPDATE export_jobs SET state='running', rows_total=? WHERE id=?",
+                       (exports.count_rows(data, parts), job_id))
+        status.commit()
+
+        done, last = 0, time.monotonic()
+
+        def progress(rows):
+            nonlocal done, last
+            done += rows
+            if time.monotonic() - last >= PROGRESS_SECONDS:
+                status.execute("UPDATE export_jobs SET rows_done=? WHERE id=?", (done, job_id))
+                status.commit()
+                last = time.monotonic()
+
+        partial = artifact + ".part"
+        try:
+            exports.write_report(data, parts, params["fmt"], out=partial, progress=progress)
+            os.replace(partial, artifact)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+    return done, artifact, until
+
+
+def _finished(job_id, future):
+    """Runs in the server once the worker returns (or dies). The pool
+    swallows a done-callback's exceptions, so if recording the result
+    fails the job is marked failed instead of staying 'running' forever."""
+    try:
+        error = future.exception()
+        if error is None:
+            with db.transaction("export_jobs") as cur:
+                cur.execute("""UPDATE export_jobs SET state='done', rows_done=?, artifact=?, watermark=?,
+                               finished_at=CURRENT_TIMESTAMP WHERE id=?""", (*future.result(), job_id))
+            prune(db.connection())
+            return
+    except Exception as e:
+        error = e
+    with db.transaction("export_jobs") as cur:
+        cur.execute("""UPDATE export_jobs SET state='failed', error=?, finished_at=CURRENT_TIMESTAMP
+                       WHERE id=?""", (f"{type(error).__name__}: {error}", job_id))
+
+
+def prune(conn, keep=KEEP_ARTIFACTS):
+    """Delete the files of all but the newest `keep` finished jobs. A file
+    that cannot be removed yet (still being downloaded) is retried on the
+    next prune."""
+    old = conn.execute("""SELECT id, artifact FROM export_jobs WHERE artifact IS NOT NULL
+                          ORDER BY id DESC LIMIT -1 OFFSET ?""", (keep,)).fetchall()
+    removed = []
+    for job_id, artifact in old:
+        try:
+            if os.path.exists(artifact):
+                os.remove(artifact)
+        except OSError:
+            continue
+        removed.append((job_id,))
+    if removed:
+        with db.transaction("export_jobs") as cur:
+            cur.executemany("UPDATE export_jobs SET artifact=NULL WHERE id=?", removed)
+
+
+def last_watermark(conn, user):
+    """Where the user's next delta export starts: the watermark of their
+    latest finished one, or None if they have none."""
+    row = conn.execute("""SELECT watermark FROM export_jobs
+                          WHERE kind='delta' AND requested_by=? AND state='done'
+                          ORDER BY id DESC LIMIT 1""", (user,)).fetchone()
+    return row[0] if row else None
+
+
+def recent(conn, user, limit=5):
+    """The user's latest jobs, newest first, as dicts."""
+    cur = conn.execute("""SELECT id, kind, params, state, rows_done, rows_total, artifact, error, watermark,
+                                 created_at
+                          FROM export_jobs WHERE requested_by=? ORDER BY id DESC LIMIT ?""", (user, limit))
+    columns = [d[0] for d in cur.description]
+    return [dict(zip(columns, row), params=json.loads(row[2] or "{}")) for row in cur]
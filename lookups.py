@@ -0,0 +1,105 @@
+# ==============================
+# Integer-coded lookup tables
+# ==============================
+#
+# Status, category, programme unit, service type, vehicle type and DSA type
+# are stored as small integer ids (<column>_id) referencing lookup_* tables,
+# the SQLite counterpart of the Lookup_* tables in access_db_create.py.
+# The id <-> name maps are read once per process and cached until a lookup
+# table is written; decode() turns id columns of a frame into categoricals.
+
+import numpy as np
+import pandas as pd
+
+import db
+
+# domain -> lookup table
+TABLES = {
+    "status": "lookup_status",
+    "category": "lookup_category",
+    "programme_unit": "lookup_programme_unit",
+    "type_services": "lookup_service_type",
+    "type_vehicle": "lookup_vehicle_type",
+    "dsa_type": "lookup_dsa_type",
+}
+
+# Status choices offered per record type (all live in lookup_status)
+PR_STATUSES = ["Submitted", "In Process", "Completed"]
+PAYMENT_STATUSES = ["Pending", "In Process", "Completed"]
+ADVANCE_STATUSES = ["Pending", "In Process", "Completed", "Paid"]   # DSA, OA, liquidations
+
+
+def load(conn):
+    """{domain: (names in id order, {name: id}, id -> position array)}, cached."""
+    def compute():
+        maps = {}
+        for domain, table in TABLES.items():
+            rows = conn.execute(f"SELECT id, name FROM {table} ORDER BY id").fetchall()
+            positions = np.full(max((i for i, _ in rows), default=0) + 1, -1, dtype=np.int16)
+            for pos, (i, _) in enumerate(rows):
+                positions[i] = pos
+            maps[domain] = ([n for _, n in rows], {n: i for i, n in rows}, positions)
+        return maps
+    return db.memoize(conn, "lookups", list(TABLES.values()), compute)
+
+
+def options(conn, domain):
+    """Names of a domain in id order, for select boxes."""
+    return list(load(conn)[domain][0])
+
+
+def code(conn, domain, name):
+    """Id for `name` (None for an empty value); unknown names raise ValueError."""
+    if name is None or name == "":
+        return None
+    ids = load(conn)[domain][1]
+    if name not in ids:
+        raise ValueError(f"Unknown {domain.replace('_', ' ')}: {name!r}")
+    return ids[name]
+
+
+def name(conn, domain, id_):
+    if id_ is None:
+        return None
+    names, ids, positions = load(conn)[domain]
+    pos = positions[id_] if 0 <= id_ < len(positions) else -1
+    return names[pos] if pos >= 0 else None
+
+
+def dtype(conn, domain):
+    return pd.CategoricalDtype(load(conn)[domain][0])
+
+
+def domain_of(column):
+    """Lookup domain of an id column ("status_id", "oa_status_id", ...) or None."""
+    if column.endswith("_id"):
+        for domain in TABLES:
+            if column.endswith(f"{domain}_id"):
+                return domain
+    return None
+
+
+def label(column):
+    """Display name of a column: id columns lose their _id suffix."""
+    return column[:-3] if domain_of(column) else column
+
+
+def decode(conn, df):
+    """Copy of `df` with every lookup id column replaced by a categorical of
+    names ("category_id" -> "category")."""
+    maps = load(conn)
+    decoded, renames = {}, {}
+    for column in df.columns:
+        domain = domain_of(column)
+        if domain is None:
+            continue
+        names, _, positions = maps[domain]
+        ids = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float, na_value=-1)
+        ids = ids.astype(np.int64)
+        valid = (ids >= 0) & (ids < len(positions))
+        codes = np.where(valid, positions[np.where(valid, ids, 0)], -1)
+        decoded[column] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(names))
+        renames[column] = label(column)
+    if not decoded:
+        return df
+    return df.assign(**decoded).rename(columns=renames)
@@ -0,0 +1,52 @@
+# ==============================
+# Amounts as integer minor units
+# ==============================
+#
+# Money is stored as INTEGER paisa / cents in <column>_minor columns
+# (db.MONEY_COLUMNS), so totals are exact and the rollup triggers add and
+# subtract integers instead of accumulating REAL rounding error. PKR and
+# USD both have two decimal places (ISO 4217). Forms and imports still
+# deal in rupees / dollars; to_minor() converts on the way in and decode()
+# turns the columns of a frame back into amounts for display.
+
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+import db
+
+MINOR_UNITS = 100
+CURRENCIES = ["PKR", "USD"]
+
+# amount column -> currency (None: the row's payment_currency)
+AMOUNTS = {column: currency for _, column, currency in db.MONEY_COLUMNS}
+
+
+def to_minor(amount):
+    """Rupees / dollars -> integer minor units, rounding half up (None stays None)."""
+    if amount is None or amount == "" or amount != amount:      # NaN
+        return None
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_major(minor):
+    return None if minor is None else minor / MINOR_UNITS
+
+
+def column(name):
+    """Stored column of an amount ("est_cost_pkr" -> "est_cost_pkr_minor")."""
+    return f"{name}_minor" if name in AMOUNTS else name
+
+
+def label(column):
+    return column[:-len("_minor")] if column.endswith("_minor") else column
+
+
+def decode(df):
+    """Copy of `df` with every *_minor column turned into a float64 amount
+    under its plain name."""
+    minor = [c for c in df.columns if c.endswith("_minor")]
+    if not minor:
+        return df
+    amounts = {c: df[c].astype(np.float64) / MINOR_UNITS for c in minor}
+    return df.assign(**amounts).rename(columns={c: label(c) for c in minor})
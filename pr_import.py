@@ -0,0 +1,220 @@
+# ==============================
+# Bulk PR import from CSV / Excel
+# ==============================
+#
+# Streams a spreadsheet CHUNK_ROWS rows at a time, validates each chunk with
+# vectorized pandas checks (required fields, dates, amounts, WBL
+# percentages) and loads the valid rows through pr_submit.insert_lines, one
+# transaction per chunk. Memory stays bounded by the chunk size. Invalid
+# rows are skipped and reported with their spreadsheet row number.
+#
+# One spreadsheet row is one PR line; rows sharing a pr_number form one PR.
+# WBL allocations go in wbl1_project / wbl1_task / wbl1_percentage, ...
+# up to wbl5_*, the same limit as the PR Tracking form.
+#
+#   python pr_import.py FILE [--user NAME]
+
+import sys
+from itertools import islice
+
+import pandas as pd
+
+import db
+import lookups
+import pr_submit
+
+CHUNK_ROWS = 5000
+MAX_WBLS = 5
+
+# column -> label used in error messages (same wording as the form)
+REQUIRED = {
+    "pr_number": "PR Number",
+    "date_request": "Date of Request",
+    "programme_unit": "Programme Unit",
+    "type_services": "Type of Services",
+    "category": "Category",
+    "assigned_to": "Assigned To",
+    "location": "Location",
+    "from_date": "From",
+    "to_date": "To",
+}
+TEXT_COLUMNS = (
+    "pr_number", "staff_name", "programme_unit", "type_services", "category", "description",
+    "type_vehicle", "traveller_name", "traveller_phone", "location", "reminder_expiry",
+    "comments", "assigned_to",
+)
+DATE_COLUMNS = ("date_request", "from_date", "to_date")
+NUMBER_COLUMNS = ("qty", "est_cost_pkr", "est_cost_usd", "reminder_days")
+WBL_COLUMNS = tuple(f"wbl{n}_{part}" for n in range(1, MAX_WBLS + 1)
+                    for part in ("project", "task", "percentage"))
+TEMPLATE_COLUMNS = (pr_submit.HEADER_COLUMNS + tuple(c for c in pr_submit.LINE_COLUMNS if c != "days")
+                    + WBL_COLUMNS)
+
+
+def template_csv():
+    """Header-only CSV users can fill in."""
+    return (",".join(TEMPLATE_COLUMNS) + "\n").encode("utf-8")
+
+
+# --- Reading ---
+def _column_name(name):
+    return str(name).strip().lower().replace(" ", "_") if name is not None else ""
+
+
+def _excel_chunks(file, chunk_rows):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        start = 0
+        while batch := list(islice(rows, chunk_rows)):
+            yield pd.DataFrame(batch, columns=header, index=pd.RangeIndex(start, start + len(batch)))
+            start += len(batch)
+    finally:
+        wb.close()
+
+
+def read_chunks(file, name=None, chunk_rows=CHUNK_ROWS):
+    """Yield the rows of a .csv or .xlsx file as DataFrames of at most
+    chunk_rows rows. The index counts data rows from 0 across chunks."""
+    name = str(name or getattr(file, "name", file)).lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        yield from _excel_chunks(file, chunk_rows)
+    else:
+        yield from pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+
+# --- Validation ---
+def validate_chunk(conn, chunk, user):
+    """Split a chunk into rows ready for pr_submit.insert_lines and a
+    DataFrame of errors (row = spreadsheet row number, header being row 1)."""
+    df = chunk.rename(columns=_column_name)
+    df = df.loc[:, ~df.columns.duplicated()]
+    blank = pd.Series("", index=df.index, dtype=object)
+
+    text = {c: df[c].fillna("").astype(str).str.strip() if c in df else blank for c in TEXT_COLUMNS}
+    text["staff_name"] = text["staff_name"].mask(text["staff_name"] == "", user)
+    text["reminder_expiry"] = text["reminder_expiry"].str.capitalize().replace("", "No")
+    raw_dates = {c: df[c].fillna("").astype(str).str.strip() if c in df else blank for c in DATE_COLUMNS}
+    dates = {c: pd.to_datetime(df[c], errors="coerce", format="ISO8601") if c in df
+             else pd.Series(pd.NaT, index=df.index) for c in DATE_COLUMNS}
+    numbers = {c: pd.to_numeric(df[c], errors="coerce") if c in df
+               else pd.Series(float("nan"), index=df.index) for c in NUMBER_COLUMNS}
+    numbers["est_cost_usd"] = numbers["est_cost_usd"].fillna(0.0)
+
+    problems = []   # (mask, message)
+
+    missing = pd.Series("", index=df.index, dtype=object)
+    for col, label in REQUIRED.items():
+        absent = (raw_dates[col] if col in raw_dates else text[col]) == ""
+        missing = missing.mask(absent, missing + ", " + label)
+    problems.append((missing != "", "Missing required fields: " + missing.str[2:]))
+    problems.append((text["category"].eq("Rental Vehicle") & text["type_vehicle"].eq(""),
+                     "Type of Vehicle is required for Rental Vehicle"))
+    for col in ("programme_unit", "type_services", "category", "type_vehicle"):
+        unknown = text[col].ne("") & ~text[col].isin(lookups.options(conn, col))
+        problems.append((unknown, f"Unknown {col.replace('_', ' ')}: " + text[col]))
+
+    for col in DATE_COLUMNS:
+        problems.append((raw_dates[col].ne("") & dates[col].isna(), f"{col}: not a date (use YYYY-MM-DD)"))
+    problems.append((dates["to_date"] < dates["from_date"], "to_date is before from_date"))
+
+    problems.append((~(numbers["qty"] >= 1), "qty must be a number of at least 1"))
+    problems.append((~(numbers["est_cost_pkr"] >= 1), "est_cost_pkr must be a number of at least 1"))
+    problems.append((~text["reminder_expiry"].isin(["Yes", "No"]), "reminder_expiry must be Yes or No"))
+    problems.append((text["reminder_expiry"].eq("Yes") & ~(numbers["reminder_days"] >= 1),
+                     "reminder_days must be at least 1 when reminder_expiry is Yes"))
+
+    # WBLs: an allocation counts once it has a project and a task, as in the form
+    wbl_total = pd.Series(0.0, index=df.index)
+    wbl_any = pd.Series(False, index=df.index)
+    wbl_parts = []
+    for n in range(1, MAX_WBLS + 1):
+        proj = df[f"wbl{n}_project"].fillna("").astype(str).str.strip() if f"wbl{n}_project" in df else blank
+        task = df[f"wbl{n}_task"].fillna("").astype(str).str.strip() if f"wbl{n}_task" in df else blank
+        perc = (pd.to_numeric(df[f"wbl{n}_percentage"], errors="coerce") if f"wbl{n}_percentage" in df
+                else pd.Series(float("nan"), index=df.index))
+        used = proj.ne("") & task.ne("")
+        problems.append((proj.ne("") ^ task.ne(""), f"WBL {n} needs both a project and a task"))
+        problems.append((used & ~perc.between(0, 100), f"WBL {n} percentage must be between 0 and 100"))
+        wbl_total += perc.where(used, 0).fillna(0)
+        wbl_any |= used
+        wbl_parts.append((used, proj, task, perc))
+    # A PR without WBLs is allowed, as in the form; any given must total 100
+    problems.append((wbl_any & ((wbl_total - 100).abs() > 1e-9), "WBL percentages must add up to 100"))
+
+    invalid = pd.Series(False, index=df.index)
+    messages = []
+    for mask, message in problems:
+        mask = mask.fillna(False).astype(bool)
+        invalid |= mask
+        if mask.any():
+            detail = message[mask].to_numpy() if isinstance(message, pd.Series) else message
+            messages.append(pd.DataFrame({"row": df.index[mask] + 2, "error": detail}))
+    errors = (pd.concat(messages).sort_values("row", kind="stable").reset_index(drop=True)
+              if messages else pd.DataFrame({"row": pd.Series(dtype=int), "error": pd.Series(dtype=str)}))
+
+    ok = ~invalid
+    if not ok.any():
+        return [], errors
+
+    out = pd.DataFrame({c: text[c][ok] for c in TEXT_COLUMNS})
+    for col in DATE_COLUMNS:
+        out[col] = dates[col][ok].dt.strftime("%Y-%m-%d")
+    out["days"] = ((dates["to_date"] - dates["from_date"]).dt.days[ok] + 1).clip(lower=0).astype(int)
+    out["qty"] = numbers["qty"][ok].astype(int)
+    out["est_cost_pkr"] = numbers["est_cost_pkr"][ok]
+    out["est_cost_usd"] = numbers["est_cost_usd"][ok]
+    out["reminder_days"] = numbers["reminder_days"][ok].where(out["reminder_expiry"] == "Yes").astype("Int64")
+    for col in ("description", "type_vehicle", "traveller_name", "traveller_phone", "comments"):
+        out[col] = out[col].replace("", None)
+
+    rows = out.astype(object).where(out.notna(), None).to_dict("records")
+    wbls = zip(*[
+        [(p, t, int(pc) if float(pc).is_integer() else float(pc)) if u else None
+         for u, p, t, pc in zip(used[ok], proj[ok], task[ok], perc[ok])]
+        for used, proj, task, perc in wbl_parts
+    ])
+    for row, allocations in zip(rows, wbls):
+        row["wbls"] = [a for a in allocations if a is not None]
+    return rows, errors
+
+
+# --- Loading ---
+def import_file(conn, file, user, name=None, chunk_rows=CHUNK_ROWS, progress=None):
+    """Validate and load a CSV/XLSX file, one transaction per chunk.
+
+    Returns (number of lines imported, DataFrame of row errors).
+    `progress(rows_read, imported)` is called after every chunk.
+    """
+    imported = read = 0
+    errors = []
+    for chunk in read_chunks(file, name, chunk_rows):
+        rows, chunk_errors = validate_chunk(conn, chunk, user)
+        if rows:
+            with db.transaction(*pr_submit.TABLES) as cur:
+                imported += len(pr_submit.insert_lines(cur, rows, user))
+        if not chunk_errors.empty:
+            errors.append(chunk_errors)
+        read += len(chunk)
+        if progress:
+            progress(read, imported)
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=["row", "error"])
+    return imported, errors
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python pr_import.py FILE [--user NAME]")
+    path = sys.argv[1]
+    user = sys.argv[sys.argv.index("--user") + 1] if "--user" in sys.argv else "admin"
+    conn = db.connection()
+    db.migrate(conn)
+    imported, errors = import_file(conn, path, user)
+    print(f"Imported {imported:,} PR line(s).")
+    if not errors.empty:
+        out = path.rsplit(".", 1)[0] + "_errors.csv"
+        errors.to_csv(out, index=False)
+        print(f"{errors['row'].nunique():,} row(s) rejected, see {out}")
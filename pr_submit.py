@@ -0,0 +1,144 @@
+# ==============================
+# PR submission service
+# ==============================
+#
+# Validates a whole PR (header + lines) before touching the database, then
+# writes the pr_headers row, lines, WBL allocations, status history and
+# reminders with executemany inside one transaction. Either every line is
+# saved or none is.
+
+from datetime import datetime, timezone
+
+import db
+import lookups
+import money
+import reminders
+
+
+def validate(header, lines, shared_wbls=None):
+    """Return a list of error messages (empty when the PR can be saved)."""
+    errors = []
+    missing_fields = []
+    if not (header.get("pr_number") or "").strip():
+        missing_fields.append("PR Number")
+    if not header.get("programme_unit"):
+        missing_fields.append("Programme Unit")
+    if not header.get("type_services"):
+        missing_fields.append("Type of Services")
+    if not header.get("category"):
+        missing_fields.append("Category")
+    if header.get("category") == "Rental Vehicle" and not header.get("type_vehicle"):
+        missing_fields.append("Type of Vehicle")
+    if not (header.get("assigned_to") or "").strip():
+        missing_fields.append("Assigned To")
+    if missing_fields:
+        errors.append("⚠️ Missing required fields: " + ", ".join(missing_fields))
+
+    if shared_wbls is not None and sum(p for _, _, p in shared_wbls if p) != 100:
+        errors.append("⚠️ Shared WBL percentages must add up to 100!")
+
+    if not lines:
+        errors.append("⚠️ A PR needs at least one line.")
+    for idx, line in enumerate(lines, start=1):
+        if not (line.get("location") or "").strip() or not line.get("from_date") or not line.get("to_date"):
+            errors.append(f"⚠️ Missing required fields in PR Line #{idx}")
+    return errors
+
+
+# Columns a new PR line supplies (ids, header_id, status and created_at are set
+# here). Lookup columns are given as names and stored as <column>_id; amounts
+# are given in rupees / dollars and stored as <column>_minor.
+HEADER_COLUMNS = (
+    "pr_number", "date_request", "staff_name", "programme_unit", "type_services", "category",
+    "description", "type_vehicle", "traveller_name", "traveller_phone", "assigned_to",
+)
+LINE_COLUMNS = (
+    "from_date", "to_date", "days", "location", "qty",
+    "est_cost_pkr", "est_cost_usd", "reminder_expiry", "reminder_days", "comments",
+)
+TABLES = ("pr_headers", "pr_lines", db.PR_KEYS, "pr_wbls", "status_history", "reminders")
+
+
+def header_ids(cur, headers, created_at):
+    """pr_headers id for each distinct header tuple (ordered as HEADER_COLUMNS).
+    A header identical to an existing one is reused, the rest are inserted."""
+    conn = cur.connection
+    columns = [f"{col}_id" if col in lookups.TABLES else col for col in HEADER_COLUMNS]
+    match = " AND ".join(f"{col} IS ?" for col in columns)
+    ids = {}
+    for header in headers:
+        if header in ids:
+            continue
+        values = tuple(lookups.code(conn, col, value) if col in lookups.TABLES else value
+                       for col, value in zip(HEADER_COLUMNS, header))
+        row = cur.execute(f"SELECT id FROM pr_headers WHERE {match} LIMIT 1", values).fetchone()
+        if row is None:
+            row = cur.execute(f"""INSERT INTO pr_headers ({", ".join(columns)}, created_at)
+                                  VALUES ({", ".join("?" * (len(columns) + 1))}) RETURNING id""",
+                              (*values, created_at)).fetchone()
+        ids[header] = row[0]
+    return ids
+
+
+def insert_lines(cur, rows, user):
+    """Insert PR lines inside the caller's transaction and return their ids.
+
+    `rows` are dicts keyed by HEADER_COLUMNS + LINE_COLUMNS plus "wbls", a
+    list of (project, task, percentage) tuples. The caller must hold the
+    write lock (db.transaction), so nobody else can take ids in between:
+    they are assigned explicitly and every table is filled with one
+    executemany.
+    """
+    created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")    # as CURRENT_TIMESTAMP
+    submitted = lookups.code(cur.connection, "status", "Submitted")
+    headers = [tuple(row.get(col) for col in HEADER_COLUMNS) for row in rows]
+    header_id = header_ids(cur, headers, created_at)
+
+    last = cur.execute("""SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name='pr_lines'), 0),
+                                     COALESCE((SELECT MAX(id) FROM pr_lines), 0))""").fetchone()[0]
+    ids = list(range(last + 1, last + 1 + len(rows)))
+
+    columns = ", ".join(money.column(col) for col in LINE_COLUMNS)
+    cur.executemany(f"""INSERT INTO pr_lines (id, header_id, {columns}, status_id, created_at)
+                        VALUES ({", ".join("?" * (len(LINE_COLUMNS) + 4))})""", [
+        (pr_id, header_id[header],
+         *(money.to_minor(row.get(col)) if col in money.AMOUNTS else row.get(col) for col in LINE_COLUMNS),
+         submitted, created_at)
+        for pr_id, header, row in zip(ids, headers, rows)
+    ])
+
+    cur.executemany("INSERT INTO pr_wbls (pr_id, project_name, task_name, percentage) VALUES (?,?,?,?)", [
+        (pr_id, proj_name, task_name, perc)
+        for pr_id, row in zip(ids, rows)
+        for proj_name, task_name, perc in row.get("wbls", ())
+    ])
+
+    cur.executemany("""INSERT INTO status_history
+                       (record_type, record_id, old_status, new_status, changed_by)
+                       VALUES (?,?,?,?,?)""",
+                    [("PR", str(pr_id), None, "Submitted", user) for pr_id in ids])
+
+    reminders.schedule(cur, [
+        (pr_id, row["from_date"], row.get("reminder_days"))
+        for pr_id, row in zip(ids, rows)
+        if row.get("reminder_expiry") == "Yes"
+    ])
+    return ids
+
+
+def submit(header, lines, user):
+    """Insert a validated PR and return the new line ids, in line order."""
+    rows = [
+        {
+            **header,
+            "date_request": str(header["date_request"]),
+            "from_date": str(line["from_date"]), "to_date": str(line["to_date"]),
+            "days": line["days"], "location": line["location"], "qty": line["qty"],
+            "est_cost_pkr": line["est_pkr"], "est_cost_usd": line.get("est_usd"),
+            "reminder_expiry": line["reminder_expiry"], "reminder_days": line.get("reminder_days"),
+            "comments": line.get("comments"), "wbls": line.get("wbls", ()),
+        }
+        for line in lines
+    ]
+    with db.transaction(*TABLES) as cur:
+        return insert_lines(cur, rows, user)
@@ -0,0 +1,156 @@
+# ==============================
+# PR reminders
+# ==============================
+#
+# A PR line with reminder_expiry='Yes' is due `reminder_days` before its
+# from_date. That date is computed once, when the line is saved, and stored
+# in the indexed `reminders` table, so the Dashboard panel is a range seek
+# over the look-back/look-ahead window.
+#
+# The scheduler (`python reminders.py`) keeps pending reminders in a heap,
+# sleeps until the earliest one is due and writes it to reminder_outbox,
+# so evaluation costs O(due items) rather than a rescan of pr_tracking.
+#
+#   python reminders.py           run the scheduler
+#   python reminders.py --once    deliver whatever is due now and exit
+
+import heapq
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import db
+import lookups
+
+OVERDUE = "⏰ Overdue"
+DUE_TODAY = "⚠️ Due Today"
+UPCOMING = "📌 Upcoming"
+
+POLL_SECONDS = 60   # longest sleep, so reminders added by the app are picked up
+
+
+def reminder_date(from_date, reminder_days):
+    """The day a reminder fires, or None if the line has no usable dates."""
+    if not from_date or not reminder_days:
+        return None
+    if isinstance(from_date, str):
+        from_date = date.fromisoformat(from_date[:10])
+    return from_date - timedelta(days=int(reminder_days))
+
+
+def schedule(cur, lines):
+    """Store reminders for newly inserted PR lines, given as
+    (pr_id, from_date, reminder_days) tuples (inside their transaction)."""
+    cur.executemany("INSERT OR REPLACE INTO reminders (pr_id, reminder_date) VALUES (?,?)", [
+        (pr_id, str(due))
+        for pr_id, from_date, reminder_days in lines
+        if (due := reminder_date(from_date, reminder_days)) is not None
+    ])
+
+
+def due_reminders(conn, today=None, lookahead_days=30, overdue_days=30):
+    """Reminders whose date falls between today - overdue_days and
+    today + lookahead_days, oldest first."""
+    today = today or date.today()
+    df = db.read_cached(conn, """
+        SELECT p.id, p.pr_number, p.staff_name, p.category_id, p.from_date, p.reminder_days,
+               r.reminder_date,
+               CASE WHEN r.reminder_date < :today THEN :overdue
+                    WHEN r.reminder_date = :today THEN :due_today
+                    ELSE :upcoming END AS status
+        FROM reminders r
+        JOIN pr_tracking p ON p.id = r.pr_id
+        WHERE r.reminder_date BETWEEN :start AND :end
+        ORDER BY r.reminder_date, r.id
+    """, ["reminders", "pr_tracking"], {
+        "today": str(today),
+        "start": str(today - timedelta(days=overdue_days)),
+        "end": str(today + timedelta(days=lookahead_days)),
+        "overdue": OVERDUE, "due_today": DUE_TODAY, "upcoming": UPCOMING,
+    })
+    return lookups.decode(conn, df)
+
+
+# --- Background scheduler ---
+class Scheduler:
+    def __init__(self, conn):
+        self.conn = conn
+        self.heap = []        # (reminder_date, reminder id)
+        self.last_id = 0
+
+    def load_new(self):
+        """Push reminders created since the last load onto the heap."""
+        rows = self.conn.execute(
+            "SELECT id, reminder_date FROM reminders WHERE id > ? AND notified_at IS NULL ORDER BY id",
+            (self.last_id,)
+        ).fetchall()
+        for rid, due in rows:
+            heapq.heappush(self.heap, (due, rid))
+            self.last_id = rid
+        return len(rows)
+
+    def deliver_due(self, today=None):
+        """Write every reminder due on or before `today` to the outbox. If the
+        write fails the reminders stay on the heap for the next attempt."""
+        today = str(today or date.today())
+        due = []
+        while self.heap and self.heap[0][0] <= today:
+            due.append(heapq.heappop(self.heap))
+        if not due:
+            return 0
+
+        delivered = 0
+        try:
+            with db.transaction("reminders", "reminder_outbox") as cur:
+                for _, rid in due:
+                    # Skip reminders already sent or whose PR line was deleted
+                    claimed = cur.execute(
+                        "UPDATE reminders SET notified_at=CURRENT_TIMESTAMP WHERE id=? AND notified_at IS NULL",
+                        (rid,)
+                    ).rowcount
+                    if not claimed:
+                        continue
+                    cur.execute("""INSERT INTO reminder_outbox
+                                   (reminder_id, pr_id, pr_number, staff_name, assigned_to,
+                                    from_date, reminder_date, message)
+                                   SELECT r.id, p.id, p.pr_number, p.staff_name, p.assigned_to,
+                                          p.from_date, r.reminder_date,
+                                          'PR ' || p.pr_number || ' (line ' || p.id || ') starts on ' || p.from_date
+                                   FROM reminders r JOIN pr_tracking p ON p.id = r.pr_id
+                                   WHERE r.id=?""", (rid,))
+                    delivered += 1
+        except Exception:
+            for item in due:
+                heapq.heappush(self.heap, item)
+            raise
+        return delivered
+
+    def seconds_until_next(self):
+        if not self.heap:
+            return POLL_SECONDS
+        next_due = datetime.combine(date.fromisoformat(self.heap[0][0]), datetime.min.time())
+        return min(max((next_due - datetime.now()).total_seconds(), 0), POLL_SECONDS)
+
+    def run(self, once=False):
+        while True:
+            try:
+                self.load_new()
+                sent = self.deliver_due()
+            except sqlite3.Error as e:          # e.g. database is locked: retry on the next poll
+                if once:
+                    raise
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} delivery failed, retrying: {e}")
+                time.sleep(POLL_SECONDS)
+                continue
+            if sent:
+                print(f"{datetime.now():%Y-%m-%d %H:%M:%S} queued {sent} reminder(s)")
+            if once:
+                return
+            time.sleep(self.seconds_until_next())
+
+
+if __name__ == "__main__":
+    conn = db.connection()
+    db.migrate(conn)
+    Scheduler(conn).run(once="--once" in sys.argv)
@@ -0,0 +1,238 @@
+# ==============================
+# Summary rollups maintained by SQLite triggers
+# ==============================
+#
+# summary_rollup holds line counts and PKR/USD sums (in paisa / cents, see
+# money.py) per source table x programme unit x category x status x month. INSERT,
+# UPDATE and DELETE triggers on each source table keep it current, so
+# dashboards and reports read O(groups) rows instead of scanning O(rows).
+#
+#   python rollups.py rebuild    recompute the table from the source tables
+#   python rollups.py check      compare it against a fresh aggregate
+
+import re
+import sys
+
+KEYS = ("programme_unit", "category", "status", "month")
+MEASURES = ("pkr", "usd")
+
+# Expressions per source table; {r} is the row alias (NEW / OLD / t).
+# Keys are stored as names, read from the lookup_* tables.
+# payment_tracking has no programme unit of its own -- looking it up in the
+# parent PR breaks when the PR delete cascades, so payments roll up under ''.
+# PR lines take their keys from pr_headers; headers are never deleted while
+# they still have lines (see _header_triggers), so the lookup always succeeds.
+def _name(table, id_expr):
+    return f"(SELECT name FROM {table} WHERE id = {id_expr})"
+
+
+def _header(expr):
+    return f"(SELECT {expr} FROM pr_headers h WHERE h.id = {{r}}.header_id)"
+
+
+SOURCES = {
+    "pr_lines": {
+        "programme_unit": _header(_name("lookup_programme_unit", "h.programme_unit_id")),
+        "category": _header(_name("lookup_category", "h.category_id")),
+        "status": _name("lookup_status", "{r}.status_id"),
+        "month": _header("substr(h.date_request, 1, 7)"),
+        "pkr": "{r}.est_cost_pkr_minor",
+        "usd": "{r}.est_cost_usd_minor",
+    },
+    "payment_tracking": {
+        "programme_unit": "''",
+        "category": _name("lookup_category", "{r}.category_id"),
+        "status": _name("lookup_status", "{r}.status_id"),
+        "month": "substr({r}.payment_date, 1, 7)",
+        "pkr": "{r}.actual_pkr_minor",
+        "usd": "{r}.actual_usd_minor",
+    },
+    "dsa_payments": {
+        "programme_unit": _name("lookup_programme_unit", "{r}.programme_unit_id"),
+        "category": _name("lookup_dsa_type", "{r}.dsa_type_id"),
+        "status": _name("lookup_status", "{r}.status_id"),
+        "month": "substr({r}.date_request, 1, 7)",
+        "pkr": "{r}.amount_pkr_minor",
+        "usd": "0",
+    },
+    "operational_advances": {
+        "programme_unit": _name("lookup_programme_unit", "{r}.programme_unit_id"),
+        "category": "{r}.invoice_type",
+        "status": _name("lookup_status", "{r}.status_id"),
+        "month": "substr({r}.date_request, 1, 7)",
+        "pkr": "CASE WHEN {r}.payment_currency = 'USD' THEN 0 ELSE {r}.total_amount_minor END",
+        "usd": "CASE WHEN {r}.payment_currency = 'USD' THEN {r}.total_amount_minor ELSE 0 END",
+    },
+}
+
+TABLE_DDL = """CREATE TABLE IF NOT EXISTS summary_rollup (
+    source TEXT NOT NULL,
+    programme_unit TEXT NOT NULL,
+    category TEXT NOT NULL,
+    status TEXT NOT NULL,
+    month TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    pkr REAL NOT NULL DEFAULT 0,
+    usd REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (source, programme_unit, category, status, month)
+) WITHOUT ROWID"""
+
+
+def _exprs(spec, alias):
+    keys = [f"COALESCE({spec[k].format(r=alias)}, '')" for k in KEYS]
+    measures = [f"COALESCE({spec[m].format(r=alias)}, 0)" for m in MEASURES]
+    return keys, measures
+
+
+def _add(source, spec, alias):
+    keys, (pkr, usd) = _exprs(spec, alias)
+    return f"""INSERT INTO summary_rollup (source, {", ".join(KEYS)}, n, pkr, usd)
+        VALUES ('{source}', {", ".join(keys)}, 1, {pkr}, {usd})
+        ON CONFLICT (source, {", ".join(KEYS)}) DO UPDATE SET
+            n = n + 1, pkr = pkr + excluded.pkr, usd = usd + excluded.usd;"""
+
+
+def _remove(source, spec, alias):
+    keys, (pkr, usd) = _exprs(spec, alias)
+    match = " AND ".join(f"{k} = {e}" for k, e in zip(KEYS, keys))
+    return f"""UPDATE summary_rollup SET n = n - 1, pkr = pkr - {pkr}, usd = usd - {usd}
+        WHERE source = '{source}' AND {match};
+        DELETE FROM summary_rollup WHERE source = '{source}' AND {match} AND n <= 0;"""
+
+
+def _columns(spec):
+    # Source columns the expressions read, for AFTER UPDATE OF ...
+    cols = set()
+    for expr in spec.values():
+        cols.update(re.findall(r"\{r\}\.(\w+)", expr))
+    return sorted(cols)
+
+
+def trigger_ddl(sources=SOURCES):
+    statements = []
+    for source, spec in sources.items():
+        statements += [
+            f"DROP TRIGGER IF EXISTS trg_rollup_{source}_ins",
+            f"DROP TRIGGER IF EXISTS trg_rollup_{source}_upd",
+            f"DROP TRIGGER IF EXISTS trg_rollup_{source}_del",
+            f"""CREATE TRIGGER trg_rollup_{source}_ins AFTER INSERT ON {source} BEGIN
+        {_add(source, spec, "NEW")}
+    END""",
+            f"""CREATE TRIGGER trg_rollup_{source}_upd AFTER UPDATE OF {", ".join(_columns(spec))} ON {source} BEGIN
+        {_remove(source, spec, "OLD")}
+        {_add(source, spec, "NEW")}
+    END""",
+            f"""CREATE TRIGGER trg_rollup_{source}_del AFTER DELETE ON {source} BEGIN
+        {_remove(source, spec, "OLD")}
+    END""",
+        ]
+    return statements
+
+
+# Editing a header's programme unit, category or request date moves all of
+# its lines to other groups; deleting a header removes its lines first so the
+# pr_lines triggers can still read the header.
+def _header_triggers():
+    keys, (pkr, usd) = _exprs(SOURCES["pr_lines"], "l")
+    groups = f"""SELECT {keys[KEYS.index("status")]} AS status, COUNT(*) AS n,
+                   SUM({pkr}) AS pkr, SUM({usd}) AS usd
+            FROM pr_lines l WHERE l.header_id = NEW.id GROUP BY 1"""
+
+    def header_keys(alias):
+        return (f"COALESCE({_name('lookup_programme_unit', f'{alias}.programme_unit_id')}, '')",
+                f"COALESCE({_name('lookup_category', f'{alias}.category_id')}, '')",
+                f"COALESCE(substr({alias}.date_request, 1, 7), '')")
+
+    old_unit, old_category, old_month = header_keys("OLD")
+    new_unit, new_category, new_month = header_keys("NEW")
+    return [
+        f"""CREATE TRIGGER trg_rollup_pr_headers_upd AFTER UPDATE OF programme_unit_id, category_id, date_request
+    ON pr_headers BEGIN
+        UPDATE summary_rollup SET n = summary_rollup.n - g.n, pkr = summary_rollup.pkr - g.pkr,
+                                  usd = summary_rollup.usd - g.usd
+        FROM ({groups}) AS g
+        WHERE summary_rollup.source = 'pr_lines'
+          AND summary_rollup.programme_unit = {old_unit}
+          AND summary_rollup.category = {old_category}
+          AND summary_rollup.month = {old_month}
+          AND summary_rollup.status = g.status;
+        DELETE FROM summary_rollup WHERE source = 'pr_lines' AND n <= 0;
+        INSERT INTO summary_rollup (source, {", ".join(KEYS)}, n, pkr, usd)
+        SELECT 'pr_lines', {new_unit}, {new_category}, g.status, {new_month}, g.n, g.pkr, g.usd
+        FROM ({groups}) AS g WHERE true
+        ON CONFLICT (source, {", ".join(KEYS)}) DO UPDATE SET
+            n = n + excluded.n, pkr = pkr + excluded.pkr, usd = usd + excluded.usd;
+    END""",
+        """CREATE TRIGGER trg_rollup_pr_headers_del BEFORE DELETE ON pr_headers BEGIN
+        DELETE FROM pr_lines WHERE header_id = OLD.id;
+    END""",
+    ]
+
+
+def aggregate_sql(source, spec):
+    keys, (pkr, usd) = _exprs(spec, "t")
+    return f"""SELECT '{source}' AS source, {", ".join(f"{e} AS {k}" for k, e in zip(KEYS, keys))},
+               COUNT(*) AS n, SUM({pkr}) AS pkr, SUM({usd}) AS usd
+        FROM {source} t GROUP BY {", ".join(keys)}"""
+
+
+def rebuild(conn, sources=SOURCES):
+    """Recompute summary_rollup from scratch (call inside a transaction)."""
+    conn.execute("DELETE FROM summary_rollup")
+    for source, spec in sources.items():
+        conn.execute(f"INSERT INTO summary_rollup (source, {', '.join(KEYS)}, n, pkr, usd) "
+                     + aggregate_sql(source, spec))
+
+
+def check(conn, sources=SOURCES, tolerance=0):
+    """Rows where summary_rollup disagrees with a fresh aggregate.
+    Returns a list of (key, stored, expected); empty means consistent."""
+    def load(sql):
+        return {tuple(r[:5]): (r[5], r[6], r[7]) for r in conn.execute(sql)}
+
+    stored = load(f"SELECT source, {', '.join(KEYS)}, n, pkr, usd FROM summary_rollup")
+    expected = load(" UNION ALL ".join(aggregate_sql(s, spec) for s, spec in sources.items()))
+
+    problems = []
+    for key in stored.keys() | expected.keys():
+        got, want = stored.get(key), expected.get(key)
+        if got is None or want is None or got[0] != want[0] or any(
+                abs(a - b) > tolerance for a, b in zip(got[1:], want[1:])):
+            problems.append((key, got, want))
+    return sorted(problems, key=lambda p: p[0])
+
+
+def drop_triggers(conn):
+    for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_rollup_%'").fetchall():
+        conn.execute(f"DROP TRIGGER {name}")
+
+
+def install(conn):
+    """(Re)create the triggers for the current schema and backfill the table.
+    db.migrate() calls this whenever it upgrades to the latest version."""
+    conn.execute(TABLE_DDL)
+    drop_triggers(conn)
+    for statement in trigger_ddl() + _header_triggers():
+        conn.execute(statement)
+    rebuild(conn)
+
+
+if __name__ == "__main__":
+    import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    conn = db.connection()
+    db.migrate(conn)
+    if command == "rebuild":
+        with db.transaction("summary_rollup"):
+            rebuild(conn)
+        print("summary_rollup rebuilt.")
+    elif command == "check":
+        problems = check(conn)
+        for key, got, want in problems:
+            print(f"{key}: stored={got} expected={want}")
+        print("summary_rollup is consistent." if not problems else f"{len(problems)} mismatched group(s).")
+        sys.exit(1 if problems else 0)
+    else:
+        sys.exit(f"Unknown command {command!r} (use 'rebuild' or 'check')")
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from synthetic import build, db  # noqa: E402  (also puts the repo root on sys.path)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """A small synthetic database, opened through a pool of its own."""
+    path = str(tmp_path / "test.db")
+    build(path, 200).close()
+    db.clear_cache()
+    return db.ConnectionPool(path).connection()
+
+
+@pytest.fixture
+def pool(conn, monkeypatch):
+    """Route db's default pool (db.connection / db.transaction) to the test database."""
+    pool = db.ConnectionPool(conn.execute("PRAGMA database_list").fetchone()[2])
+    monkeypatch.setattr(db, "pool", pool)
+    monkeypatch.setattr(db, "connection", pool.connection)
+    monkeypatch.setattr(db, "transaction", pool.transaction)
+    return pool
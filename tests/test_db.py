@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import db
+from synthetic import build
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def count_lines(conn):
+    return int(db.read_cached(conn, "SELECT COUNT(*) AS n FROM pr_lines", ["pr_lines"])["n"].iloc[0])
+
+
+def test_cache_sees_writes_from_other_processes(conn, monkeypatch):
+    monkeypatch.setattr(db, "SYNC_SECONDS", 0.2)
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    before = count_lines(conn)
+    hits = db.cache_stats()["hits"]
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert count_lines(conn) == before
+    assert db.cache_stats()["hits"] == hits + 1
+    assert statements == []                       # a cache hit inside SYNC_SECONDS runs no SQL
+    conn.set_trace_callback(None)
+
+    subprocess.run([sys.executable, "-c", f"""
+import db
+with db.ConnectionPool({path!r}).transaction("pr_lines") as cur:
+    cur.execute("DELETE FROM pr_lines WHERE id = 1")
+"""], cwd=ROOT, check=True)
+
+    time.sleep(db.SYNC_SECONDS)
+    assert count_lines(conn) == before - 1
+
+
+def test_local_pr_stamps_move_to_utc(tmp_path, monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Karachi")               # UTC+5, no DST
+    time.tzset()
+    try:
+        conn = build(str(tmp_path / "old.db"), 20, target=10)
+        conn.execute("UPDATE pr_lines SET created_at = '2024-03-01 10:00:00' WHERE id IN (1, 2)")
+        conn.commit()
+        db.migrate(conn, 12)                                # backfills updated_at from created_at
+        conn.execute("UPDATE pr_lines SET updated_at = '2024-03-02 00:00:00' WHERE id = 2")
+        conn.commit()
+        db.migrate(conn)
+        stamps = conn.execute("SELECT created_at, updated_at FROM pr_lines WHERE id IN (1, 2) ORDER BY id")
+        assert stamps.fetchall() == [("2024-03-01 05:00:00", "2024-03-01 05:00:00"),
+                                     ("2024-03-01 05:00:00", "2024-03-02 00:00:00")]
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_read_page_walks_nulls_and_seeks_on_the_raw_column(conn, descending, monkeypatch):
+    conn.execute("UPDATE pr_headers SET staff_name = NULL WHERE id % 5 = 0")
+    conn.commit()
+    db.clear_cache()
+    queries = []
+    read_cached = db.read_cached
+
+    def recording(conn, sql, tables, params=()):
+        queries.append((sql, params))
+        return read_cached(conn, sql, tables, params)
+
+    monkeypatch.setattr(db, "read_cached", recording)
+
+    seen, after = [], None
+    while True:
+        page, after = db.read_page(conn, "pr_headers", sort="staff_name", descending=descending,
+                                   after=after, page_size=7)
+        seen += page["id"].tolist()
+        if after is None:
+            break
+    key = lambda row: (row[1] is not None, row[1] or "", row[0])
+    expected = [row[0] for row in sorted(conn.execute("SELECT id, staff_name FROM pr_headers"), key=key,
+                                         reverse=descending)]
+    assert seen == expected
+
+    for sql, params in queries:
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        assert "idx_pr_headers_staff_name" in plan and "TEMP B-TREE" not in plan, sql
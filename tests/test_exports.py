@@ -0,0 +1,36 @@
+import io
+import zipfile
+
+import pandas as pd
+
+import exports
+
+
+def test_pr_report_is_bytes(conn):
+    for fmt in exports.formats():
+        data = exports.pr_report(conn, 1, fmt)
+        assert isinstance(data, bytes)
+        assert data[:2] == b"PK"            # xlsx and the zip bundles are both zip files
+
+
+def _bundle_member(data, name):
+    with zipfile.ZipFile(io.BytesIO(data)) as bundle:
+        return bundle.read(name)
+
+
+def test_null_text_and_lookup_cells_stay_null(conn):
+    conn.execute("UPDATE pr_lines SET comments = NULL, location = NULL WHERE id = 1")
+    conn.execute("UPDATE pr_headers SET type_vehicle_id = NULL, traveller_name = NULL")
+    conn.commit()
+    columns = ["comments", "location", "type_vehicle", "traveller_name"]
+
+    with exports.full_report(conn, fmt="csv") as f:
+        prs = pd.read_csv(io.BytesIO(_bundle_member(f.read(), "PRs.csv.gz")), compression="gzip",
+                          keep_default_na=False)
+    assert prs.loc[prs["id"] == 1, columns].iloc[0].tolist() == ["", "", "", ""]
+    assert not prs[columns].isin(["None", "nan", "<NA>"]).any().any()
+
+    if "parquet" in exports.formats():
+        with exports.full_report(conn, fmt="parquet") as f:
+            prs = pd.read_parquet(io.BytesIO(_bundle_member(f.read(), "PRs.parquet")))
+        assert prs.loc[prs["id"] == 1, columns].isna().all(axis=None)
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import db
+import jobs
+
+
+@pytest.fixture
+def pool(pool, tmp_path, monkeypatch):
+    """The test database's pool, with jobs' artifacts kept under tmp_path."""
+    monkeypatch.setattr(jobs, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(jobs, "_executor", None)
+    yield pool
+    if jobs._executor is not None:
+        jobs._executor.shutdown()
+
+
+def wait(conn, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state, = conn.execute("SELECT state FROM export_jobs WHERE id=?", (job_id,)).fetchone()
+        if state not in jobs.ACTIVE:
+            return state
+        time.sleep(0.2)
+    raise TimeoutError(job_id)
+
+
+def test_submit_replaces_a_broken_pool(pool):
+    conn = pool.connection()
+    broken = jobs.executor()
+    crashed = broken.submit(os._exit, 1)
+    assert isinstance(crashed.exception(timeout=60), Exception)        # BrokenProcessPool
+
+    job_id = jobs.submit(conn, "full", "tester", start=None, end=None, fmt="csv")
+    assert wait(conn, job_id) == "done"
+    assert jobs.executor() is not broken
+
+
+def test_a_job_whose_result_cannot_be_recorded_fails(pool, monkeypatch):
+    conn = pool.connection()
+    with db.transaction("export_jobs") as cur:
+        job_id, = cur.execute("""INSERT INTO export_jobs (kind, params, fingerprint, state)
+                                 VALUES ('full', '{}', 'x', 'running') RETURNING id""").fetchone()
+
+    def locked(conn):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(jobs, "prune", locked)
+    done = Future()
+    done.set_result((10, "report.xlsx", None))
+    jobs._finished(job_id, done)
+    assert conn.execute("SELECT state, error FROM export_jobs WHERE id=?", (job_id,)).fetchone() == (
+        "failed", "OperationalError: database is locked")
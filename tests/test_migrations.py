@@ -0,0 +1,97 @@
+import sqlite3
+
+import pandas as pd
+
+import db
+import money
+from synthetic import build
+
+PR_COLUMNS = ("pr_number", "date_request", "staff_name", "programme_unit", "type_services", "category",
+              "description", "from_date", "to_date", "days", "location", "qty", "est_cost_pkr", "est_cost_usd",
+              "reminder_expiry", "reminder_days", "status", "created_at", "assigned_to")
+# PR lines as the original app stored them: two lines of PR-1 share a header,
+# one programme unit is not in the seed list, dates carry a time of day
+PR_LINES = [
+    ("PR-1", "2024-05-01 09:30:00", "amna", "HEALTH", "Goods", "ICT", "Laptops",
+     "2024-06-01", "2024-06-02", 2, "Islamabad", 3, 1500.25, 5.4, "Yes", 3, "Submitted", "2024-05-01 09:30:00", "ops"),
+    ("PR-1", "2024-05-01 09:30:00", "amna", "HEALTH", "Goods", "ICT", "Laptops",
+     "2024-06-03", "2024-06-03", 1, "Lahore", 1, 0.285, None, "No", None, "Completed", "2024-05-01 09:30:00", "ops"),
+    ("PR-2", "2024-05-02", "bilal", "New Unit", "Services", "Medical", None,
+     "2024-07-01", "2024-07-05", 5, "Quetta", 2, 250000.0, 900.1, "No", None, "In Process", "2024-05-02", "ops"),
+]
+
+
+def baseline(tmp_path):
+    """A database at the baseline schema holding PR_LINES, a WBL and a payment."""
+    conn = sqlite3.connect(tmp_path / "baseline.db")
+    db.migrate(conn, 1)
+    conn.executemany(f"INSERT INTO pr_tracking ({', '.join(PR_COLUMNS)}) VALUES ({', '.join('?' * len(PR_COLUMNS))})",
+                     PR_LINES)
+    conn.execute("INSERT INTO pr_wbls (pr_id, project_name, task_name, percentage) VALUES (2, 'P1', 'T1', 100)")
+    conn.execute("""INSERT INTO payment_tracking (pr_id, pr_number, category, actual_pkr, status, payment_date)
+                    VALUES (3, 'PR-2', 'Medical', 249999.995, 'Pending', '2024-07-10 00:00:00')""")
+    conn.commit()
+    return conn
+
+
+def test_header_line_split_keeps_every_line(tmp_path):
+    conn = baseline(tmp_path)
+    db.migrate(conn, 6)
+    columns = ", ".join(PR_COLUMNS)
+    assert conn.execute(f"SELECT {columns} FROM pr_tracking ORDER BY id").fetchall() == PR_LINES
+    assert conn.execute("SELECT COUNT(*) FROM pr_headers").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(DISTINCT header_id) FROM pr_lines WHERE id IN (1, 2)").fetchone()[0] == 1
+    assert conn.execute("""SELECT p.pr_number, p.location FROM pr_wbls w
+                           JOIN pr_tracking p ON p.id = w.pr_id""").fetchall() == [("PR-1", "Lahore")]
+
+
+def test_lookup_coding_maps_every_name_to_its_id(tmp_path):
+    conn = baseline(tmp_path)
+    db.migrate(conn, 7)
+    coded = conn.execute("""
+        SELECT p.id, pu.name, st.name, c.name, s.name
+        FROM pr_tracking p
+        LEFT JOIN lookup_programme_unit pu ON pu.id = p.programme_unit_id
+        LEFT JOIN lookup_service_type st ON st.id = p.type_services_id
+        LEFT JOIN lookup_category c ON c.id = p.category_id
+        LEFT JOIN lookup_status s ON s.id = p.status_id
+        ORDER BY p.id""").fetchall()
+    assert coded == [(i, line[3], line[4], line[5], line[16]) for i, line in enumerate(PR_LINES, start=1)]
+    assert conn.execute("SELECT type_vehicle_id FROM pr_tracking").fetchall() == [(None,)] * 3
+    # names outside the seed lists are added, seeded ids keep their seed order
+    assert conn.execute("SELECT COUNT(*) FROM lookup_programme_unit WHERE name = 'New Unit'").fetchone()[0] == 1
+    assert conn.execute("SELECT name FROM lookup_status ORDER BY id").fetchall()[:2] == [("Submitted",), ("Pending",)]
+    assert conn.execute("""SELECT c.name, s.name FROM payment_tracking p
+                           JOIN lookup_category c ON c.id = p.category_id
+                           JOIN lookup_status s ON s.id = p.status_id""").fetchall() == [("Medical", "Pending")]
+
+
+def test_amounts_and_dates_round_trip_through_minor_units(tmp_path):
+    conn = baseline(tmp_path)
+    db.migrate(conn, 8)
+    stored = conn.execute("SELECT est_cost_pkr_minor, est_cost_usd_minor FROM pr_tracking ORDER BY id").fetchall()
+    assert stored == [(money.to_minor(line[12]), money.to_minor(line[13])) for line in PR_LINES]
+    assert stored[1] == (29, None)                  # 0.285 rounds half up, as the app stores it
+    amounts = money.decode(pd.read_sql("SELECT est_cost_pkr_minor, est_cost_usd_minor FROM pr_tracking"
+                                       " ORDER BY id", conn))
+    assert amounts["est_cost_pkr"].tolist() == [1500.25, 0.29, 250000.0]
+    assert amounts["est_cost_usd"].tolist()[::2] == [5.4, 900.1]
+    assert conn.execute("SELECT actual_pkr_minor, payment_date FROM payment_tracking").fetchall() == [
+        (25000000, "2024-07-10")]
+    assert conn.execute("SELECT DISTINCT date_request FROM pr_headers ORDER BY 1").fetchall() == [
+        ("2024-05-01",), ("2024-05-02",)]
+
+
+def test_duplicate_payments_are_archived_not_deleted(tmp_path):
+    conn = build(str(tmp_path / "old.db"), 40, target=8)
+    pr_id, = conn.execute("SELECT pr_id FROM payment_tracking ORDER BY id LIMIT 1").fetchone()
+    conn.execute("""INSERT INTO payment_tracking (pr_id, pr_number, remarks)
+                    SELECT pr_id, pr_number, 'second save' FROM payment_tracking WHERE pr_id=?""", (pr_id,))
+    conn.commit()
+    payments = conn.execute("SELECT COUNT(*) FROM payment_tracking").fetchone()[0]
+
+    db.migrate(conn)
+    assert conn.execute("SELECT COUNT(*) FROM payment_tracking WHERE pr_id=?", (pr_id,)).fetchone()[0] == 1
+    assert conn.execute("SELECT pr_id, remarks FROM payment_tracking_duplicates").fetchall() == [
+        (pr_id, "second save")]
+    assert conn.execute("SELECT COUNT(*) FROM payment_tracking").fetchone()[0] == payments - 1
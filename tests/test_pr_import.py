@@ -0,0 +1,17 @@
+import pandas as pd
+
+import lookups
+import pr_import
+
+
+def test_wbls_are_optional_but_must_total_100_when_given(conn):
+    row = {"pr_number": "PR-IMPORT-1", "date_request": "2024-05-01", "assigned_to": "ops",
+           "location": "Islamabad", "from_date": "2024-05-10", "to_date": "2024-05-12", "qty": 1,
+           "est_cost_pkr": 1500, **{col: lookups.options(conn, col)[0]
+                                    for col in ("programme_unit", "type_services", "category", "type_vehicle")}}
+    chunk = pd.DataFrame([row, {**row, "wbl1_project": "P1", "wbl1_task": "T1", "wbl1_percentage": 60},
+                          {**row, "wbl1_project": "P1", "wbl1_task": "T1", "wbl1_percentage": 100}])
+
+    rows, errors = pr_import.validate_chunk(conn, chunk, "tester")
+    assert [r["wbls"] for r in rows] == [[], [("P1", "T1", 100)]]
+    assert errors.to_dict("records") == [{"row": 3, "error": "WBL percentages must add up to 100"}]
@@ -0,0 +1,50 @@
+import pytest
+
+import db
+import lookups
+import pr_submit
+
+
+def counts(conn):
+    return [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("pr_headers", "pr_lines", "pr_wbls", "status_history", "reminders")]
+
+
+def row(conn, pr_number, **line):
+    header = {"pr_number": pr_number, "date_request": "2024-05-01", "staff_name": "tester",
+              "description": "Batched", "assigned_to": "ops",
+              **{col: lookups.options(conn, col)[0]
+                 for col in ("programme_unit", "type_services", "category", "type_vehicle")}}
+    return {**header, "from_date": "2024-06-10", "to_date": "2024-06-11", "days": 2, "location": "Islamabad",
+            "qty": 1, "est_cost_pkr": 1500.25, "est_cost_usd": None, "reminder_expiry": "No",
+            "reminder_days": None, "comments": None, "wbls": [], **line}
+
+
+def test_insert_lines_writes_every_table_in_one_batch(pool):
+    conn = pool.connection()
+    before = counts(conn)
+    rows = [row(conn, "PR-BATCH-A", wbls=[("P1", "T1", 60), ("P2", "T2", 40)]),
+            row(conn, "PR-BATCH-A", reminder_expiry="Yes", reminder_days=3),
+            row(conn, "PR-BATCH-B")]
+    with db.transaction(*pr_submit.TABLES) as cur:
+        ids = pr_submit.insert_lines(cur, rows, "tester")
+
+    assert ids == list(range(ids[0], ids[0] + 3))
+    assert [after - b for after, b in zip(counts(conn), before)] == [2, 3, 2, 3, 1]
+    headers = conn.execute("""SELECT pr_number, header_id, est_cost_pkr_minor FROM pr_tracking
+                              WHERE id BETWEEN ? AND ? ORDER BY id""", (ids[0], ids[-1])).fetchall()
+    assert [h[0] for h in headers] == ["PR-BATCH-A", "PR-BATCH-A", "PR-BATCH-B"]
+    assert headers[0][1] == headers[1][1] != headers[2][1]
+    assert {h[2] for h in headers} == {150025}
+    reminder, = conn.execute("SELECT reminder_date FROM reminders WHERE pr_id=?", (ids[1],)).fetchone()
+    assert reminder == "2024-06-07"                 # from_date - reminder_days
+
+
+def test_insert_lines_saves_all_or_nothing(pool):
+    conn = pool.connection()
+    before = counts(conn)
+    rows = [row(conn, "PR-BATCH-C"), row(conn, "PR-BATCH-D", programme_unit="No Such Unit")]
+    with pytest.raises(ValueError):
+        with db.transaction(*pr_submit.TABLES) as cur:
+            pr_submit.insert_lines(cur, rows, "tester")
+    assert counts(conn) == before
@@ -0,0 +1,45 @@
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
+import db
+import reminders
+
+
+def pending(conn):
+    return conn.execute("SELECT COUNT(*) FROM reminders WHERE notified_at IS NULL").fetchone()[0]
+
+
+def test_past_reminders_are_not_backfilled_as_pending(conn):
+    assert conn.execute("SELECT COUNT(*) FROM reminders").fetchone()[0] > 0
+    assert conn.execute("""SELECT COUNT(*) FROM reminders WHERE notified_at IS NULL
+                           AND reminder_date < date('now', 'localtime')""").fetchone()[0] == 0
+
+
+def test_failed_delivery_keeps_reminders_scheduled(pool, monkeypatch):
+    conn = pool.connection()
+    with db.transaction("reminders") as cur:
+        cur.execute("UPDATE reminders SET notified_at = NULL WHERE id IN (SELECT id FROM reminders LIMIT 3)")
+    scheduler = reminders.Scheduler(conn)
+    assert scheduler.load_new() == 3
+
+    @contextmanager
+    def locked(*tables):
+        raise sqlite3.OperationalError("database is locked")
+        yield
+
+    with monkeypatch.context() as m:
+        m.setattr(db, "transaction", locked)
+        with pytest.raises(sqlite3.OperationalError):
+            scheduler.deliver_due(date.max)
+    assert len(scheduler.heap) == 3 and pending(conn) == 3
+
+    assert scheduler.deliver_due(date.max) == 3
+    assert not scheduler.heap and pending(conn) == 0
+    stamps = [at for at, in conn.execute("""SELECT notified_at FROM reminders
+                                            WHERE id IN (SELECT reminder_id FROM reminder_outbox)""")]
+    assert len(stamps) == 3                # CURRENT_TIMESTAMP format (UTC), not isoformat's "T"
+    assert all(re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d", at) for at in stamps)